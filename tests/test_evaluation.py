@@ -19,7 +19,14 @@ import dask
 
 import utilsforecast.processing as ufp
 from utilsforecast.data import generate_series
-from utilsforecast.evaluation import evaluate
+from utilsforecast.evaluation import (
+    EvaluationCache,
+    EvaluationPlan,
+    bootstrap_ci,
+    evaluate,
+    evaluate_dataset,
+    paired_bootstrap_test,
+)
 from utilsforecast.losses import (
     bias,
     calibration,
@@ -44,6 +51,7 @@ from utilsforecast.losses import (
     smape,
     spis,
     tweedie_deviance,
+    wape,
 )
 
 
@@ -217,6 +225,434 @@ def test_evaluate(setup_series, setup_models, setup_metrics):
     )
 
 
+@pytest.mark.parametrize("agg_fn, weights", [(None, None), ("mean", None), ("weighted_mean", "auto")])
+def test_evaluate_lazyframe(setup_metrics, agg_fn, weights, monkeypatch):
+    series = generate_series(10, n_models=2, level=[80, 95], engine="polars")
+    metrics = setup_metrics + [
+        partial(rmae, baseline="model1"),
+        partial(tweedie_deviance, power=1.5),
+        partial(rmsse, seasonality=7),
+        partial(scaled_mqloss, seasonality=7),
+    ]
+    kwargs = dict(metrics=metrics, level=[80, 95], agg_fn=agg_fn, weights=weights)
+    expected = evaluate(series, train_df=series, **kwargs)
+    # count the collects of the lazy frames (polars' eager methods collect internally)
+    n_collects = 0
+    collect = pl.LazyFrame.collect
+
+    def counting_collect(self, *args, **kwargs):
+        nonlocal n_collects
+        if not sys._getframe(1).f_globals["__name__"].startswith("polars"):
+            n_collects += 1
+        return collect(self, *args, **kwargs)
+
+    monkeypatch.setattr(pl.LazyFrame, "collect", counting_collect)
+    result = evaluate(series.lazy(), train_df=series.lazy(), **kwargs)
+    assert isinstance(result, pl.DataFrame)
+    pl.testing.assert_frame_equal(result, expected)
+    # the validations of rmae and tweedie_deviance don't collect the plan
+    with_flags = n_collects
+    n_collects = 0
+    kwargs["metrics"] = [
+        m for m in metrics if getattr(m, "func", m) not in (rmae, tweedie_deviance)
+    ]
+    evaluate(series.lazy(), train_df=series.lazy(), **kwargs)
+    assert with_flags == n_collects
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+def test_evaluation_plan(setup_metrics, engine):
+    plan = EvaluationPlan(metrics=setup_metrics, level=[80, 95], agg_fn="mean")
+    for seed in range(3):
+        series = generate_series(10, n_models=2, level=[80, 95], engine=engine, seed=seed)
+        expected = evaluate(series, setup_metrics, train_df=series, level=[80, 95], agg_fn="mean")
+        result = plan.run(series, train_df=series)
+        assert nw.from_native(result).to_pandas().equals(nw.from_native(expected).to_pandas())
+    # the model columns are resolved again when the columns change
+    series = nw.from_native(series)
+    series = series.select([c for c in series.columns if not c.startswith("model1")]).to_native()
+    result = nw.from_native(plan.run(series, train_df=series))
+    assert result.columns == ["metric", "model0"]
+    with pytest.raises(ValueError, match="require setting `level`"):
+        EvaluationPlan(metrics=[quantile_loss])
+    with pytest.raises(ValueError, match="require y_train"):
+        EvaluationPlan(metrics=setup_metrics, level=[80, 95]).run(series)
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+def test_evaluate_n_jobs(engine):
+    cv_df, train_df = generate_cv_series(n_series=7, level=[80, 95], engine=engine)
+    metrics = [
+        mae,
+        wape,
+        partial(mase, seasonality=7),
+        quantile_loss,
+        partial(scaled_quantile_loss, seasonality=7),
+        coverage,
+        mqloss,
+    ]
+    kwargs = dict(metrics=metrics, train_df=train_df, level=[95, 80], agg_fn="mean")
+    expected = evaluate(cv_df, **kwargs)
+    result = evaluate(cv_df, n_jobs=2, **kwargs)
+    if engine == "pandas":
+        pd.testing.assert_frame_equal(result, expected, check_exact=True)
+    else:
+        pl.testing.assert_frame_equal(result, expected, check_exact=True)
+
+    # wape is a ratio over the whole frame, even when it's the only metric
+    for wape_metrics in ([wape, mae], [wape]):
+        wape_kwargs = dict(metrics=wape_metrics, train_df=train_df)
+        expected = evaluate(cv_df, **wape_kwargs)
+        result = evaluate(cv_df, n_jobs=3, **wape_kwargs)
+        if engine == "pandas":
+            pd.testing.assert_frame_equal(result, expected, check_exact=True)
+        else:
+            pl.testing.assert_frame_equal(result, expected, check_exact=True)
+    with pytest.raises(ValueError, match="positive integer"):
+        evaluate(cv_df, n_jobs=0, **kwargs)
+    with pytest.raises(ValueError, match="must be either 'processes' or 'threads'"):
+        evaluate(cv_df, n_jobs=2, parallel_backend="loky", **kwargs)
+
+    # locally defined metrics can't be sent to other processes, but threads work
+    def local_mae(df, models, id_col="unique_id", target_col="y", cutoff_col="cutoff"):
+        return mae(
+            df, models, id_col=id_col, target_col=target_col, cutoff_col=cutoff_col
+        )
+
+    kwargs["metrics"] = [*metrics, local_mae]
+    expected = evaluate(cv_df, **kwargs)
+    result = evaluate(cv_df, n_jobs=2, parallel_backend="threads", **kwargs)
+    if engine == "pandas":
+        pd.testing.assert_frame_equal(result, expected, check_exact=True)
+    else:
+        pl.testing.assert_frame_equal(result, expected, check_exact=True)
+    if engine == "polars":
+        with pytest.raises(ValueError, match="only supported for pandas and polars"):
+            evaluate(cv_df.lazy(), n_jobs=2, **kwargs)
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+def test_evaluation_cache(engine, tmp_path):
+    cv_df, train_df = generate_cv_series(n_series=4, n_models=3, level=[80], engine=engine)
+    metrics = [mae, partial(mase, seasonality=7), coverage, quantile_loss]
+    kwargs = dict(metrics=metrics, train_df=train_df, level=[80])
+    assert_frame_equal = (
+        pd.testing.assert_frame_equal if engine == "pandas" else pl.testing.assert_frame_equal
+    )
+    cache = EvaluationCache(tmp_path)
+    without_model2 = [c for c in cv_df.columns if not c.startswith("model2")]
+    evaluate(cv_df[without_model2], cache=cache, **kwargs)
+    n_cells = 4 * 3 * len(metrics)  # series * cutoffs * metrics
+    assert (cache.reused, cache.computed) == (0, 2 * n_cells)
+
+    # only the new model is evaluated
+    result = evaluate(cv_df, cache=cache, **kwargs)
+    assert (cache.reused, cache.computed) == (2 * n_cells, n_cells)
+    assert_frame_equal(result, evaluate(cv_df, **kwargs))
+    result = evaluate(cv_df, cache=cache, agg_fn="mean", **kwargs)
+    assert (cache.reused, cache.computed) == (3 * n_cells, 0)
+    assert_frame_equal(result, evaluate(cv_df, agg_fn="mean", **kwargs))
+
+    # the metrics' arguments are part of the cells
+    def scaled_mae(
+        df, models, scales, id_col="unique_id", target_col="y", cutoff_col="cutoff"
+    ):
+        res = mae(
+            df, models, id_col=id_col, target_col=target_col, cutoff_col=cutoff_col
+        )
+        return (
+            nw.from_native(res)
+            .with_columns(nw.col(m) * scales.mean() for m in models)
+            .to_native()
+        )
+
+    scales = np.ones(5_000)
+    changed_scales = scales.copy()
+    changed_scales[2_500] = 2.0
+    for metric_scales in (scales, changed_scales):
+        metric = partial(scaled_mae, scales=metric_scales)
+        result = evaluate(cv_df, metrics=[metric], cache=cache)
+        assert (cache.reused, cache.computed) == (0, 3 * 4 * 3)
+        assert_frame_equal(result, evaluate(cv_df, metrics=[metric]))
+    with pytest.raises(ValueError, match="can't be pickled"):
+        evaluate(cv_df, metrics=[partial(scaled_mae, scales=lambda: 1)], cache=cache)
+
+    # wape depends on every serie, so it's computed again after a partial hit
+    wape_cache = EvaluationCache(tmp_path / "wape")
+    nw_cv = nw.from_native(cv_df)
+    first_ids = nw_cv["unique_id"].unique().sort().to_list()[:2]
+    first_series = nw_cv.filter(nw.col("unique_id").is_in(first_ids)).to_native()
+    evaluate(first_series, metrics=[mae, wape], cache=wape_cache)
+    result = evaluate(cv_df, metrics=[mae, wape], cache=wape_cache)
+    n_half = 2 * 3 * 3  # series * cutoffs * models
+    assert (wape_cache.reused, wape_cache.computed) == (n_half, 3 * n_half)
+    assert_frame_equal(result, evaluate(cv_df, metrics=[mae, wape]))
+
+    # eviction keeps the files written by the last evaluation
+    cache = EvaluationCache(tmp_path / "small", max_bytes=1)
+    evaluate(cv_df[without_model2], cache=cache, **kwargs)
+    first_files = set((tmp_path / "small").rglob("*.npy"))
+    evaluate(cv_df, cache=cache, **kwargs)
+    assert not first_files & set((tmp_path / "small").rglob("*.npy"))
+    evaluate(cv_df, cache=cache, **kwargs)
+    assert (cache.reused, cache.computed) == (n_cells, 2 * n_cells)
+    cache.clear()
+    assert not list((tmp_path / "small").iterdir())
+    if engine == "polars":
+        with pytest.raises(ValueError, match="only supported for pandas and polars"):
+            evaluate(cv_df.lazy(), cache=cache, **kwargs)
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+def test_evaluate_dataset(engine, tmp_path):
+    cv_df, train_df = generate_cv_series(n_series=10, level=[80], seed=0)
+    cv_df["unique_id"] = cv_df["unique_id"].astype(str)
+    train_df["unique_id"] = train_df["unique_id"].astype(str)
+    cv_df = cv_df.sort_values(["unique_id", "cutoff", "ds"], ignore_index=True)
+    path = tmp_path / "forecasts.parquet"
+    cv_df.to_parquet(path, row_group_size=37)
+    if engine == "polars":
+        train_df = pl.from_pandas(train_df)
+    metrics = [mae, partial(mase, seasonality=7), coverage]
+    kwargs = dict(metrics=metrics, train_df=train_df, level=[80], engine=engine)
+    for agg_fn, weights in [(None, None), ("mean", None), ("weighted_mean", "auto")]:
+        expected = evaluate(
+            cv_df,
+            metrics=metrics,
+            train_df=nw.from_native(train_df).to_pandas(),
+            level=[80],
+            agg_fn=agg_fn,
+            weights=weights,
+        )
+        result = evaluate_dataset(
+            path, agg_fn=agg_fn, weights=weights, max_bytes=5_000, **kwargs
+        )
+        result = nw.from_native(result).to_pandas()
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+    output_path = tmp_path / "scores.parquet"
+    assert evaluate_dataset(path, output_path=output_path, **kwargs) is None
+    assert pd.read_parquet(output_path).shape == (10 * 3 * len(metrics), 5)
+    cv_df.sample(frac=1.0, random_state=0).to_parquet(path, row_group_size=37)
+    with pytest.raises(ValueError, match="stored contiguously"):
+        evaluate_dataset(path, max_bytes=5_000, **kwargs)
+    with pytest.raises(ValueError, match="`agg_fn` must be one of"):
+        evaluate_dataset(path, agg_fn="median", **kwargs)
+    with pytest.raises(ValueError, match=r"can't be evaluated by chunks: \['wape'\]"):
+        evaluate_dataset(path, **{**kwargs, "metrics": [mae, wape]})
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+@pytest.mark.parametrize("method", ["multinomial", "poisson"])
+def test_bootstrap_ci(engine, method):
+    series = generate_series(20, n_models=2, level=[80], engine=engine)
+    scores = evaluate(series, metrics=[mae, rmse, coverage], level=[80])
+    result = nw.from_native(
+        bootstrap_ci(scores, level=[80, 95], n_resamples=5, method=method, seed=1)
+    )
+    expected = nw.from_native(
+        evaluate(series, metrics=[mae, rmse, coverage], level=[80], agg_fn="mean")
+    )
+    for model in ["model0", "model1"]:
+        np.testing.assert_allclose(result[model].to_numpy(), expected[model].to_numpy())
+        assert (result[f"{model}-lo-95"] <= result[f"{model}-lo-80"]).all()
+        assert (result[f"{model}-hi-80"] <= result[f"{model}-hi-95"]).all()
+
+    # every resample is the weighted mean of the scores by serie
+    scores_pd = nw.from_native(scores).to_pandas()
+    rng = np.random.default_rng(1)
+    n_ids = scores_pd["unique_id"].nunique()
+    if method == "multinomial":
+        weights = rng.multinomial(n_ids, np.full(n_ids, 1 / n_ids), size=5)
+    else:
+        weights = rng.poisson(1.0, size=(5, n_ids))
+    ids = pd.factorize(scores_pd["unique_id"])[1]
+    mae_scores = (
+        scores_pd[scores_pd["metric"] == "mae"].set_index("unique_id").loc[ids, "model0"]
+    )
+    resampled = [np.average(mae_scores, weights=w) for w in weights if w.sum() > 0]
+    np.testing.assert_allclose(
+        result.filter(nw.col("metric") == "mae")["model0-lo-95"].item(),
+        np.percentile(resampled, 2.5),
+    )
+
+
+def test_paired_bootstrap_test():
+    series = generate_series(20, n_models=2)
+    series["model2"] = series["model0"]
+    scores = evaluate(series, metrics=[mae, rmse])
+    result = paired_bootstrap_test(scores, baseline="model0", n_resamples=200)
+    assert result.columns.tolist() == [
+        "metric",
+        "model1",
+        "model1-lo-95",
+        "model1-hi-95",
+        "model1-p_value",
+        "model2",
+        "model2-lo-95",
+        "model2-hi-95",
+        "model2-p_value",
+    ]
+    np.testing.assert_allclose(result["model2"], 0.0)
+    np.testing.assert_allclose(result["model2-p_value"], 1.0)
+    assert (result["model1-lo-95"] <= result["model1"]).all()
+    assert (result["model1"] <= result["model1-hi-95"]).all()
+    with pytest.raises(ValueError, match="baseline"):
+        paired_bootstrap_test(scores, baseline="model3")
+
+    # the differences only use the series scored by both models
+    scores_nan = scores.copy()
+    first_ids = scores_nan["unique_id"].isin(scores_nan["unique_id"].unique()[:10])
+    scores_nan.loc[first_ids, "model0"] = np.nan
+    scores_nan.loc[~first_ids, "model1"] = np.nan
+    scores_nan["model2"] = scores_nan["model0"] + 1.0
+    result = paired_bootstrap_test(scores_nan, baseline="model0", n_resamples=200)
+    assert result["model1"].isna().all()
+    assert result["model1-p_value"].isna().all()
+    np.testing.assert_allclose(result["model2"], 1.0)
+    np.testing.assert_allclose(result["model2-lo-95"], 1.0)
+    np.testing.assert_allclose(result["model2-p_value"], 0.0)
+
+    # resamples without any serie scored by both models are left out
+    last_id = scores_nan["unique_id"] == scores_nan["unique_id"].iloc[-1]
+    scores_nan["model2"] = scores_nan["model0"]
+    scores_nan.loc[~last_id, "model2"] = np.nan
+    result = paired_bootstrap_test(scores_nan, baseline="model0", n_resamples=200)
+    np.testing.assert_allclose(result["model2-p_value"], 1.0)
+
+    # the horizon is a key
+    by_horizon = evaluate(series, metrics=[mae], by_horizon=True)
+    result = paired_bootstrap_test(by_horizon, baseline="model0", n_resamples=10)
+    assert result.columns[:2].tolist() == ["horizon", "metric"]
+    assert "horizon-p_value" not in result.columns
+    result = bootstrap_ci(by_horizon, n_resamples=10)
+    assert "horizon-lo-95" not in result.columns
+    np.testing.assert_array_equal(result["horizon"], by_horizon["horizon"].unique())
+
+
+@pytest.mark.parametrize("shared_train", [False, True])
+@pytest.mark.parametrize("agg_fn", [None, "mean"])
+def test_evaluate_encoded_keys(monkeypatch, shared_train, agg_fn):
+    import utilsforecast.evaluation as ev
+
+    cv_df, train_df = generate_cv_series(n_series=6, level=[80])
+    cv_df["unique_id"] = cv_df["unique_id"].astype(str)
+    train_df["unique_id"] = train_df["unique_id"].astype(str)
+    if shared_train:
+        train_df = (
+            train_df.drop(columns="cutoff")
+            .drop_duplicates(["unique_id", "ds"])
+            .sort_values(["unique_id", "ds"])
+        )
+    kwargs = dict(
+        df=cv_df,
+        metrics=[mae, partial(mase, seasonality=7), scaled_crps],
+        train_df=train_df,
+        level=[80],
+        agg_fn=agg_fn,
+    )
+    result = evaluate(**kwargs)
+    with pytest.raises(ValueError, match="missing from the train_df"):
+        evaluate(**{**kwargs, "train_df": train_df[train_df["unique_id"] != "0"]})
+
+    monkeypatch.setattr(ev, "_encode_keys", lambda *args, **kwargs: None)
+    expected = evaluate(**kwargs)
+    pd.testing.assert_frame_equal(result, expected)
+
+    # custom metrics get the original ids and cutoffs
+    def check_keys(df, models, id_col, target_col):
+        assert df[id_col].isin(cv_df["unique_id"]).all()
+        assert "cutoff" in df.columns
+        return mae(df, models, id_col, target_col, cutoff_col="cutoff")
+
+    monkeypatch.undo()
+    result = evaluate(**{**kwargs, "metrics": [*kwargs["metrics"], check_keys]})
+    pd.testing.assert_frame_equal(
+        result[result["metric"] != "check_keys"].reset_index(drop=True), expected
+    )
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+@pytest.mark.parametrize("agg_fn", [None, "mean", "weighted_mean"])
+def test_evaluate_float32(engine, agg_fn):
+    cv_df, train_df = generate_cv_series(n_series=20, level=[80, 95], engine=engine)
+    metrics = [
+        mae,
+        rmse,
+        mape,
+        smape,
+        nd,
+        bias,
+        partial(mase, seasonality=7),
+        partial(rmsse, seasonality=7),
+        partial(rmae, baseline="model1"),
+        quantile_loss,
+        scaled_crps,
+        partial(scaled_mqloss, seasonality=7),
+        coverage,
+        calibration,
+    ]
+    kwargs = dict(
+        df=cv_df,
+        metrics=metrics,
+        train_df=train_df,
+        level=[80, 95],
+        agg_fn=agg_fn,
+        weights="auto" if agg_fn == "weighted_mean" else None,
+    )
+    res32 = nw.from_native(evaluate(dtype="float32", **kwargs))
+    res64 = nw.from_native(evaluate(dtype="float64", **kwargs))
+    for model in ["model0", "model1"]:
+        assert res32[model].dtype == nw.Float32
+        assert res64[model].dtype == nw.Float64
+        # accuracy drift with respect to the float64 computation
+        np.testing.assert_allclose(
+            res32[model].to_numpy(), res64[model].to_numpy(), rtol=1e-5, atol=1e-6
+        )
+
+    with pytest.raises(ValueError, match="`dtype` must be one of"):
+        evaluate(dtype="float16", **kwargs)
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+@pytest.mark.parametrize("agg_fn", [None, "mean"])
+def test_evaluate_by_horizon(engine, agg_fn):
+    cv_df, train_df = generate_cv_series(n_series=4, level=[80], engine=engine)
+    metrics = [mae, partial(mase, seasonality=7), coverage]
+    result = nw.from_native(
+        evaluate(
+            cv_df,
+            metrics=metrics,
+            train_df=train_df,
+            level=[80],
+            agg_fn=agg_fn,
+            by_horizon=True,
+        )
+    )
+    keys = ["cutoff", "horizon", "metric"]
+    if agg_fn is None:
+        keys.insert(0, "unique_id")
+    assert result.columns == [*keys, "model0", "model1"]
+
+    # same as evaluating each step separately
+    cv_nw = nw.from_native(cv_df).with_columns(
+        nw.col("ds").cum_count().over("unique_id", "cutoff", order_by="ds").alias("h")
+    )
+    for h in range(1, cv_nw["h"].max() + 1):
+        expected = nw.from_native(
+            evaluate(
+                cv_nw.filter(nw.col("h") == h).drop("h").to_native(),
+                metrics=metrics,
+                train_df=train_df,
+                level=[80],
+                agg_fn=agg_fn,
+            )
+        )
+        step = result.filter(nw.col("horizon") == h).drop("horizon")
+        for model in ["model0", "model1"]:
+            np.testing.assert_allclose(step[model].to_numpy(), expected[model].to_numpy())
+
+
 @pytest.mark.parametrize("engine", ["pandas", "polars"])
 def test_evaluate_weighted_mean(engine):
     df = pd.DataFrame(
@@ -514,16 +950,50 @@ def test_evaluate_weighted_mean_rejects_non_finite_weights(engine, weight):
         )
 
 
-def test_distributed_evaluate_weighted_mean_not_implemented(setup_series):
-    dask_df = dd.from_pandas(setup_series, npartitions=2)
-    with pytest.raises(NotImplementedError, match="weighted_mean"):
-        evaluate(
-            dask_df,
-            metrics=[mse],
-            models=["model0"],
-            weights="auto",
-            agg_fn="weighted_mean",
+@pytest.mark.skipif(sys.platform == "win32", reason="Distributed tests are not supported on Windows")
+@pytest.mark.parametrize("use_cv, train_has_cutoff", [(False, False), (True, True), (True, False)])
+def test_distributed_evaluate_agg_fn(use_cv, train_has_cutoff):
+    client = Client(processes=False)
+    dask.config.set({"dataframe.shuffle.method": "tasks", "scheduler": "synchronous"})
+    if use_cv:
+        series, train = generate_cv_series(n_series=6, level=[80], seed=0)
+        if not train_has_cutoff:
+            train = train[["unique_id", "ds", "y"]].drop_duplicates()
+    else:
+        series = generate_series(6, n_models=2, level=[80], seed=0)
+        train = series
+    series["unique_id"] = series["unique_id"].astype(int)
+    train["unique_id"] = train["unique_id"].astype(int)
+    weights_df = pd.DataFrame({"unique_id": np.arange(6), "weight": np.arange(1.0, 7.0)})
+    metrics = [mae, rmse, partial(mase, seasonality=7), coverage]
+    keys = ["cutoff", "metric"] if use_cv else ["metric"]
+    for agg_fn, weights in [
+        (None, None),
+        ("mean", None),
+        ("sum", None),
+        ("weighted_mean", "auto"),
+        ("weighted_mean", weights_df),
+    ]:
+        kwargs = dict(
+            metrics=metrics, level=[80], agg_fn=agg_fn, weights=weights
+        )
+        local_res = evaluate(series, train_df=train, **kwargs)
+        distr_res = fa.as_pandas(
+            evaluate(
+                dd.from_pandas(series, npartitions=3),
+                train_df=dd.from_pandas(train, npartitions=2),
+                **kwargs,
+            )
+        )
+        sort_cols = keys if agg_fn is not None else ["unique_id", *keys]
+        pd.testing.assert_frame_equal(
+            local_res.sort_values(sort_cols).reset_index(drop=True),
+            distr_res[local_res.columns].sort_values(sort_cols).reset_index(drop=True),
+            check_dtype=False,
         )
+    with pytest.raises(ValueError, match="`agg_fn` must be one of"):
+        evaluate(dd.from_pandas(series, npartitions=2), metrics=[mae], agg_fn="median")
+    client.close()
 
 
 def daily_mase(y, y_hat, y_train):
@@ -8,6 +8,7 @@ import pytest
 
 from utilsforecast.data import generate_series
 from utilsforecast.feature_engineering import (
+    _calendar_table,
     fourier,
     future_exog_to_historic,
     pipeline,
@@ -89,6 +90,36 @@ def test_fourier_transform(setup_series):
     )
 
 
+def test_fourier_trend_slices():
+    series = generate_series(20, min_length=5, max_length=40, seed=1)
+    h = 3
+    transformed, future = pipeline(
+        series.sample(frac=1.0, random_state=0),
+        features=[trend, partial(fourier, season_length=5, k=2)],
+        freq="D",
+        h=h,
+    )
+    transformed = transformed.sort_values(["unique_id", "ds"])
+    feat_cols = ["trend", "sin1_5", "sin2_5", "cos1_5", "cos2_5"]
+    assert (transformed[feat_cols].dtypes == np.float32).all()
+    assert (future[feat_cols].dtypes == np.float32).all()
+    # every serie ends right before the horizon, at the longest length
+    max_size = series.groupby("unique_id", observed=True).size().max()
+    sizes = transformed.groupby("unique_id", observed=True).size().to_numpy()
+    expected_trend = np.hstack(
+        [np.arange(max_size - size + 1, max_size + 1) for size in sizes]
+    )
+    np.testing.assert_array_equal(transformed["trend"], expected_trend)
+    np.testing.assert_array_equal(
+        future["trend"], np.tile(np.arange(max_size + 1, max_size + h + 1), sizes.size)
+    )
+    np.testing.assert_allclose(
+        transformed["sin1_5"],
+        np.sin(2 * np.pi * expected_trend / 5),
+        atol=1e-4,
+    )
+
+
 def is_weekend(times):
     if isinstance(times, pd.Index):
         dow = times.weekday + 1  # monday=0 in pandas and 1 in polars
@@ -179,3 +210,125 @@ def test_pipeline(setup_series, freq, setup_pipeline, setup_features):
         future_df.drop(columns="unique_id"),
         check_dtype=False,
     )
+
+
+def double_y(df, freq, h=0, id_col="unique_id", time_col="ds"):
+    transformed = df.assign(double_y=2 * df["y"])
+    _, future = trend(df, freq=freq, h=h, id_col=id_col, time_col=time_col)
+    if h > 0:
+        future = future.drop(columns="trend").assign(double_y=np.nan)
+    return transformed, future
+
+
+@pytest.mark.parametrize("h", [0, 2])
+def test_pipeline_shuffled_and_custom_features(setup_series, setup_features, h):
+    series, _ = setup_series
+    shuffled = series.sample(frac=1.0, random_state=0)
+    features = [*setup_features, double_y]
+    transformed, future = pipeline(shuffled, features=features, freq="D", h=h)
+    individual_results = [f(shuffled, freq="D", h=h) for f in features]
+    expected_transformed = reduce_join(
+        [r[0] for r in individual_results], on=["unique_id", "ds", "y"]
+    )
+    pd.testing.assert_frame_equal(
+        transformed.reset_index(drop=True), expected_transformed
+    )
+    if h == 0:
+        assert future.empty
+    else:
+        expected_future = reduce_join(
+            [r[1] for r in individual_results], on=["unique_id", "ds"]
+        )
+        pd.testing.assert_frame_equal(future, expected_future)
+
+
+@pytest.mark.parametrize("freq, pl_freq", [("D", "1d"), ("MS", "1mo")])
+def test_time_features_calendar_lookup(freq, pl_freq):
+    series = generate_series(10, freq=freq, seed=0).sample(frac=1.0, random_state=0)
+    series = series.astype({"unique_id": "int64"})
+    features = ["month", "day", is_weekend]
+
+    def expected(df):
+        times = pd.DatetimeIndex(df["ds"])
+        return df.assign(
+            month=times.month, day=times.day, is_weekend=is_weekend(times)
+        )
+
+    hits = _calendar_table.cache_info().hits
+    for _ in range(2):
+        transformed, future = time_features(series, freq=freq, features=features, h=3)
+        pd.testing.assert_frame_equal(transformed, expected(series))
+        pd.testing.assert_frame_equal(future, expected(future[["unique_id", "ds"]]))
+    assert _calendar_table.cache_info().hits == hits + 1
+
+    # times outside of the calendar are computed from the unique times
+    off_grid = series.assign(
+        ds=series["ds"] + pd.Timedelta(hours=1) * (np.arange(len(series)) % 2)
+    )
+    transformed_off, _ = time_features(off_grid, freq=freq, features=features)
+    pd.testing.assert_frame_equal(transformed_off, expected(off_grid))
+
+    transformed_pl, future_pl = time_features(
+        pl.from_pandas(series), freq=pl_freq, features=features, h=3
+    )
+    pd.testing.assert_frame_equal(
+        transformed_pl.to_pandas(),
+        transformed.reset_index(drop=True),
+        check_dtype=False,
+    )
+    future_pl = future_pl.to_pandas()
+    pd.testing.assert_frame_equal(
+        future_pl, expected(future_pl[["unique_id", "ds"]]), check_dtype=False
+    )
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+def test_time_features_tz_aware(engine):
+    # the clocks move forward at 2 AM of the last sunday of march
+    series = pd.DataFrame(
+        {
+            "unique_id": 0,
+            "ds": pd.date_range(
+                "2024-03-30 20:00", periods=5, freq="h", tz="Europe/Berlin"
+            ),
+            "y": 1.0,
+        }
+    )
+    freq = "h"
+    if engine == "polars":
+        series = pl.from_pandas(series)
+        freq = "1h"
+    transformed, future = time_features(
+        series, freq=freq, features=["hour", "day"], h=3
+    )
+    if engine == "polars":
+        transformed, future = transformed.to_pandas(), future.to_pandas()
+    assert transformed["hour"].tolist() == [20, 21, 22, 23, 0]
+    assert transformed["day"].tolist() == [30, 30, 30, 30, 31]
+    assert future["hour"].tolist() == [1, 3, 4]
+    assert future["day"].tolist() == [31, 31, 31]
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+def test_time_features_sparse_calendar(engine):
+    # a calendar of seconds spanning a year would have ~31M rows
+    series = pd.DataFrame(
+        {
+            "unique_id": [0, 0],
+            "ds": pd.to_datetime(["2020-01-01 00:00", "2021-01-01 10:00"]),
+            "y": 1.0,
+        }
+    )
+    freq = "s"
+    if engine == "polars":
+        series = pl.from_pandas(series)
+        freq = "1s"
+    misses = _calendar_table.cache_info().misses
+    transformed, future = time_features(
+        series, freq=freq, features=["hour", "day"], h=2
+    )
+    assert _calendar_table.cache_info().misses == misses
+    if engine == "polars":
+        transformed, future = transformed.to_pandas(), future.to_pandas()
+    assert transformed["hour"].tolist() == [0, 10]
+    assert future["hour"].tolist() == [10, 10]
@@ -6,10 +6,12 @@ from functools import partial
 import narwhals.stable.v2 as nw
 import numpy as np
 import pandas as pd
+import polars as pl
 import pytest
 
 import utilsforecast.losses as ufl
 from utilsforecast.data import generate_series
+from utilsforecast.evaluation import evaluate
 
 
 warnings.filterwarnings("ignore", message="Unknown section References")
@@ -30,6 +32,15 @@ def setup_series(engine):
     return series, models
 
 
+def _evaluate_loss(df, loss, models):
+    if isinstance(df, pl.LazyFrame):
+        # the checks of lazy frames are kept in the plan until evaluate collects it
+        res = loss(df, models)
+        assert isinstance(res, pl.LazyFrame)
+        return evaluate(df, metrics=[loss], models=models)
+    return loss(df, models)
+
+
 @pytest.fixture
 def quantile_test_data():
     df = pd.DataFrame(
@@ -515,6 +526,42 @@ class TestProbabilisticMetrics:
         for col in models:
             assert col in df_nw.columns
 
+    @pytest.mark.parametrize("engine", ["pandas", "polars"])
+    @pytest.mark.parametrize(
+        "loss_fn",
+        [
+            ufl.quantile_loss,
+            ufl.calibration,
+            partial(ufl.scaled_quantile_loss, seasonality=1),
+        ],
+    )
+    def test_batched_quantiles(self, engine, loss_fn, quantile_models, multi_quantile_models):
+        series, models = setup_series(engine)
+        if "train_df" in inspect.signature(loss_fn).parameters:
+            loss_fn = partial(loss_fn, train_df=series)
+        result = nw.from_native(loss_fn(series, multi_quantile_models, q=[0.1, 0.9]))
+        assert result.columns == ["unique_id", "q", *models]
+        for q in [0.1, 0.9]:
+            expected = nw.from_native(loss_fn(series, quantile_models[q], q=q))
+            batch = result.filter(nw.col("q") == q).drop("q")
+            assert batch["unique_id"].to_list() == expected["unique_id"].to_list()
+            pd_vs_pl(expected.to_pandas(), batch.to_polars(), models)
+        with pytest.raises(ValueError, match="list of 2 prediction columns"):
+            loss_fn(series, quantile_models[0.1], q=[0.1, 0.9])
+
+    @pytest.mark.parametrize("engine", ["pandas", "polars"])
+    def test_batched_coverage(self, engine):
+        series = generate_series(10, n_models=2, level=[80, 95], engine=engine)
+        models = ["model0", "model1"]
+        result = nw.from_native(ufl.coverage(series, models, [95, 80]))
+        assert result.columns == ["unique_id", "level", *models]
+        assert result["level"].to_list() == [95] * 10 + [80] * 10
+        for level in [80, 95]:
+            expected = nw.from_native(ufl.coverage(series, models, level))
+            batch = result.filter(nw.col("level") == level).drop("level")
+            assert batch["unique_id"].to_list() == expected["unique_id"].to_list()
+            pd_vs_pl(expected.to_pandas(), batch.to_polars(), models)
+
     @pytest.mark.parametrize("engine", ["pandas", "polars"])
     def test_scaled_crps(self, engine, multi_quantile_models):
         series, models = setup_series(engine)
@@ -567,3 +614,37 @@ class TestTweedieDeviance:
             assert td_nw[col].null_count() == 0, (
                 f"NaNs found in {engine} DataFrame for power {power}"
             )
+
+    @pytest.mark.parametrize("engine", ["pandas", "polars", "polars-lazy"])
+    def test_invalid_inputs(self, engine):
+        series, models = setup_series(engine.split("-")[0])
+        series_nw = nw.from_native(series)
+        if engine == "polars-lazy":
+            series_nw = series_nw.lazy()
+        negative_target = series_nw.with_columns(nw.col("y") - 1e6).to_native()
+        with pytest.raises(ValueError, match="target values to be strictly positive"):
+            _evaluate_loss(
+                negative_target, partial(ufl.tweedie_deviance, power=2), models
+            )
+        negative_preds = series_nw.with_columns(-nw.col(models[-1])).to_native()
+        with pytest.raises(ValueError, match="predictions must be strictly positive"):
+            _evaluate_loss(
+                negative_preds, partial(ufl.tweedie_deviance, power=1.5), models
+            )
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars", "polars-lazy"])
+def test_rmae_missing_baseline(engine):
+    series, models = setup_series(engine.split("-")[0])
+    series_nw = nw.from_native(series)
+    if engine == "polars-lazy":
+        series_nw = series_nw.lazy()
+    missing_baseline = series_nw.with_columns(
+        nw.when(nw.col("y") > nw.col("y").median())
+        .then(nw.col(models[-1]))
+        .alias(models[-1])
+    ).to_native()
+    with pytest.raises(ValueError, match="contains NaNs"):
+        _evaluate_loss(
+            missing_baseline, partial(ufl.rmae, baseline=models[-1]), models[:1]
+        )
@@ -7,7 +7,15 @@ import pandas as pd
 import polars as pl
 import pytest
 
-from utilsforecast.preprocessing import fill_gaps
+from utilsforecast.preprocessing import (
+    _id_time_grid_pd,
+    _sorted_grid_indexer,
+    fill_gaps,
+    fill_gaps_chunked,
+    gap_report,
+    infer_freq,
+    temporal_aggregate,
+)
 
 
 @pytest.fixture
@@ -374,6 +382,467 @@ class TestFillGapsComprehensive:
         verify_fill_results(data, filled, freq, start, end)
 
 
+class TestFillGapsSorted:
+    """Test that sorted inputs, which are filled without reindexing, match unsorted ones."""
+
+    @pytest.mark.parametrize("freq", get_pandas_freqs())
+    @pytest.mark.parametrize("start", ["global", "per_serie"])
+    @pytest.mark.parametrize("end", ["global", "per_serie"])
+    def test_fill_gaps_sorted(self, freq, start, end):
+        dates = generate_test_dates(freq, N_PERIODS)
+        data = create_test_data(dates, N_PERIODS, include_start=False, include_end=True)
+        data["unique_id"] = data["unique_id"].map({1: "b", 2: "a"})
+        data["x"] = np.arange(N_PERIODS)
+        data["flag"] = data["y"] > N_PERIODS / 2
+        sorted_data = data.sort_values(["unique_id", "ds"], ignore_index=True)
+        expected = fill_gaps(data, freq, start=start, end=end)
+        filled = fill_gaps(sorted_data, freq, start=start, end=end)
+        pd.testing.assert_frame_equal(filled, expected)
+
+    def test_fill_gaps_sorted_warns_on_lost_values(self, warning_df):
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            filled = fill_gaps(warning_df, "YS")
+        assert "values were lost" in str(w[0].message)
+        assert filled["y"].count() == warning_df.shape[0] - 1
+
+    def test_fill_gaps_sorted_duplicates(self):
+        df = pd.DataFrame(
+            {
+                "unique_id": ["a", "a", "a", "b"],
+                "ds": pd.to_datetime(
+                    ["2020-01-01", "2020-01-03", "2020-01-03", "2020-01-01"]
+                ),
+                "y": [1.0, 2.0, 3.0, 4.0],
+            }
+        )
+        kwargs = dict(freq="D", id_col="unique_id", time_col="ds")
+        grid, sizes = _id_time_grid_pd(df, start="per_serie", end="global", **kwargs)
+        assert _sorted_grid_indexer(df, grid, sizes, **kwargs) is None
+        indexer = _sorted_grid_indexer(df.drop(index=2), grid, sizes, **kwargs)
+        np.testing.assert_array_equal(indexer, [0, -1, 1, 2, -1, -1])
+        with pytest.raises(ValueError, match="non-unique"):
+            fill_gaps(df, "D")
+
+
+class TestFillGapsFillStrategy:
+    """Test filling the values of the added rows."""
+
+    @pytest.fixture
+    def gaps_df(self):
+        return pd.DataFrame(
+            {
+                "unique_id": [0, 0, 0, 0, 1, 1, 1],
+                "ds": pd.to_datetime(
+                    [
+                        "2020-01-01",
+                        "2020-01-03",
+                        "2020-01-04",
+                        "2020-01-07",
+                        "2020-01-02",
+                        "2020-01-03",
+                        "2020-01-06",
+                    ]
+                ),
+                "y": [1.0, 3.0, np.nan, 7.0, 10.0, 20.0, 50.0],
+                "count": [1, 2, 3, 4, 5, 6, 7],
+                "flag": [True, False, True, True, False, False, True],
+            }
+        )
+
+    @pytest.mark.parametrize("engine", ["pandas", "polars"])
+    @pytest.mark.parametrize("is_sorted", [True, False])
+    def test_fill_strategy(self, gaps_df, engine, is_sorted):
+        if not is_sorted:
+            gaps_df = gaps_df.iloc[::-1]
+        freq = "D"
+        if engine == "polars":
+            gaps_df = pl.from_pandas(gaps_df)
+            freq = "1d"
+        filled = fill_gaps(
+            gaps_df,
+            freq,
+            fill_strategy={"y": "interpolate", "count": "zero", "flag": "ffill"},
+        )
+        if engine == "polars":
+            filled = filled.to_pandas()
+        # the existing missing value is kept and the interpolation skips it
+        np.testing.assert_allclose(
+            filled["y"],
+            [1, 2, 3, np.nan, 5, 6, 7, 10, 20, 30, 40, 50, np.nan],
+        )
+        assert filled["count"].dtype == np.int64
+        assert filled["count"].tolist() == [1, 0, 2, 3, 0, 0, 4, 5, 6, 0, 0, 7, 0]
+        assert filled["flag"].dtype == bool
+        assert filled["flag"].tolist() == [
+            True, True, False, True, True, True, True,
+            False, False, False, False, True, True,
+        ]
+
+    @pytest.mark.parametrize("engine", ["pandas", "polars"])
+    def test_fill_strategy_constant(self, gaps_df, engine):
+        freq = "D"
+        if engine == "polars":
+            gaps_df = pl.from_pandas(gaps_df)
+            freq = "1d"
+        filled = fill_gaps(
+            gaps_df, freq, start="global", fill_strategy={"count": -1, "y": "ffill"}
+        )
+        if engine == "polars":
+            filled = filled.to_pandas()
+        assert filled["count"].tolist() == [1, -1, 2, 3, -1, -1, 4, -1, 5, 6, -1, -1, 7, -1]
+        # there's no previous value for the first row of the second serie
+        np.testing.assert_allclose(
+            filled["y"],
+            [1, 1, 3, np.nan, 3, 3, 7, np.nan, 10, 20, 20, 20, 50, 50],
+        )
+
+    @pytest.mark.parametrize(
+        "fill_strategy, match",
+        [
+            ({"ds": "zero"}, "Can't fill 'ds'"),
+            ({"z": 0}, "Can't fill 'z'"),
+            ({"y": "bfill"}, "Unknown fill strategy 'bfill'"),
+        ],
+    )
+    def test_fill_strategy_errors(self, gaps_df, fill_strategy, match):
+        with pytest.raises(ValueError, match=match):
+            fill_gaps(gaps_df, "D", fill_strategy=fill_strategy)
+
+
+class TestFillGapsBusinessDays:
+    """Test business day frequencies against pandas' date ranges."""
+
+    holidays = pd.to_datetime(["2020-01-06", "2020-01-20", "2020-02-14"])
+
+    @pytest.mark.parametrize(
+        "freq",
+        [
+            "2B",
+            "C",
+            pd.offsets.CustomBusinessDay(holidays=holidays),
+            pd.offsets.CustomBusinessDay(
+                n=3, holidays=holidays, weekmask="Sun Mon Tue Wed Thu"
+            ),
+        ],
+    )
+    @pytest.mark.parametrize("start", ["global", "per_serie", "2019-12-28"])
+    @pytest.mark.parametrize("is_sorted", [True, False])
+    def test_fill_gaps_business_days(self, freq, start, is_sorted):
+        dates = pd.date_range("2020-01-01", periods=N_PERIODS, freq=freq)
+        data = create_test_data(dates, N_PERIODS, include_start=False, include_end=True)
+        if is_sorted:
+            data = data.sort_values(["unique_id", "ds"], ignore_index=True)
+        filled = fill_gaps(data, freq, start=start)
+        expected = []
+        for uid, first in data.groupby("unique_id")["ds"].min().items():
+            serie_start = {"global": data["ds"].min(), "per_serie": first}.get(start, start)
+            expected.append(
+                pd.DataFrame(
+                    {
+                        "unique_id": uid,
+                        "ds": pd.date_range(serie_start, dates[-1], freq=freq),
+                    }
+                )
+            )
+        expected = pd.concat(expected, ignore_index=True).merge(data, how="left")
+        pd.testing.assert_frame_equal(filled, expected)
+        report = gap_report(data, freq, start=start)
+        np.testing.assert_array_equal(
+            report["missing"], expected.groupby("unique_id")["y"].size() - N_PERIODS // 2
+        )
+
+    def test_polars_pandas_offset(self, polars_datetime_df):
+        with pytest.raises(ValueError, match="valid polars offset"):
+            fill_gaps(polars_datetime_df, pd.offsets.BusinessDay())
+
+
+class TestGapReport:
+    """Test that the gap report matches the filled dataframe."""
+
+    @staticmethod
+    def expected_report(data, filled):
+        missing = filled["y"].isna()
+        run_ids = (~missing).groupby(filled["unique_id"]).cumsum()
+        runs = missing.groupby([filled["unique_id"], run_ids]).sum()
+        expected = filled.groupby("unique_id").size()
+        actual = data.groupby("unique_id").size()
+        present = filled.groupby("unique_id")["y"].count()
+        return pd.DataFrame(
+            {
+                "expected": expected,
+                "actual": actual,
+                "missing": expected - present,
+                "largest_gap": runs.groupby(level=0).max(),
+                "off_freq": actual - present,
+            }
+        ).reset_index()
+
+    @pytest.mark.parametrize("freq", get_pandas_freqs())
+    @pytest.mark.parametrize("start", ["global", "per_serie"])
+    @pytest.mark.parametrize("end", ["global", "per_serie"])
+    def test_gap_report(self, freq, start, end):
+        dates = generate_test_dates(freq, N_PERIODS)
+        data = create_test_data(dates, N_PERIODS, include_start=False, include_end=True)
+        data = data.sample(frac=1.0, random_state=0)
+        report = gap_report(data, freq, start=start, end=end)
+        filled = fill_gaps(data, freq, start=start, end=end)
+        expected = self.expected_report(data, filled)
+        pd.testing.assert_frame_equal(report, expected, check_dtype=False)
+
+    @pytest.mark.parametrize("freq", get_polars_freqs() + ["2d", "6h", "3mo"])
+    def test_gap_report_polars(self, freq):
+        dates = pl.datetime_range(
+            datetime(2000, 1, 31), datetime(2100, 1, 1), interval=freq, eager=True
+        )[:N_PERIODS]
+        data = create_test_data(
+            dates.to_pandas(), N_PERIODS, include_start=False, include_end=True
+        )
+        data = pl.from_pandas(data.sample(frac=1.0, random_state=0))
+        report = gap_report(data, freq, start="global")
+        filled = fill_gaps(data, freq, start="global")
+        expected = self.expected_report(data.to_pandas(), filled.to_pandas())
+        pd.testing.assert_frame_equal(report.to_pandas(), expected, check_dtype=False)
+
+    @pytest.mark.parametrize("engine", ["pandas", "polars"])
+    def test_gap_report_off_freq(self, warning_df, engine):
+        if engine == "polars":
+            warning_df = pl.from_pandas(warning_df)
+        report = gap_report(warning_df, "YS" if engine == "pandas" else "1y")
+        if engine == "polars":
+            report = report.to_pandas()
+        assert report["expected"].tolist() == [4, 3]
+        assert report["actual"].tolist() == [3, 2]
+        assert report["missing"].tolist() == [1, 2]
+        assert report["largest_gap"].tolist() == [1, 2]
+        assert report["off_freq"].tolist() == [0, 1]
+
+
+class TestFillGapsChunked:
+    """Test that the filled chunks match the result of filling all the series."""
+
+    @pytest.fixture
+    def panel(self):
+        dates = generate_test_dates("D", N_PERIODS)
+        data = pd.concat(
+            [
+                create_test_data(dates, N_PERIODS, include_start=False, include_end=True)
+                .assign(unique_id=lambda df, k=k: df["unique_id"] + 2 * k)
+                for k in range(4)
+            ],
+            ignore_index=True,
+        )
+        data["count"] = np.arange(data.shape[0])
+        data["flag"] = data["count"] % 2 == 0
+        return data.sample(frac=1.0, random_state=0)
+
+    @pytest.mark.parametrize("engine", ["pandas", "polars"])
+    @pytest.mark.parametrize("start", ["global", "per_serie"])
+    @pytest.mark.parametrize("end", ["global", "per_serie"])
+    @pytest.mark.parametrize("fill_strategy", [None, {"y": "interpolate", "count": "ffill"}])
+    def test_fill_gaps_chunked(self, panel, engine, start, end, fill_strategy, tmp_path):
+        freq = "D"
+        if engine == "polars":
+            panel = pl.from_pandas(panel)
+            freq = "1d"
+        kwargs = dict(start=start, end=end, fill_strategy=fill_strategy)
+        expected = fill_gaps(panel, freq, **kwargs)
+        chunks = list(fill_gaps_chunked(panel, freq, max_rows=150, **kwargs))
+        assert len(chunks) > 2
+        path = tmp_path / "filled.parquet"
+        assert fill_gaps_chunked(panel, freq, max_rows=150, output_path=path, **kwargs) is None
+        if engine == "pandas":
+            assert max(chunk.shape[0] for chunk in chunks) <= 150
+            pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+            written = pd.read_parquet(path)
+            pd.testing.assert_frame_equal(written, expected, check_dtype=False)
+        else:
+            assert pl.concat(chunks).equals(expected)
+            assert pl.read_parquet(path).equals(expected)
+
+    def test_fill_gaps_chunked_max_rows(self, panel):
+        with pytest.raises(ValueError, match="`max_rows` must be a positive integer"):
+            fill_gaps_chunked(panel, "D", max_rows=0)
+
+
+class TestInferFreq:
+    """Test the frequencies inferred for each serie."""
+
+    def test_infer_freq_pandas(self):
+        freqs = [f for f in get_pandas_freqs() if isinstance(f, str)]
+        freqs += ["2W-TUE", "QS-OCT", "YS-JUL", "YE-MAR", "90min"]
+        rng = np.random.default_rng(0)
+        series = []
+        for freq in freqs:
+            dates = generate_test_dates(freq, 40)
+            idxs = np.sort(rng.choice(40, size=30, replace=False))
+            series.append(pd.DataFrame({"unique_id": freq, "ds": dates[idxs]}))
+        # different time zones can't be in the same column
+        df = pd.concat([s for s in series if s["ds"].dt.tz is None])
+        inferred = infer_freq(df.sample(frac=1.0, random_state=0))
+        for _, serie in inferred.iterrows():
+            expected = generate_test_dates(serie["unique_id"], 40)
+            dates = pd.date_range(expected[0], periods=40, freq=serie["freq"])
+            pd.testing.assert_index_equal(dates, expected, check_names=False)
+        tz_df = next(s for s in series if s["ds"].dt.tz is not None)
+        assert infer_freq(tz_df)["freq"].item() == tz_df["unique_id"].iloc[0]
+        seconds = inferred.set_index("unique_id")["seconds"]
+        assert seconds["D"] == 86_400
+        assert seconds["W"] == 7 * 86_400
+        assert 28 * 86_400 <= seconds["MS"] <= 31 * 86_400
+
+    @pytest.mark.parametrize("engine", ["pandas", "polars"])
+    def test_infer_freq_empty(self, engine):
+        df = pd.DataFrame(
+            {
+                "unique_id": pd.Series([], dtype=str),
+                "ds": pd.Series([], dtype="datetime64[ns]"),
+            }
+        )
+        if engine == "polars":
+            df = pl.from_pandas(df)
+        inferred = infer_freq(df)
+        assert inferred.shape == (0, 3)
+        assert list(inferred.columns) == ["unique_id", "freq", "seconds"]
+
+    def test_infer_freq_polars(self):
+        freqs = get_polars_freqs() + ["6h", "2w", "3mo"]
+        df = pl.concat(
+            [
+                pl.DataFrame(
+                    {
+                        "unique_id": freq,
+                        "ds": pl.datetime_range(
+                            datetime(2000, 1, 31),
+                            datetime(2100, 1, 1),
+                            interval=freq,
+                            eager=True,
+                        )[:20],
+                    }
+                )
+                for freq in freqs
+            ]
+        )
+        inferred = infer_freq(df.sample(fraction=1.0, shuffle=True, seed=0))
+        expected = {freq: freq for freq in freqs}
+        expected["3mo"] = "1q"
+        assert dict(inferred.select("unique_id", "freq").iter_rows()) == expected
+        seconds = dict(inferred.select("unique_id", "seconds").iter_rows())
+        assert seconds["1d"] == 86_400
+        assert seconds["6h"] == 6 * 3_600
+        assert seconds["2w"] == 14 * 86_400
+
+    @pytest.mark.parametrize("engine", ["pandas", "polars"])
+    def test_infer_freq_int(self, engine):
+        df = pd.DataFrame(
+            {
+                "unique_id": [1, 1, 1, 1, 2, 3, 3, 3],
+                "ds": [1, 3, 5, 9, 7, 0, 10, 10],
+            }
+        )
+        if engine == "polars":
+            df = pl.from_pandas(df)
+        inferred = infer_freq(df)
+        if engine == "polars":
+            inferred = inferred.to_pandas()
+        # the most common difference and missing with a single distinct timestamp
+        assert inferred["freq"].tolist()[0] == 2
+        assert pd.isna(inferred["freq"].tolist()[1])
+        assert inferred["freq"].tolist()[2] == 10
+
+    def test_infer_freq_business_days(self):
+        df = pd.DataFrame(
+            {"unique_id": 0, "ds": pd.bdate_range("2020-01-01", periods=20)}
+        )
+        assert infer_freq(df)["freq"].item() == "B"
+        # polars doesn't have a business day alias, '1d' would fill the weekends
+        with pytest.warns(UserWarning, match="business days"):
+            inferred = infer_freq(pl.from_pandas(df))
+        assert inferred["freq"].item() is None
+
+
+class TestTemporalAggregate:
+    """Test the aggregation to coarser frequencies against pandas' resample."""
+
+    @pytest.fixture
+    def hourly_df(self):
+        rng = np.random.default_rng(0)
+        dates = pd.date_range("2019-12-25", periods=24 * 90, freq="h", tz="Europe/Berlin")
+        series = []
+        for uid in ["b", "a"]:
+            idxs = np.sort(rng.choice(dates.size, size=1_000, replace=False))
+            series.append(
+                pd.DataFrame(
+                    {
+                        "unique_id": uid,
+                        "ds": dates[idxs],
+                        "y": rng.normal(size=idxs.size),
+                        "count": rng.integers(0, 10, idxs.size),
+                    }
+                )
+            )
+        df = pd.concat(series, ignore_index=True)
+        df.loc[rng.choice(df.shape[0], size=100), "y"] = np.nan
+        return df
+
+    @pytest.mark.parametrize("freq", ["6h", "D", "W", "W-TUE", "MS", "ME", "QS-NOV", "YE"])
+    @pytest.mark.parametrize("tz", [None, "Europe/Berlin"])
+    @pytest.mark.parametrize("is_sorted", [True, False])
+    def test_temporal_aggregate(self, hourly_df, freq, tz, is_sorted):
+        if tz is None:
+            hourly_df["ds"] = hourly_df["ds"].dt.tz_localize(None)
+        df = hourly_df if is_sorted else hourly_df.sample(frac=1.0, random_state=0)
+        aggs = {"y": ["sum", "mean", "last", "min", "max"], "count": "sum"}
+        res = temporal_aggregate(df, freq, aggs)
+        expected = hourly_df.groupby(["unique_id", pd.Grouper(key="ds", freq=freq)]).agg(
+            y_sum=("y", "sum"),
+            y_mean=("y", "mean"),
+            y_last=("y", "last"),
+            y_min=("y", "min"),
+            y_max=("y", "max"),
+            count=("count", "sum"),
+            size=("count", "size"),
+        )
+        expected = expected[expected["size"] > 0].drop(columns="size").reset_index()
+        pd.testing.assert_frame_equal(res, expected)
+
+    def test_temporal_aggregate_int(self):
+        df = pd.DataFrame({"unique_id": [1, 1, 1, 2], "ds": [0, 1, 5, 3], "y": [1.0, 2, 3, 4]})
+        expected = pd.DataFrame(
+            {"unique_id": [1, 1, 2], "ds": [0, 4, 2], "y": [3.0, 3.0, 4.0]}
+        )
+        pd.testing.assert_frame_equal(temporal_aggregate(df, 2, {"y": "sum"}), expected)
+        res = temporal_aggregate(pl.from_pandas(df), 2, {"y": "sum"})
+        pd.testing.assert_frame_equal(res.to_pandas(), expected)
+
+    @pytest.mark.parametrize("nan_to_null", [True, False])
+    def test_temporal_aggregate_polars(self, hourly_df, nan_to_null):
+        df = pl.from_pandas(
+            hourly_df.sample(frac=1.0, random_state=0), nan_to_null=nan_to_null
+        )
+        aggs = {"y": ["sum", "mean", "last", "min", "max"], "count": "max"}
+        res = temporal_aggregate(df, "1d", aggs)
+        assert res.columns == [
+            "unique_id", "ds", "y_sum", "y_mean", "y_last", "y_min", "y_max", "count"
+        ]
+        expected = temporal_aggregate(hourly_df, "D", aggs)
+        pd.testing.assert_frame_equal(res.to_pandas(), expected, check_dtype=False)
+        with pytest.raises(ValueError, match="valid polars offset"):
+            temporal_aggregate(df, pd.offsets.Day(), aggs)
+
+    @pytest.mark.parametrize(
+        "aggs, match",
+        [
+            ({"ds": "sum"}, "Can't aggregate 'ds'"),
+            ({"z": "sum"}, "Can't aggregate 'z'"),
+            ({"y": ["sum", "median"]}, "Unknown aggregation 'median'"),
+        ],
+    )
+    def test_temporal_aggregate_errors(self, hourly_df, aggs, match):
+        with pytest.raises(ValueError, match=match):
+            temporal_aggregate(hourly_df, "D", aggs)
+
+
 # --- Error tests for incompatible frequency and time column ---
 
 
@@ -0,0 +1,83 @@
+import narwhals.stable.v2 as nw
+import numpy as np
+import pandas as pd
+import pytest
+
+from utilsforecast.data import generate_series
+from utilsforecast.losses import coverage, mae, nd, quantile_loss, rmse, wape
+from utilsforecast.streaming import (
+    CoverageAccumulator,
+    MAEAccumulator,
+    NDAccumulator,
+    QuantileLossAccumulator,
+    RMSEAccumulator,
+    WAPEAccumulator,
+)
+
+MODELS = ["model0", "model1"]
+QUANTILE_MODELS = {"model0": "model0-lo-80", "model1": "model1-lo-80"}
+
+CASES = [
+    (MAEAccumulator, mae, {"models": MODELS}),
+    (RMSEAccumulator, rmse, {"models": MODELS}),
+    (WAPEAccumulator, wape, {"models": MODELS}),
+    (NDAccumulator, nd, {"models": MODELS}),
+    (QuantileLossAccumulator, quantile_loss, {"models": QUANTILE_MODELS, "q": 0.1}),
+    (CoverageAccumulator, coverage, {"models": MODELS, "level": 80}),
+]
+
+
+def _batches(df, n_batches):
+    # shuffle so that every serie is split across batches
+    nw_df = nw.from_native(df)
+    rng = np.random.default_rng(0)
+    idxs = rng.permutation(nw_df.shape[0])
+    return [
+        nw_df[np.sort(chunk).tolist()].to_native()
+        for chunk in np.array_split(idxs, n_batches)
+    ]
+
+
+def _assert_same(result, expected):
+    result = nw.from_native(result)
+    expected = nw.from_native(expected)
+    assert result.columns == expected.columns
+    for col in expected.columns:
+        if expected[col].dtype.is_numeric():
+            np.testing.assert_allclose(result[col].to_numpy(), expected[col].to_numpy())
+        else:
+            assert result[col].to_list() == expected[col].to_list()
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+@pytest.mark.parametrize("acc_cls, loss, kwargs", CASES)
+def test_accumulator_matches_loss(engine, acc_cls, loss, kwargs):
+    series = generate_series(10, n_models=2, level=[80], engine=engine)
+    acc = acc_cls(**kwargs)
+    for batch in _batches(series, 4):
+        acc.update(batch)
+    _assert_same(acc.result(), loss(series, **kwargs))
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+@pytest.mark.parametrize("acc_cls, loss, kwargs", CASES)
+def test_accumulator_merge(engine, acc_cls, loss, kwargs):
+    series = generate_series(10, n_models=2, level=[80], engine=engine)
+    series = nw.from_native(series).with_columns(cutoff=nw.lit(0)).to_native()
+    first, second, third = _batches(series, 3)
+    acc1 = acc_cls(**kwargs).update(first)
+    acc2 = acc_cls(**kwargs).update(second).update(third)
+    _assert_same(acc1.merge(acc2).result(), loss(series, **kwargs))
+
+
+def test_accumulator_errors():
+    series = generate_series(2, n_models=1)
+    with pytest.raises(ValueError, match="hasn't received any data"):
+        MAEAccumulator(["model0"]).result()
+    with pytest.raises(ValueError, match="same type"):
+        MAEAccumulator(["model0"]).merge(RMSEAccumulator(["model0"]))
+    with pytest.raises(ValueError, match="same type"):
+        MAEAccumulator(["model0"]).merge(MAEAccumulator(["model0"], target_col="x"))
+    acc = MAEAccumulator(["model0"]).update(series)
+    with pytest.raises(ValueError, match="grouped by"):
+        acc.update(series.assign(cutoff=pd.Timestamp("2000-01-01")))
@@ -12,6 +12,7 @@ try:
     import polars as pl
     from polars import DataFrame as pl_DataFrame
     from polars import Expr as pl_Expr
+    from polars import LazyFrame as pl_LazyFrame
     from polars import Series as pl_Series
 
     DFType = TypeVar("DFType", pd.DataFrame, polars.DataFrame)
@@ -23,6 +24,8 @@ except ImportError:
 
     class pl_Expr: ...
 
+    class pl_LazyFrame: ...
+
     class pl_Series: ...
 
     DFType = pd.DataFrame
@@ -78,5 +81,6 @@ AnyDFType = TypeVar(
     "DaskDataFrame",
     pd.DataFrame,
     "pl_DataFrame",
+    "pl_LazyFrame",
     "SparkDataFrame",
 )
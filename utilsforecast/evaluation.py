@@ -1,23 +1,71 @@
 """Model performance evaluation"""
 
-__all__ = ['evaluate']
+__all__ = [
+    'evaluate',
+    'evaluate_dataset',
+    'bootstrap_ci',
+    'paired_bootstrap_test',
+    'EvaluationPlan',
+    'EvaluationCache',
+]
 
 
+import hashlib
 import inspect
+import multiprocessing
+import os
+import pickle
 import re
 import reprlib
-from typing import Callable, Dict, List, Optional, Union, get_origin
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+    get_args,
+    get_origin,
+)
 
 import narwhals.stable.v2 as nw
 import numpy as np
 import pandas as pd
+from packaging.version import Version
 
+import utilsforecast.losses as ufl
 import utilsforecast.processing as ufp
 
-from .compat import AnyDFType, DFType, DistributedDFType, pl, pl_DataFrame
-from .losses import _get_group_cols
+from .compat import (
+    AnyDFType,
+    DFType,
+    DistributedDFType,
+    pl,
+    pl_DataFrame,
+    pl_LazyFrame,
+)
+from .losses import _HORIZON_COL, _get_group_cols
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
 
 _WEIGHT_COL = "__utilsforecast_weight"
+_SHARD_COL = "__utilsforecast_shard"
+_ROW_COL = "__utilsforecast_row"
+_PARTITION_COL = "__utilsforecast_partition"
+_HASH_PRIME = np.uint64(0x100000001B3)
+# the cache directories hold the cells whose hashes start with the same 4 bits
+_CACHE_BUCKET_SHIFT = np.uint64(60)
+_CACHE_MAX_SEGMENTS = 8
+_FLOAT_DTYPES = {"float32": nw.Float32, "float64": nw.Float64}
 
 
 def _function_name(f: Callable):
@@ -29,11 +77,80 @@ def _function_name(f: Callable):
     return name
 
 
+def _is_builtin_loss(f: Callable) -> bool:
+    return getattr(f, "func", f).__module__ == ufl.__name__
+
+
+# losses whose value for every serie depends on all the series of the frame
+_FRAME_LOSSES = (ufl.wape,)
+
+
+def _is_frame_loss(f: Callable) -> bool:
+    return getattr(f, "func", f) in _FRAME_LOSSES
+
+
+def _collect_streaming(df: pl_LazyFrame, streaming: bool = True) -> pl_DataFrame:
+    if not streaming:
+        return df.collect()
+    if Version(pl.__version__) < Version("1.25"):
+        return df.collect(streaming=True)
+    return df.collect(engine="streaming")
+
+
+def _can_stream(*dfs: Optional[pl_LazyFrame]) -> bool:
+    # the streaming engine can't group by categoricals from a local string cache
+    return not any(
+        isinstance(dtype, pl.Categorical)
+        for df in dfs
+        if df is not None
+        for dtype in df.collect_schema().dtypes()
+    )
+
+
+def _unique_ids(df: Union[DFType, pl_LazyFrame], id_col: str) -> set:
+    if isinstance(df, pl_LazyFrame):
+        # only reads the id column
+        return set(df.select(pl.col(id_col).unique()).collect()[id_col])
+    return set(df[id_col].unique())
+
+
+def _check_missing_series(
+    df: Union[DFType, pl_LazyFrame],
+    train_df: Union[DFType, pl_LazyFrame],
+    id_col: str,
+) -> None:
+    missing_series = _unique_ids(df, id_col) - _unique_ids(train_df, id_col)
+    if missing_series:
+        raise ValueError(
+            f"The following series are missing from the train_df: {reprlib.repr(missing_series)}"
+        )
+
+
 def _check_weights_are_finite(weights: nw.DataFrame) -> None:
     if not weights[_WEIGHT_COL].is_finite().fill_null(False).all():
         raise ValueError("`weights` must contain only finite values.")
 
 
+def _accepts_list(param: inspect.Parameter) -> bool:
+    return any(get_origin(arg) is list for arg in get_args(param.annotation))
+
+
+def _name_batches(
+    df: DFType, key_col: str, keys: List[Any], names: List[str]
+) -> DFType:
+    # the batches are already in the order of the keys
+    return (
+        nw.from_native(df)
+        .with_columns(
+            nw.col(key_col)
+            .replace_strict(dict(zip(keys, names)), return_dtype=nw.String)
+            .alias("metric")
+        )
+        .drop(key_col)
+        .to_native()
+    )
+
+
 def _quantiles_from_levels(level: List[int]) -> np.ndarray:
     """Returns quantiles associated to `level` and the sorte columns of `model_name`"""
     level = sorted(level)
@@ -50,6 +167,50 @@ def _models_from_levels(model_name: str, level: List[int]) -> List[str]:
     return cols
 
 
+def _hash_columns(df: nw.DataFrame, cols: List[str]) -> np.ndarray:
+    """Row hashes of `cols` that are stable across processes."""
+    hashes = np.zeros(df.shape[0], dtype=np.uint64)
+    for col in cols:
+        hashes = hashes * _HASH_PRIME + pd.util.hash_array(df[col].to_numpy())
+    return hashes
+
+
+def _segment_hashes(
+    row_hashes: np.ndarray, codes: np.ndarray, n_segments: int
+) -> np.ndarray:
+    """Hash of the rows of every segment, regardless of their order."""
+    order = np.argsort(codes, kind="stable")
+    starts = np.searchsorted(codes[order], np.arange(n_segments))
+    return pd.util.hash_array(np.add.reduceat(row_hashes[order], starts))
+
+
+def _mix_hashes(a: np.ndarray, b: Union[np.ndarray, np.uint64]) -> np.ndarray:
+    return pd.util.hash_array(a * _HASH_PRIME + b)
+
+
+def _str_hash(value: str) -> np.uint64:
+    digest = hashlib.sha1(value.encode()).digest()
+    return np.frombuffer(digest[:8], dtype=np.uint64)[0]
+
+
+def _metric_identity(spec: "_MetricSpec", level: Optional[List[int]]) -> np.uint64:
+    fn = getattr(spec.fn, "func", spec.fn)
+    args = getattr(spec.fn, "args", ())
+    keywords = sorted(getattr(spec.fn, "keywords", {}).items())
+    if spec.kind == "plain":
+        level = None
+    # the arguments are hashed by content, their repr can be truncated
+    try:
+        params = pickle.dumps((args, keywords, level), protocol=4)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        raise ValueError(
+            f"The arguments of the metric '{spec.name}' can't be pickled, so its "
+            "scores can't be cached. Please evaluate it without `cache`."
+        ) from e
+    digest = hashlib.sha1(params).hexdigest()
+    return _str_hash(f"{fn.__module__}.{fn.__qualname__}|{digest}")
+
+
 def _get_model_cols(
     cols: List[str],
     id_col: str,
@@ -60,7 +221,7 @@ def _get_model_cols(
     return [
         c
         for c in cols
-        if c not in [id_col, time_col, target_col, cutoff_col]
+        if c not in [id_col, time_col, target_col, cutoff_col, _HORIZON_COL]
         and not re.search(r"-(?:lo|hi)-\d+", c)
     ]
 
@@ -81,19 +242,22 @@ def _get_weights(
             .group_by(*group_cols)
             .agg(nw.col(target_col).sum().alias(_WEIGHT_COL))
         )
+        if isinstance(weights_df, nw.LazyFrame):
+            weights_df = weights_df.collect()
         _check_weights_are_finite(weights_df)
         return weights_df
 
+    df_cols = nw.from_native(df).columns
     weights_nw = nw.from_native(weights)
     if "weight" not in weights_nw.columns:
         raise ValueError("`weights` dataframe must contain a 'weight' column.")
-    if cutoff_col in weights_nw.columns and cutoff_col not in df.columns:
+    if cutoff_col in weights_nw.columns and cutoff_col not in df_cols:
         raise ValueError(
             f"`weights` contains '{cutoff_col}', but `df` does not. "
             "Remove the cutoff column from weights or provide cutoff-level forecasts."
         )
     join_cols = [id_col]
-    if cutoff_col in df.columns and cutoff_col in weights_nw.columns:
+    if cutoff_col in df_cols and cutoff_col in weights_nw.columns:
         join_cols = [cutoff_col, id_col]
     missing_cols = set(join_cols) - set(weights_nw.columns)
     if missing_cols:
@@ -121,7 +285,7 @@ def _weighted_mean_agg(
     cutoff_col: str,
     model_cols: List[str],
 ) -> DFType:
-    group_cols = [cutoff_col, "metric"] if cutoff_col in df.columns else ["metric"]
+    group_cols = [c for c in (cutoff_col, _HORIZON_COL, "metric") if c in df.columns]
     join_cols = [id_col]
     weights_df = _get_weights(
         df=forecasts_df,
@@ -133,100 +297,117 @@ def _weighted_mean_agg(
     if cutoff_col in df.columns and cutoff_col in weights_df.columns:
         join_cols = [cutoff_col, id_col]
 
-    df_nw = nw.from_native(df).join(weights_df, on=join_cols, how="left")
+    df_nw = (
+        nw.from_native(df)
+        .join(weights_df, on=join_cols, how="left")
+        .sort(*group_cols)
+    )
     if df_nw[_WEIGHT_COL].is_null().any():
         raise ValueError("`weights` is missing entries for some evaluation rows.")
 
-    weighted_cols = [f"__utilsforecast_weighted_{i}" for i, _ in enumerate(model_cols)]
-    effective_weight_cols = [
-        f"__utilsforecast_effective_weight_{i}" for i, _ in enumerate(model_cols)
-    ]
-    valid_count_cols = [
-        f"__utilsforecast_valid_count_{i}" for i, _ in enumerate(model_cols)
-    ]
-    df_nw = df_nw.with_columns(
-        *[
-            nw.when(
-                (~nw.col(model).is_null())
-                & (~nw.col(model).is_nan().fill_null(False))
-            )
-            .then(nw.col(model) * nw.col(_WEIGHT_COL))
-            .otherwise(None)
-            .alias(weighted_col)
-            for model, weighted_col in zip(model_cols, weighted_cols)
-        ],
-        *[
-            nw.when(
-                (~nw.col(model).is_null())
-                & (~nw.col(model).is_nan().fill_null(False))
-            )
-            .then(nw.col(_WEIGHT_COL))
-            .otherwise(None)
-            .alias(effective_weight_col)
-            for model, effective_weight_col in zip(model_cols, effective_weight_cols)
-        ],
-        *[
-            nw.when(
-                (~nw.col(model).is_null())
-                & (~nw.col(model).is_nan().fill_null(False))
-            )
-            .then(1)
-            .otherwise(0)
-            .alias(valid_count_col)
-            for model, valid_count_col in zip(model_cols, valid_count_cols)
-        ]
+    # (rows, models) block, the groups are contiguous segments after sorting
+    scores = df_nw.select(nw.col(*model_cols).cast(nw.Float64)).to_numpy()
+    weights_arr = df_nw[_WEIGHT_COL].cast(nw.Float64).to_numpy()[:, None]
+    valid = ~np.isnan(scores)
+    keys = df_nw.select(*group_cols)
+    is_start = np.ones(keys.shape[0], dtype=bool)
+    is_start[1:] = np.any(
+        [keys[c].to_numpy()[1:] != keys[c].to_numpy()[:-1] for c in group_cols],
+        axis=0,
     )
-    df_nw = df_nw.group_by(*group_cols).agg(
-        *[
-            nw.col(weighted_col).sum().alias(model)
-            for model, weighted_col in zip(model_cols, weighted_cols)
-        ],
-        *[
-            nw.col(effective_weight_col).sum().alias(effective_weight_col)
-            for effective_weight_col in effective_weight_cols
-        ],
-        *[
-            nw.col(valid_count_col).sum().alias(valid_count_col)
-            for valid_count_col in valid_count_cols
-        ],
+    starts = np.flatnonzero(is_start)
+    weighted_sums = np.add.reduceat(
+        np.where(valid, scores * weights_arr, 0.0), starts, axis=0
     )
-    for effective_weight_col, valid_count_col in zip(
-        effective_weight_cols, valid_count_cols
-    ):
-        if (
-            (df_nw[effective_weight_col] == 0)
-            & (df_nw[valid_count_col] > 0)
-        ).any():
-            raise ValueError(
-                "The sum of weights for non-missing metric values must be "
-                "different from zero."
-            )
-
-    return (
-        df_nw
-        .with_columns(
-            *[
-                nw.when(nw.col(effective_weight_col) != 0)
-                .then(nw.col(effective_weight_col))
-                .otherwise(float("nan"))
-                .alias(effective_weight_col)
-                for effective_weight_col in effective_weight_cols
-            ]
+    effective_weights = np.add.reduceat(
+        np.where(valid, weights_arr, 0.0), starts, axis=0
+    )
+    valid_counts = np.add.reduceat(valid, starts, axis=0, dtype=np.int64)
+    if ((effective_weights == 0) & (valid_counts > 0)).any():
+        raise ValueError(
+            "The sum of weights for non-missing metric values must be "
+            "different from zero."
         )
-        .with_columns(
-            *[
-                (nw.col(model) / nw.col(effective_weight_col)).alias(model)
-                for model, effective_weight_col in zip(
-                    model_cols, effective_weight_cols
-                )
-            ]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.where(
+            effective_weights != 0, weighted_sums / effective_weights, np.nan
         )
-        .select(*group_cols, *model_cols)
-        .sort(*group_cols)
-        .to_native()
+    out = ufp.drop_index_if_pandas(ufp.take_rows(keys.to_native(), starts))
+    return ufp.assign_columns(out, model_cols, means)
+
+
+_DECOMPOSABLE_AGG_FNS = ("mean", "sum", "weighted_mean")
+
+
+def _partial_aggregates(
+    res: pd.DataFrame,
+    forecasts_df: pd.DataFrame,
+    model_cols: List[str],
+    weights: Optional[Union[str, pd.DataFrame]],
+    id_col: str,
+    target_col: str,
+    cutoff_col: str,
+) -> pd.DataFrame:
+    """Sums of the valid scores (and weights) by metric for a single partition."""
+    keys = [cutoff_col, "metric"] if cutoff_col in res.columns else ["metric"]
+    if weights is not None:
+        weights_df = _get_weights(
+            df=forecasts_df,
+            weights=weights,
+            id_col=id_col,
+            target_col=target_col,
+            cutoff_col=cutoff_col,
+        ).to_pandas()
+        join_cols = [c for c in weights_df.columns if c != _WEIGHT_COL]
+        res = res.merge(weights_df, on=join_cols, how="left")
+        if res[_WEIGHT_COL].isna().any():
+            raise ValueError("`weights` is missing entries for some evaluation rows.")
+    valid = res[model_cols].notna()
+    scores = res[model_cols].where(valid, 0.0)
+    partials = {}
+    for i, model in enumerate(model_cols):
+        partials[f"_sum_{i}"] = scores[model]
+        partials[f"_count_{i}"] = valid[model].astype("int64")
+        if weights is not None:
+            partials[f"_wsum_{i}"] = scores[model] * res[_WEIGHT_COL]
+            partials[f"_weight_{i}"] = res[_WEIGHT_COL].where(valid[model], 0.0)
+    return (
+        pd.DataFrame(partials)
+        .assign(**{k: res[k] for k in keys})
+        .groupby(keys, observed=True, sort=False)
+        .sum()
+        .reset_index()
     )
 
 
+def _combine_partial_aggregates(
+    df: pd.DataFrame,
+    model_cols: List[str],
+    agg_fn: str,
+    cutoff_col: str,
+) -> pd.DataFrame:
+    keys = [cutoff_col, "metric"] if cutoff_col in df.columns else ["metric"]
+    totals = df.groupby(keys, observed=True, sort=False).sum().reset_index()
+    out = totals[keys].copy()
+    for i, model in enumerate(model_cols):
+        if agg_fn == "sum":
+            out[model] = totals[f"_sum_{i}"]
+            continue
+        if agg_fn == "mean":
+            num = totals[f"_sum_{i}"]
+            den = totals[f"_count_{i}"].astype("float64")
+        else:
+            num = totals[f"_wsum_{i}"]
+            den = totals[f"_weight_{i}"]
+            if ((den == 0) & (totals[f"_count_{i}"] > 0)).any():
+                raise ValueError(
+                    "The sum of weights for non-missing metric values must be "
+                    "different from zero."
+                )
+        out[model] = num / den.where(den != 0, float("nan"))
+    return out
+
+
 def _evaluate_wrapper(
     df: pd.DataFrame,
     metrics: List[Callable],
@@ -237,15 +418,11 @@ def _evaluate_wrapper(
     target_col: str,
     cutoff_col: str,
     agg_fn: Optional[str],
+    weights: Optional[Union[str, pd.DataFrame]] = None,
+    train_df: Optional[pd.DataFrame] = None,
 ) -> pd.DataFrame:
     group_cols = _get_group_cols(df, id_col, cutoff_col)
-    if "_in_sample" in df:
-        in_sample_mask = df["_in_sample"]
-        train_df = df.loc[in_sample_mask, [*group_cols, time_col, target_col]]
-        df = df.loc[~in_sample_mask].drop(columns="_in_sample")
-    else:
-        train_df = None
-    return evaluate(
+    res = evaluate(
         df=df,
         metrics=metrics,
         models=models,
@@ -255,10 +432,36 @@ def _evaluate_wrapper(
         time_col=time_col,
         target_col=target_col,
         cutoff_col=cutoff_col,
-        agg_fn=agg_fn,
+    )
+    if agg_fn is None:
+        return res
+    return _partial_aggregates(
+        res=res,
+        forecasts_df=df,
+        model_cols=[c for c in res.columns if c not in (*group_cols, "metric")],
+        weights=weights,
+        id_col=id_col,
+        target_col=target_col,
+        cutoff_col=cutoff_col,
     )
 
 
+def _co_evaluate_wrapper(
+    df: pd.DataFrame, train_df: pd.DataFrame, **kwargs: Any
+) -> pd.DataFrame:
+    return _evaluate_wrapper(
+        df=df.drop(columns=_SHARD_COL),
+        train_df=train_df.drop(columns=_SHARD_COL),
+        **kwargs,
+    )
+
+
+def _assign_bucket(df: pd.DataFrame, id_col: str, n_buckets: int) -> pd.DataFrame:
+    # stable across processes, unlike the builtin hash
+    hashes = pd.util.hash_pandas_object(df[id_col], index=False).to_numpy()
+    return df.assign(**{_SHARD_COL: (hashes % np.uint64(n_buckets)).astype("int64")})
+
+
 def _distributed_evaluate(
     df: DistributedDFType,
     metrics: List[Callable],
@@ -273,69 +476,1066 @@ def _distributed_evaluate(
     agg_fn: Optional[str],
 ) -> DistributedDFType:
     import fugue.api as fa
+    from fugue import FugueWorkflow
+    from fugue.execution.factory import infer_execution_engine
 
-    if agg_fn == "weighted_mean":
-        raise NotImplementedError(
-            "`agg_fn='weighted_mean'` is not supported in distributed evaluation."
+    if agg_fn is not None and agg_fn not in _DECOMPOSABLE_AGG_FNS:
+        raise ValueError(
+            f"`agg_fn` must be one of {_DECOMPOSABLE_AGG_FNS} in distributed evaluation."
         )
-    if weights is not None:
-        raise NotImplementedError("`weights` is not supported in distributed evaluation.")
-    if agg_fn is not None:
-        raise ValueError("`agg_fn` is not supported in distributed")
+    if weights is not None and not isinstance(weights, str):
+        if not isinstance(weights, (pd.DataFrame, pl_DataFrame)):
+            raise ValueError(
+                "`weights` must be 'auto' or a pandas or polars DataFrame "
+                "in distributed evaluation."
+            )
+        weights = nw.from_native(weights).to_pandas()
     df_cols = fa.get_column_names(df)
     group_cols: list[str] = _get_group_cols(df, id_col, cutoff_col)
-    if train_df is not None:
-        # align columns in order to vstack them
-        def assign_cols(df: pd.DataFrame, cols) -> pd.DataFrame:
-            return df.assign(**cols)
-        train_cols = [*group_cols, time_col, target_col]
-        extra_cols = [c for c in df_cols if c not in train_cols]
-        train_df = fa.select_columns(train_df, train_cols)
-        train_df = fa.transform(
-            train_df,
-            using=assign_cols,
-            schema=(
-                "*," + str(fa.get_schema(df).extract(extra_cols)) + ",_in_sample:bool"
-            ),
-            params={
-                "cols": {
-                    **{c: float("nan") for c in extra_cols},
-                    "_in_sample": True,
-                },
-            },
-        )
-        df = fa.transform(
-            df,
-            using=assign_cols,
-            schema="*,_in_sample:bool",
-            params={"cols": {"_in_sample": False}},
-        )
-        df = fa.union(train_df, df)
-
     if models is None:
         model_cols = _get_model_cols(df_cols, id_col, time_col, target_col, cutoff_col)
     else:
         model_cols = models
     models_schema = ",".join(f"{m}:double" for m in model_cols)
-    result_schema = fa.get_schema(df).extract(*group_cols) + "metric:str" + models_schema
+    if agg_fn is None:
+        keys_schema = fa.get_schema(df).extract(group_cols) + "metric:str"
+        out_schema = keys_schema + models_schema
+    else:
+        # the scores are reduced to sums by metric in each partition and then combined
+        keys_schema = fa.get_schema(df).extract(group_cols[:-1]) + "metric:str"
+        out_schema = keys_schema + ",".join(
+            f"_sum_{i}:double,_count_{i}:long"
+            + (f",_wsum_{i}:double,_weight_{i}:double" if weights is not None else "")
+            for i in range(len(model_cols))
+        )
+    params = dict(
+        metrics=metrics,
+        models=models,
+        level=level,
+        id_col=id_col,
+        time_col=time_col,
+        target_col=target_col,
+        cutoff_col=cutoff_col,
+        agg_fn=agg_fn,
+        weights=weights,
+    )
+    if train_df is None:
+        res = fa.transform(
+            df,
+            using=_evaluate_wrapper,
+            schema=out_schema,
+            params=params,
+            partition={"by": group_cols, "algo": "coarse"},
+        )
+    else:
+        # both sides are bucketed by id and zipped, so the training side only
+        # carries the columns that the metrics use
+        train_cols = fa.get_column_names(train_df)
+        train_df = fa.select_columns(
+            train_df,
+            [c for c in group_cols if c in train_cols] + [time_col, target_col],
+        )
+        bucket_params = {"id_col": id_col, "n_buckets": fa.get_num_partitions(df)}
+        dag = FugueWorkflow()
+        fcsts = dag.df(df).transform(
+            _assign_bucket, schema=f"*,{_SHARD_COL}:long", params=bucket_params
+        )
+        train = dag.df(train_df).transform(
+            _assign_bucket, schema=f"*,{_SHARD_COL}:long", params=bucket_params
+        )
+        dag.zip(fcsts, train, how="left_outer", partition={"by": [_SHARD_COL]}).transform(
+            _co_evaluate_wrapper, schema=out_schema, params=params
+        ).yield_dataframe_as("res", as_local=False)
+        res = dag.run(infer_execution_engine([df, train_df]))["res"].native
+    if agg_fn is None:
+        return res
     return fa.transform(
-        df,
-        using=_evaluate_wrapper,
-        schema=result_schema,
-        params=dict(
-            metrics=metrics,
-            models=models,
-            level=level,
-            id_col=id_col,
-            time_col=time_col,
-            target_col=target_col,
-            cutoff_col=cutoff_col,
-            agg_fn=agg_fn,
-        ),
-        partition={"by": group_cols, "algo": "coarse"},
+        res,
+        using=_combine_partial_aggregates,
+        schema=keys_schema + models_schema,
+        params=dict(model_cols=model_cols, agg_fn=agg_fn, cutoff_col=cutoff_col),
+        partition={"by": keys_schema.names},
+    )
+
+
+def _shard_by_keys(
+    df: DFType,
+    train_df: Optional[DFType],
+    group_cols: List[str],
+    id_col: str,
+    n_shards: int,
+) -> List[Tuple[DFType, Optional[DFType]]]:
+    """Splits `df` into shards of contiguous (sorted) keys with similar number of rows."""
+    nw_df = nw.from_native(df)
+    keys = nw_df.group_by(*group_cols).agg(nw.len().alias(_SHARD_COL)).sort(*group_cols)
+    sizes = keys[_SHARD_COL].to_numpy()
+    if sizes.size < 2:
+        return [(df, train_df)]
+    starts = np.cumsum(sizes) - sizes
+    shard_ids = starts * min(n_shards, sizes.size) // sizes.sum()
+    keys = keys.with_columns(
+        nw.new_series(
+            _SHARD_COL,
+            shard_ids,
+            nw.Int64,
+            backend=nw.get_native_namespace(nw_df),
+        )
+    )
+    nw_df = nw_df.join(keys, on=group_cols, how="left")
+    nw_train = None if train_df is None else nw.from_native(train_df)
+    shards = []
+    for shard_id in np.unique(shard_ids):
+        shard_df = nw_df.filter(nw.col(_SHARD_COL) == shard_id).drop(_SHARD_COL)
+        shard_train_df = None
+        if nw_train is not None:
+            ids = shard_df[id_col].unique().to_list()
+            shard_train_df = nw_train.filter(nw.col(id_col).is_in(ids)).to_native()
+        shards.append((shard_df.to_native(), shard_train_df))
+    return shards
+
+
+def _cast_values(
+    df: Union[DFType, pl_LazyFrame],
+    dtype: nw.dtypes.DType,
+    id_col: str,
+    time_col: str,
+    cutoff_col: str,
+) -> Union[DFType, pl_LazyFrame]:
+    """Casts the numeric columns that aren't keys, i.e. the target and the predictions."""
+    nw_df = nw.from_native(df)
+    schema = nw_df.collect_schema()
+    keys = (id_col, time_col, cutoff_col, _HORIZON_COL)
+    value_cols = [c for c, t in schema.items() if c not in keys and t.is_numeric()]
+    return nw_df.with_columns(nw.col(value_cols).cast(dtype)).to_native()
+
+
+def _encode_keys(
+    df: pd.DataFrame,
+    train_df: Optional[pd.DataFrame],
+    id_col: str,
+    time_col: str,
+    cutoff_col: str,
+) -> Optional[Tuple[pd.DataFrame, Optional[pd.DataFrame], pd.Index, pd.Index]]:
+    """Replaces the (cutoff, id) pairs by a single int64 key in `id_col`.
+
+    The key preserves the sort order of the pairs, so grouping by it produces
+    the same rows as grouping by both columns. The training set is expanded to
+    one serie per key, keeping only the rows up to each cutoff."""
+    id_codes, ids = pd.factorize(df[id_col], sort=True)
+    cutoff_codes, cutoffs = pd.factorize(df[cutoff_col], sort=True)
+    if (id_codes < 0).any() or (cutoff_codes < 0).any():
+        # nulls can't be encoded
+        return None
+    n_ids = len(ids)
+    keys = cutoff_codes.astype(np.int64) * n_ids + id_codes
+    encoded_df = df.drop(columns=[id_col, cutoff_col])
+    encoded_df.insert(0, id_col, keys)
+    if train_df is not None:
+        uniq_keys = np.unique(keys)
+        keys_df = pd.DataFrame(
+            {
+                id_col: ids.take(uniq_keys % n_ids),
+                cutoff_col: cutoffs.take(uniq_keys // n_ids),
+                _PARTITION_COL: uniq_keys,
+            }
+        )
+        on = [id_col, cutoff_col] if cutoff_col in train_df.columns else [id_col]
+        train_df = train_df.merge(keys_df, on=on, how="inner")
+        train_df = train_df[train_df[time_col] <= train_df[cutoff_col]]
+        train_df = (
+            train_df.drop(columns=[id_col, cutoff_col])
+            .rename(columns={_PARTITION_COL: id_col})
+            .sort_values([id_col, time_col], kind="stable")
+            .reset_index(drop=True)
+        )
+    return encoded_df, train_df, ids, cutoffs
+
+
+def _decode_keys(
+    df: pd.DataFrame,
+    ids: pd.Index,
+    cutoffs: pd.Index,
+    id_col: str,
+    cutoff_col: str,
+) -> pd.DataFrame:
+    keys = df[id_col].to_numpy()
+    df = df.drop(columns=id_col)
+    df.insert(0, cutoff_col, cutoffs.take(keys // len(ids)))
+    df.insert(0, id_col, ids.take(keys % len(ids)))
+    return df
+
+
+class _MetricSpec(NamedTuple):
+    fn: Callable
+    base_name: str
+    name: str
+    kind: str
+    takes_q: bool
+    requires_level: bool
+    requires_train: bool
+
+
+class _MetricCall(NamedTuple):
+    fn: Callable
+    kwargs: Dict[str, Any]
+    requires_train: bool
+    name: Optional[str]
+    batch: Optional[Tuple[str, List[Any], List[str]]]
+
+
+def _resolve_metric(metric: Callable) -> _MetricSpec:
+    base_name = _function_name(metric)
+    metric_name = base_name
+    metric_params = inspect.signature(metric).parameters
+    if "baseline" in metric_params:
+        metric_name = f"{metric_name}_{metric_params['baseline'].default}"
+    if "q" in metric_params and _accepts_list(metric_params["q"]):
+        kind = "batched_q"
+    elif "q" in metric_params or metric_params["models"].annotation is Dict[str, str]:
+        kind = "q"
+    elif "quantiles" in metric_params:
+        kind = "quantiles"
+    elif "level" in metric_params and _accepts_list(metric_params["level"]):
+        kind = "batched_level"
+    elif "level" in metric_params:
+        kind = "level"
+    else:
+        kind = "plain"
+    return _MetricSpec(
+        fn=metric,
+        base_name=base_name,
+        name=metric_name,
+        kind=kind,
+        takes_q="q" in metric_params,
+        requires_level=get_origin(metric_params["models"].annotation) is dict,
+        requires_train="train_df" in metric_params,
     )
 
 
+def _add_metric_call(
+    calls: List[_MetricCall],
+    spec: _MetricSpec,
+    kwargs: Dict[str, Any],
+    name: Optional[str] = None,
+    batch: Optional[Tuple[str, List[Any], List[str]]] = None,
+    **extra_kwargs,
+) -> None:
+    calls.append(
+        _MetricCall(
+            fn=spec.fn,
+            kwargs={**kwargs, **extra_kwargs},
+            requires_train=spec.requires_train,
+            name=name,
+            batch=batch,
+        )
+    )
+
+
+def _entries_dtype(metric_width: int) -> np.dtype:
+    return np.dtype(
+        [
+            ("cell", np.uint64),
+            ("position", np.int64),
+            ("metric", f"U{metric_width}"),
+            ("value", np.float64),
+        ]
+    )
+
+
+class EvaluationCache:
+    """Directory backed cache of the scores computed by `evaluate`.
+
+    Every score is a cell identified by a hash of the serie (and cutoff) data,
+    the model's predictions and the metric, so evaluating again after adding
+    models or cutoffs only computes the new cells and reuses the rest. The cells
+    are spread over 16 directories by the first bits of their hashes, in a few
+    files sorted by cell, so a lookup only reads the requested cells. Metrics whose
+    arguments can't be pickled can't be cached. Losses over the whole frame, such
+    as `wape`, depend on every serie, so they aren't stored and are always computed.
+
+    Args:
+        path (str): Directory where the scores are stored. Created if it doesn't exist.
+        max_bytes (int, optional): Maximum size of the stored scores. The least
+            recently used files are removed when it's exceeded, except the ones
+            written by the last evaluation. Defaults to None.
+
+    Attributes:
+        reused (int): Number of (serie, model, metric) cells read from the cache
+            in the last evaluation.
+        computed (int): Number of cells computed in the last evaluation.
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None):
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("`max_bytes` must be a positive integer.")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.reused = 0
+        self.computed = 0
+
+    def _files(self, bucket: Optional[int] = None) -> List[str]:
+        buckets = (
+            [f"{bucket:x}"]
+            if bucket is not None
+            else [d for d in os.listdir(self.path) if re.fullmatch("[0-9a-f]", d)]
+        )
+        files = []
+        for b in buckets:
+            bucket_dir = os.path.join(self.path, b)
+            if not os.path.isdir(bucket_dir):
+                continue
+            files.extend(
+                os.path.join(bucket_dir, f)
+                for f in os.listdir(bucket_dir)
+                if re.fullmatch(r"[0-9a-f]{32}\.npy", f)
+            )
+        return files
+
+    def _lookup(self, cells: np.ndarray) -> pd.DataFrame:
+        """Stored entries of the sorted unique `cells`."""
+        found = []
+        buckets = cells >> _CACHE_BUCKET_SHIFT
+        bounds = np.flatnonzero(np.diff(buckets)) + 1
+        for bucket_cells in np.split(cells, bounds):
+            if not bucket_cells.size:
+                continue
+            for file in self._files(int(bucket_cells[0] >> _CACHE_BUCKET_SHIFT)):
+                try:
+                    stored = np.load(file, mmap_mode="r", allow_pickle=False)
+                except FileNotFoundError:
+                    # removed by a concurrent eviction or compaction
+                    continue
+                # the entries are sorted by cell, only the requested ones are read
+                starts = np.searchsorted(stored["cell"], bucket_cells, side="left")
+                ends = np.searchsorted(stored["cell"], bucket_cells, side="right")
+                counts = ends - starts
+                offsets = np.repeat(starts - (counts.cumsum() - counts), counts)
+                rows = np.asarray(stored[offsets + np.arange(counts.sum())])
+                del stored
+                if rows.size:
+                    found.append(pd.DataFrame(rows).astype({"metric": object}))
+                    os.utime(file)
+        if not found:
+            return pd.DataFrame(
+                {
+                    "cell": np.array([], dtype=np.uint64),
+                    "position": np.array([], dtype=np.int64),
+                    "metric": np.array([], dtype=object),
+                    "value": np.array([], dtype=np.float64),
+                }
+            )
+        return pd.concat(found, ignore_index=True).drop_duplicates(
+            ["cell", "metric"], keep="last"
+        )
+
+    @staticmethod
+    def _write_segment(bucket_dir: str, entries: pd.DataFrame) -> str:
+        entries = entries.sort_values("cell", kind="stable")
+        width = max(1, entries["metric"].str.len().max())
+        records = np.empty(entries.shape[0], dtype=_entries_dtype(width))
+        for col in records.dtype.names:
+            records[col] = entries[col].to_numpy()
+        file = os.path.join(bucket_dir, f"{uuid.uuid4().hex}.npy")
+        # write to a temporary file first, so readers never see partial writes
+        tmp_file = f"{file}.tmp"
+        with open(tmp_file, "wb") as f:
+            np.save(f, records, allow_pickle=False)
+        os.replace(tmp_file, file)
+        return file
+
+    def _store(self, entries: pd.DataFrame) -> None:
+        entries = entries[["cell", "position", "metric", "value"]]
+        buckets = entries["cell"].to_numpy() >> _CACHE_BUCKET_SHIFT
+        written = set()
+        for bucket, new in entries.groupby(buckets, sort=False):
+            bucket_dir = os.path.join(self.path, f"{int(bucket):x}")
+            os.makedirs(bucket_dir, exist_ok=True)
+            written.add(self._write_segment(bucket_dir, new))
+            segments = self._files(int(bucket))
+            if len(segments) <= _CACHE_MAX_SEGMENTS:
+                continue
+            # merge the smallest segments, which keeps the lookups to a few files
+            # while each entry is only rewritten a logarithmic number of times
+            smallest = sorted(segments, key=os.path.getsize)[: len(segments) // 2]
+            merged = pd.concat(
+                [
+                    pd.DataFrame(np.load(f, allow_pickle=False)).astype(
+                        {"metric": object}
+                    )
+                    for f in smallest
+                ],
+                ignore_index=True,
+            ).drop_duplicates(["cell", "metric"], keep="last")
+            written.add(self._write_segment(bucket_dir, merged))
+            for f in smallest:
+                os.remove(f)
+                written.discard(f)
+        if self.max_bytes is None:
+            return
+        stats = sorted(
+            ((os.stat(f), f) for f in self._files()), key=lambda x: x[0].st_mtime
+        )
+        total = sum(stat.st_size for stat, _ in stats)
+        for stat, f in stats:
+            if total <= self.max_bytes:
+                break
+            if f in written:
+                continue
+            os.remove(f)
+            total -= stat.st_size
+
+    def clear(self) -> None:
+        """Remove every stored score."""
+        for file in self._files():
+            os.remove(file)
+        for d in os.listdir(self.path):
+            bucket_dir = os.path.join(self.path, d)
+            if re.fullmatch("[0-9a-f]", d) and not os.listdir(bucket_dir):
+                os.rmdir(bucket_dir)
+
+
+class EvaluationPlan:
+    """Evaluation of a fixed set of metrics that can be run on many dataframes.
+
+    The metrics' signatures are inspected when the plan is built and the model
+    columns, the arguments of every metric call and the required columns are
+    resolved on the first run and reused while the dataframes have the same
+    columns, which removes the fixed overhead of `evaluate` on small inputs.
+
+    Args:
+        metrics (list of callable): Functions with arguments `df`, `models`,
+            `id_col`, `target_col` and optionally `train_df`.
+        models (list of str, optional): Names of the models to evaluate.
+            If `None` will use every column in the dataframe after removing
+            id, time and target. Defaults to None.
+        level (list of int, optional): Prediction interval levels. Used to compute
+            losses that rely on quantiles. Defaults to None.
+        id_col (str, optional): Column that identifies each serie.
+            Defaults to 'unique_id'.
+        time_col (str, optional): Column that identifies each timestep, its values
+            can be timestamps or integers. Defaults to 'ds'.
+        target_col (str, optional): Column that contains the target.
+            Defaults to 'y'.
+        cutoff_col (str, optional): Column that identifies the cutoff point for
+            each forecast cross-validation fold. Defaults to 'cutoff'.
+        agg_fn (str, optional): Statistic to compute on the scores by id to reduce
+            them to a single number. Defaults to None.
+        weights (str, pandas or polars DataFrame, optional): Weights to use when
+            `agg_fn='weighted_mean'`. See `evaluate` for the details. Defaults to None.
+        by_horizon (bool, optional): Compute the metrics for each step of the
+            forecast horizon. See `evaluate` for the details. Defaults to False.
+        dtype (str, optional): Float type of the computations. See `evaluate`
+            for the details. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        metrics: List[Callable],
+        models: Optional[List[str]] = None,
+        level: Optional[List[int]] = None,
+        id_col: str = "unique_id",
+        time_col: str = "ds",
+        target_col: str = "y",
+        cutoff_col: str = "cutoff",
+        agg_fn: Optional[str] = None,
+        weights: Optional[Union[str, AnyDFType]] = None,
+        by_horizon: bool = False,
+        dtype: Optional[str] = None,
+    ):
+        if dtype not in (None, *_FLOAT_DTYPES):
+            raise ValueError(
+                f"`dtype` must be one of {list(_FLOAT_DTYPES)}, got {dtype!r}."
+            )
+        if weights is not None and agg_fn != "weighted_mean":
+            raise ValueError("`weights` can only be used with `agg_fn='weighted_mean'`.")
+        if agg_fn == "weighted_mean" and weights is None:
+            raise ValueError("`agg_fn='weighted_mean'` requires setting `weights`.")
+        self.metrics = metrics
+        self.models = models
+        self.level = level
+        self.id_col = id_col
+        self.time_col = time_col
+        self.target_col = target_col
+        self.cutoff_col = cutoff_col
+        self.agg_fn = agg_fn
+        self.weights = weights
+        self.by_horizon = by_horizon
+        self.dtype = dtype
+        self._specs = [_resolve_metric(m) for m in metrics]
+        if level is None:
+            requires_level = [s.fn for s in self._specs if s.requires_level]
+            if requires_level:
+                raise ValueError(
+                    f"The following metrics require setting `level`: {requires_level}"
+                )
+        self._y_train_metrics = list(
+            dict.fromkeys(s.base_name for s in self._specs if s.requires_train)
+        )
+        self._resolved_cols: Optional[List[str]] = None
+        self._model_cols: List[str] = []
+        self._calls: List[_MetricCall] = []
+
+    def _metric_calls(self, model_cols: List[str]) -> List[_MetricCall]:
+        calls = []
+        for spec in self._specs:
+            kwargs: Dict[str, Any] = dict(
+                models=model_cols, id_col=self.id_col, target_col=self.target_col
+            )
+            if spec.requires_train:
+                kwargs["cutoff_col"] = self.cutoff_col
+                kwargs["time_col"] = self.time_col
+            add = partial(_add_metric_call, calls, spec, kwargs)
+            if spec.kind in ("batched_q", "q", "quantiles", "batched_level", "level"):
+                assert self.level is not None  # we've made sure of this in the init
+            if spec.kind == "batched_q":
+                quantiles = []
+                pred_cols: Dict[str, List[str]] = {model: [] for model in model_cols}
+                for lvl in self.level:
+                    for q, side in zip(_quantiles_from_levels([lvl]), ["lo", "hi"]):
+                        quantiles.append(float(q))
+                        for model in model_cols:
+                            pred_cols[model].append(f"{model}-{side}-{lvl}")
+                names = [f"{spec.name}_q{q}" for q in quantiles]
+                add(batch=("q", quantiles, names), models=pred_cols, q=quantiles)
+            elif spec.kind == "q":
+                for lvl in self.level:
+                    quantiles = _quantiles_from_levels([lvl])
+                    for q, side in zip(quantiles, ["lo", "hi"]):
+                        extra = dict(
+                            models={model: f"{model}-{side}-{lvl}" for model in model_cols}
+                        )
+                        if spec.takes_q:
+                            # this is for calibration, since it uses the predictions for q
+                            # but doesn't use it
+                            extra["q"] = q
+                        add(name=f"{spec.name}_q{q}", **extra)
+            elif spec.kind == "quantiles":
+                add(
+                    name=spec.name,
+                    quantiles=_quantiles_from_levels(self.level),
+                    models={
+                        model: _models_from_levels(model, self.level)
+                        for model in model_cols
+                    },
+                )
+            elif spec.kind == "batched_level":
+                names = [f"{spec.name}_level{lvl}" for lvl in self.level]
+                add(batch=("level", list(self.level), names), level=list(self.level))
+            elif spec.kind == "level":
+                for lvl in self.level:
+                    add(name=f"{spec.name}_level{lvl}", level=lvl)
+            else:
+                add(name=spec.name)
+        return calls
+
+    def _resolve(self, df_cols: List[str]) -> None:
+        if self._resolved_cols == df_cols:
+            return
+        if self.models is None:
+            model_cols = _get_model_cols(
+                df_cols, self.id_col, self.time_col, self.target_col, self.cutoff_col
+            )
+        else:
+            model_cols = self.models
+        if self.level is not None:
+            expected_cols = {
+                f"{m}-{side}-{lvl}"
+                for m in model_cols
+                for side in ("lo", "hi")
+                for lvl in self.level
+            }
+            missing = expected_cols - set(df_cols)
+            if missing:
+                raise ValueError(
+                    f"The following columns are required for level={self.level} "
+                    f"and are missing: {missing}"
+                )
+        self._model_cols = model_cols
+        self._calls = self._metric_calls(model_cols)
+        self._resolved_cols = df_cols
+
+    def _metric_results(self, df: DFType, train_df: Optional[DFType]) -> List[DFType]:
+        """Outputs of every metric call, before assigning the metric names."""
+        id_col = self.id_col
+        self._resolve(nw.from_native(df).columns)
+
+        # y_train
+        if self._y_train_metrics:
+            if train_df is None:
+                raise ValueError(
+                    f"The following metrics require y_train: {self._y_train_metrics}. "
+                    "Please provide `train_df`."
+                )
+            if isinstance(train_df, pl_LazyFrame) or not ufp._is_sorted(
+                train_df, id_col, self.time_col
+            ):
+                train_df = ufp.sort(train_df, by=[id_col, self.time_col])
+            _check_missing_series(df, train_df, id_col)
+
+        results = []
+        for call in self._calls:
+            kwargs = dict(df=df, **call.kwargs)
+            if call.requires_train:
+                kwargs["train_df"] = train_df
+            results.append(call.fn(**kwargs))
+        return results
+
+    @staticmethod
+    def _name_result(call: _MetricCall, result: DFType) -> DFType:
+        if call.batch is None:
+            return ufp.assign_columns(result, "metric", call.name)
+        key_col, keys, names = call.batch
+        return _name_batches(result, key_col=key_col, keys=keys, names=names)
+
+    def _sharded_results(
+        self,
+        df: DFType,
+        train_df: Optional[DFType],
+        n_jobs: int,
+        parallel_backend: str,
+    ) -> List[DFType]:
+        group_cols = _get_group_cols(df, self.id_col, self.cutoff_col)
+        shards = _shard_by_keys(
+            df=df, train_df=train_df, group_cols=group_cols, id_col=self.id_col, n_shards=n_jobs
+        )
+        # validate the columns before starting the workers
+        self._resolve(nw.from_native(df).columns)
+        # the losses over the whole frame can't be split by series
+        shard_metrics = [
+            metric
+            for metric, spec in zip(self.metrics, self._specs)
+            if not _is_frame_loss(spec.fn)
+        ]
+        if len(shards) < 2 or not shard_metrics:
+            return self._metric_results(df, train_df)
+        shard_plan = EvaluationPlan(
+            metrics=shard_metrics,
+            models=self._model_cols,
+            level=self.level,
+            id_col=self.id_col,
+            time_col=self.time_col,
+            target_col=self.target_col,
+            cutoff_col=self.cutoff_col,
+        )
+        # resolve the metric calls once, the threads only read them
+        shard_plan._resolve(nw.from_native(df).columns)
+        executor: Executor
+        if parallel_backend == "threads":
+            executor = ThreadPoolExecutor(len(shards))
+        else:
+            # polars' thread pool isn't fork safe
+            ctx = multiprocessing.get_context("spawn")
+            executor = ProcessPoolExecutor(len(shards), mp_context=ctx)
+        with executor:
+            futures = [
+                executor.submit(shard_plan._metric_results, shard_df, shard_train_df)
+                for shard_df, shard_train_df in shards
+            ]
+            results_per_shard = [future.result() for future in futures]
+        results = []
+        results_per_call = iter(zip(*results_per_shard))
+        for call in self._calls:
+            if _is_frame_loss(call.fn):
+                results.append(call.fn(df=df, **call.kwargs))
+                continue
+            shard_results = next(results_per_call)
+            nw_result = nw.concat([nw.from_native(r) for r in shard_results])
+            if call.batch is not None:
+                # each shard returns one block per key, restore the key-major order
+                key_col, keys, _ = call.batch
+                nw_result = (
+                    nw_result.with_columns(
+                        nw.col(key_col)
+                        .replace_strict(
+                            {key: i for i, key in enumerate(keys)},
+                            return_dtype=nw.Int64,
+                        )
+                        .alias(_SHARD_COL)
+                    )
+                    .sort(_SHARD_COL, *group_cols)
+                    .drop(_SHARD_COL)
+                )
+            results.append(nw_result.to_native())
+        return results
+
+    def _cached_results(
+        self,
+        df: DFType,
+        train_df: Optional[DFType],
+        cache: EvaluationCache,
+        n_jobs: int,
+        parallel_backend: str,
+    ) -> List[DFType]:
+        """Named outputs of every metric, computing only the cells missing from `cache`."""
+        self._resolve(nw.from_native(df).columns)
+        model_cols = self._model_cols
+        group_cols = _get_group_cols(df, self.id_col, self.cutoff_col)
+        nw_df = nw.from_native(df)
+        keys = nw_df.select(*group_cols).unique().sort(*group_cols)
+        n_parts = keys.shape[0]
+        codes = (
+            nw_df.select(*group_cols)
+            .with_row_index(_ROW_COL)
+            .join(keys.with_row_index(_PARTITION_COL), on=group_cols, how="left")
+            .sort(_ROW_COL)[_PARTITION_COL]
+            .to_numpy()
+        )
+
+        # hashes by partition of the actuals, the predictions and the training set
+        base_hashes = _segment_hashes(
+            _hash_columns(nw_df, [*group_cols, self.time_col, self.target_col]),
+            codes,
+            n_parts,
+        )
+        model_hashes = []
+        for model in model_cols:
+            related = [c for c in nw_df.columns if c == model or c.startswith(f"{model}-")]
+            model_hashes.append(
+                _mix_hashes(
+                    _segment_hashes(
+                        _hash_columns(nw_df, [self.time_col, *related]), codes, n_parts
+                    ),
+                    _str_hash(model),
+                )
+            )
+        train_hashes = np.zeros(n_parts, dtype=np.uint64)
+        if train_df is not None and self._y_train_metrics:
+            nw_train = nw.from_native(train_df)
+            train_codes, train_ids = pd.factorize(nw_train[self.id_col].to_numpy())
+            train_cols = [
+                c for c in (self.cutoff_col, self.time_col, self.target_col)
+                if c in nw_train.columns
+            ]
+            id_hashes = _segment_hashes(
+                _hash_columns(nw_train, train_cols), train_codes, len(train_ids)
+            )
+            idxs = pd.Index(train_ids).get_indexer(keys[self.id_col].to_numpy())
+            train_hashes = np.where(idxs >= 0, id_hashes[idxs], np.uint64(0))
+
+        cells_per_metric: List[Optional[np.ndarray]] = []
+        for spec in self._specs:
+            if _is_frame_loss(spec.fn):
+                # depends on every serie, so its cells can't be reused
+                cells_per_metric.append(None)
+                continue
+            part_hashes = base_hashes
+            if spec.requires_train:
+                part_hashes = _mix_hashes(part_hashes, train_hashes)
+            metric_hash = _metric_identity(spec, self.level)
+            cells_per_metric.append(
+                np.stack(
+                    [
+                        _mix_hashes(_mix_hashes(part_hashes, h), metric_hash)
+                        for h in model_hashes
+                    ],
+                    axis=1,
+                )
+            )
+        found = cache._lookup(
+            np.unique(
+                np.concatenate(
+                    [np.empty(0, dtype=np.uint64)]
+                    + [c.ravel() for c in cells_per_metric if c is not None]
+                )
+            )
+        )
+
+        cache.reused = cache.computed = 0
+        results = []
+        new_entries = []
+        backend = nw.get_native_namespace(nw_df)
+        for metric, cells in zip(self.metrics, cells_per_metric):
+            if cells is None:
+                frame_plan = EvaluationPlan(
+                    metrics=[metric],
+                    models=model_cols,
+                    level=self.level,
+                    id_col=self.id_col,
+                    time_col=self.time_col,
+                    target_col=self.target_col,
+                    cutoff_col=self.cutoff_col,
+                )
+                frame_results = frame_plan._metric_results(df, train_df)
+                results.append(
+                    nw.concat(
+                        [
+                            nw.from_native(frame_plan._name_result(call, res))
+                            for call, res in zip(frame_plan._calls, frame_results)
+                        ]
+                    ).to_native()
+                )
+                cache.computed += n_parts * len(model_cols)
+                continue
+            flat_cells = pd.Index(cells.ravel())
+            entries = found[found["cell"].isin(flat_cells)]
+            missing = ~np.isin(cells, entries["cell"].to_numpy())
+            cache.reused += int((~missing).sum())
+            cache.computed += int(missing.sum())
+            if missing.any():
+                missing_models = [m for j, m in enumerate(model_cols) if missing[:, j].any()]
+                mask = np.isin(codes, np.flatnonzero(missing.any(axis=1)))
+                sub_plan = EvaluationPlan(
+                    metrics=[metric],
+                    models=missing_models,
+                    level=self.level,
+                    id_col=self.id_col,
+                    time_col=self.time_col,
+                    target_col=self.target_col,
+                    cutoff_col=self.cutoff_col,
+                )
+                sub_df = ufp.filter_with_mask(df, mask)
+                if n_jobs > 1:
+                    sub_results = sub_plan._sharded_results(
+                        sub_df, train_df, n_jobs, parallel_backend
+                    )
+                else:
+                    sub_results = sub_plan._metric_results(sub_df, train_df)
+                computed = nw.concat(
+                    [
+                        nw.from_native(sub_plan._name_result(call, res))
+                        for call, res in zip(sub_plan._calls, sub_results)
+                    ]
+                ).join(keys.with_row_index(_PARTITION_COL), on=group_cols, how="left")
+                names = computed["metric"].to_numpy()
+                positions = pd.Index(pd.unique(names)).get_indexer(names)
+                parts = computed[_PARTITION_COL].to_numpy()
+                computed_entries = pd.concat(
+                    [
+                        pd.DataFrame(
+                            {
+                                "cell": cells[parts, model_cols.index(model)],
+                                "position": positions,
+                                "metric": names,
+                                "value": computed[model].cast(nw.Float64).to_numpy(),
+                            }
+                        )
+                        for model in missing_models
+                    ],
+                    ignore_index=True,
+                )
+                new_entries.append(computed_entries)
+                entries = pd.concat([entries, computed_entries], ignore_index=True)
+                entries = entries.drop_duplicates(["cell", "metric"], keep="last")
+
+            # (metric name, partition, model) block in the order returned by the metric
+            names = entries.drop_duplicates("position").sort_values("position")["metric"]
+            flat_idxs = flat_cells.get_indexer(entries["cell"])
+            values = np.full((len(names), n_parts, len(model_cols)), np.nan)
+            values[
+                entries["position"].to_numpy(),
+                flat_idxs // len(model_cols),
+                flat_idxs % len(model_cols),
+            ] = entries["value"].to_numpy()
+            out = ufp.drop_index_if_pandas(
+                ufp.take_rows(keys.to_native(), np.tile(np.arange(n_parts), len(names)))
+            )
+            out = nw.from_native(out).with_columns(
+                nw.new_series(
+                    "metric", np.repeat(names.to_numpy(), n_parts), nw.String, backend=backend
+                ),
+                *[
+                    nw.new_series(
+                        model, values[:, :, j].ravel(), nw.Float64, backend=backend
+                    )
+                    for j, model in enumerate(model_cols)
+                ],
+            )
+            results.append(out.to_native())
+        if new_entries:
+            cache._store(pd.concat(new_entries, ignore_index=True))
+        return results
+
+    def run(
+        self,
+        df: AnyDFType,
+        train_df: Optional[AnyDFType] = None,
+        n_jobs: int = 1,
+        cache: Optional[EvaluationCache] = None,
+        parallel_backend: str = "processes",
+    ) -> AnyDFType:
+        """Evaluate the forecasts in `df`.
+
+        Args:
+            df (pandas, polars, dask or spark DataFrame or polars LazyFrame): Forecasts
+                to evaluate. Must have `id_col`, `time_col`, `target_col` and models'
+                predictions.
+            train_df (pandas, polars, dask or spark DataFrame or polars LazyFrame, optional):
+                Training set. Used to evaluate metrics such as `mase`. Defaults to None.
+            n_jobs (int, optional): Number of workers used to evaluate pandas or
+                polars DataFrames. The series are split into contiguous shards with
+                a similar number of rows and the results are identical to the ones
+                of a single process. Losses over the whole frame, such as `wape`,
+                are computed on the full frame by the current process. Use -1 to
+                use all cores. Defaults to 1.
+            cache (EvaluationCache, optional): Cache of the scores of pandas or polars
+                DataFrames. Only the (serie, model, metric) cells that aren't stored
+                are computed. Defaults to None.
+            parallel_backend (str, optional): Pool used when `n_jobs > 1`, either
+                'processes' or 'threads'. See `evaluate` for the requirements of
+                each one. Defaults to 'processes'.
+
+        Returns:
+            pandas, polars, dask or spark DataFrame: Metrics with one row per
+                (id, metric) combination and one column per model. If `agg_fn` is
+                not `None`, there is only one row per metric. A polars DataFrame is
+                returned for polars LazyFrame inputs.
+        """
+        id_col = self.id_col
+        cutoff_col = self.cutoff_col
+        if n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+        if n_jobs < 1:
+            raise ValueError("`n_jobs` must be a positive integer or -1.")
+        if n_jobs > 1 and not isinstance(df, (pd.DataFrame, pl_DataFrame)):
+            raise ValueError("`n_jobs` is only supported for pandas and polars DataFrames.")
+        if parallel_backend not in ("processes", "threads"):
+            raise ValueError(
+                "`parallel_backend` must be either 'processes' or 'threads', "
+                f"got: {parallel_backend!r}."
+            )
+        if cache is not None and not isinstance(df, (pd.DataFrame, pl_DataFrame)):
+            raise ValueError("`cache` is only supported for pandas and polars DataFrames.")
+        if self.by_horizon and not isinstance(
+            df, (pd.DataFrame, pl_DataFrame, pl_LazyFrame)
+        ):
+            raise ValueError(
+                "`by_horizon` is only supported for pandas and polars DataFrames."
+            )
+        if self.dtype is not None and not isinstance(
+            df, (pd.DataFrame, pl_DataFrame, pl_LazyFrame)
+        ):
+            raise ValueError("`dtype` is only supported for pandas and polars DataFrames.")
+        if not isinstance(df, (pd.DataFrame, pl_DataFrame, pl_LazyFrame)):
+            return _distributed_evaluate(
+                df=df,
+                metrics=self.metrics,
+                models=self.models,
+                train_df=train_df,
+                level=self.level,
+                weights=self.weights,
+                id_col=id_col,
+                time_col=self.time_col,
+                target_col=self.target_col,
+                cutoff_col=cutoff_col,
+                agg_fn=self.agg_fn,
+            )
+        is_lazy = isinstance(df, pl_LazyFrame)
+        if is_lazy:
+            streaming = _can_stream(
+                df, train_df if isinstance(train_df, pl_LazyFrame) else None
+            )
+        if self.dtype is not None:
+            dtype = _FLOAT_DTYPES[self.dtype]
+            df = _cast_values(df, dtype, id_col, self.time_col, cutoff_col)
+            if train_df is not None:
+                train_df = _cast_values(train_df, dtype, id_col, self.time_col, cutoff_col)
+        forecasts_df = df
+        if self.by_horizon:
+            group_cols = _get_group_cols(df, id_col, cutoff_col)
+            df = (
+                nw.from_native(df)
+                .with_columns(
+                    nw.col(self.time_col)
+                    .cum_count()
+                    .over(*group_cols, order_by=self.time_col)
+                    .cast(nw.Int32)
+                    .alias(_HORIZON_COL)
+                )
+                .to_native()
+            )
+
+        # grouping by one integer column is much faster than by ids and cutoffs.
+        # the scores of the cache are stored by their original keys and custom
+        # metrics get the frame as is
+        encoding = None
+        if (
+            cache is None
+            and all(_is_builtin_loss(spec.fn) for spec in self._specs)
+            and isinstance(df, pd.DataFrame)
+            and cutoff_col in df.columns
+            and (train_df is None or isinstance(train_df, pd.DataFrame))
+        ):
+            if self._y_train_metrics and train_df is not None:
+                _check_missing_series(df, train_df, id_col)
+            else:
+                train_df = None
+            encoding = _encode_keys(df, train_df, id_col, self.time_col, cutoff_col)
+            if encoding is not None:
+                df, train_df, ids, cutoffs = encoding
+
+        if cache is not None:
+            results_per_metric = self._cached_results(
+                df, train_df, cache, n_jobs, parallel_backend
+            )
+        else:
+            if n_jobs > 1:
+                results = self._sharded_results(df, train_df, n_jobs, parallel_backend)
+            else:
+                results = self._metric_results(df, train_df)
+            results_per_metric = [
+                self._name_result(call, result)
+                for call, result in zip(self._calls, results)
+            ]
+        if isinstance(df, pd.DataFrame):
+            df = pd.concat(results_per_metric).reset_index(drop=True)
+            if encoding is not None:
+                df = _decode_keys(df, ids, cutoffs, id_col, cutoff_col)
+        else:
+            df = pl.concat(results_per_metric, how="diagonal")
+
+        res_cols = nw.from_native(df).columns
+        id_cols = [
+            c for c in (id_col, cutoff_col, _HORIZON_COL, "metric") if c in res_cols
+        ]
+
+        # the validations of the losses of lazy frames are checked once collected
+        flag_cols = [c for c in res_cols if c.startswith(ufl._FLAG_PREFIX)]
+        model_cols = [c for c in res_cols if c not in id_cols + flag_cols]
+        if is_lazy:
+            df = df.select(id_cols + model_cols + flag_cols)
+        else:
+            df = df[id_cols + model_cols]
+        if self.agg_fn is not None:
+            if self.agg_fn == "weighted_mean":
+                assert self.weights is not None
+                if is_lazy:
+                    # the weights are joined to the scores, which are small
+                    df = ufl._check_flags(_collect_streaming(df, streaming))
+                df = _weighted_mean_agg(
+                    df=df,
+                    forecasts_df=forecasts_df,
+                    weights=self.weights,
+                    id_col=id_col,
+                    target_col=self.target_col,
+                    cutoff_col=cutoff_col,
+                    model_cols=model_cols,
+                )
+            else:
+                group_cols = id_cols[1:]  # exclude id_col
+                df = ufp.group_by_agg(
+                    df,
+                    by=group_cols,
+                    aggs={
+                        **{m: self.agg_fn for m in model_cols},
+                        **{c: "max" for c in flag_cols},
+                    },
+                    maintain_order=True,
+                )
+        if self.dtype is not None:
+            # the weighted mean is accumulated in float64
+            df = (
+                nw.from_native(df)
+                .with_columns(nw.col(model_cols).cast(_FLOAT_DTYPES[self.dtype]))
+                .to_native()
+            )
+        if self.by_horizon:
+            df = nw.from_native(df).rename({_HORIZON_COL: "horizon"}).to_native()
+        if isinstance(df, pl_LazyFrame):
+            df = ufl._check_flags(_collect_streaming(df, streaming))
+        return df
+
+
 def evaluate(
     df: AnyDFType,
     metrics: List[Callable],
@@ -348,19 +1548,26 @@ def evaluate(
     cutoff_col: str = "cutoff",
     agg_fn: Optional[str] = None,
     weights: Optional[Union[str, AnyDFType]] = None,
+    n_jobs: int = 1,
+    cache: Optional[EvaluationCache] = None,
+    by_horizon: bool = False,
+    dtype: Optional[str] = None,
+    parallel_backend: str = "processes",
 ) -> AnyDFType:
     """Evaluate forecast using different metrics.
 
     Args:
-        df (pandas, polars, dask or spark DataFrame): Forecasts to evaluate.
-            Must have `id_col`, `time_col`, `target_col` and models' predictions.
+        df (pandas, polars, dask or spark DataFrame or polars LazyFrame): Forecasts
+            to evaluate. Must have `id_col`, `time_col`, `target_col` and models'
+            predictions. If it's a polars LazyFrame, all the metrics are combined
+            into a single query plan that is collected with the streaming engine.
         metrics (list of callable): Functions with arguments `df`, `models`,
             `id_col`, `target_col` and optionally `train_df`.
         models (list of str, optional): Names of the models to evaluate.
             If `None` will use every column in the dataframe after removing
             id, time and target. Defaults to None.
-        train_df (pandas, polars, dask or spark DataFrame, optional): Training set.
-            Used to evaluate metrics such as `mase`. Defaults to None.
+        train_df (pandas, polars, dask or spark DataFrame or polars LazyFrame, optional):
+            Training set. Used to evaluate metrics such as `mase`. Defaults to None.
         level (list of int, optional): Prediction interval levels. Used to compute
             losses that rely on quantiles. Defaults to None.
         id_col (str, optional): Column that identifies each serie.
@@ -372,7 +1579,8 @@ def evaluate(
         cutoff_col (str, optional): Column that identifies the cutoff point for
             each forecast cross-validation fold. Defaults to 'cutoff'.
         agg_fn (str, optional): Statistic to compute on the scores by id to reduce
-            them to a single number. Defaults to None.
+            them to a single number. Distributed inputs support 'mean', 'sum'
+            and 'weighted_mean'. Defaults to None.
         weights (str, pandas or polars DataFrame, optional): Weights to use when
             `agg_fn='weighted_mean'`. If 'auto', weights are computed as the sum
             of the target in the forecast/evaluation window, not from `train_df`.
@@ -380,161 +1588,494 @@ def evaluate(
             is present in `df`, it can also contain `cutoff_col` for cutoff-level
             weights. If `df` has `cutoff_col` but the weights dataframe does not,
             the same per-series weight is used for every cutoff.
+        n_jobs (int, optional): Number of workers used to evaluate pandas or
+            polars DataFrames. The series are split into contiguous shards with
+            a similar number of rows and the results are identical to the ones
+            of a single process. Losses over the whole frame, such as `wape`,
+            are computed on the full frame by the current process. Use -1 to use
+            all cores. Defaults to 1.
+        cache (EvaluationCache, optional): Cache of the scores of pandas or polars
+            DataFrames. Only the (serie, model, metric) cells that aren't stored
+            are computed, e.g. after adding a model or new cutoffs. The number of
+            reused cells is available in `cache.reused`. Defaults to None.
+        by_horizon (bool, optional): Compute the metrics for each step of the
+            forecast horizon, which is the position of each timestamp within its
+            serie (and cutoff). The output gets a 'horizon' column starting at 1,
+            which is also kept as a key when aggregating with `agg_fn`.
+            Only supported for pandas and polars inputs. Defaults to False.
+        dtype (str, optional): Float type of the computations, either 'float32'
+            or 'float64'. The target and the predictions in `df` and `train_df`
+            are cast to it and the losses keep it in their intermediate columns,
+            which halves the memory of wide frames with 'float32'. The weighted
+            mean is accumulated in float64. If `None`, the input types are kept.
+            Only supported for pandas and polars inputs. Defaults to None.
+        parallel_backend (str, optional): Pool used when `n_jobs > 1`. With
+            'processes' the shards are scored by spawned worker processes, so
+            the metrics must be picklable (importable functions or partials of
+            them, not lambdas or locally defined functions) and scripts must
+            call `evaluate` under an `if __name__ == "__main__":` guard. With
+            'threads' the shards are scored in a thread pool of the current
+            process, which has neither requirement and is faster when the
+            metrics release the GIL (e.g. polars), but gives little speedup for
+            pure python metrics. Defaults to 'processes'.
 
     Returns:
         pandas, polars, dask or spark DataFrame: Metrics with one row per
             (id, metric) combination and one column per model. If `agg_fn` is
-            not `None`, there is only one row per metric.
+            not `None`, there is only one row per metric. A polars DataFrame is
+            returned for polars LazyFrame inputs.
+    """
+    plan = EvaluationPlan(
+        metrics=metrics,
+        models=models,
+        level=level,
+        id_col=id_col,
+        time_col=time_col,
+        target_col=target_col,
+        cutoff_col=cutoff_col,
+        agg_fn=agg_fn,
+        weights=weights,
+        by_horizon=by_horizon,
+        dtype=dtype,
+    )
+    return plan.run(
+        df=df,
+        train_df=train_df,
+        n_jobs=n_jobs,
+        cache=cache,
+        parallel_backend=parallel_backend,
+    )
+
+
+def _id_aligned_tables(
+    dataset: "ds.Dataset", columns: List[str], id_col: str, max_bytes: int
+) -> Iterator["pa.Table"]:
+    """Tables of at least `max_bytes` (or the remainder) that don't split any serie."""
+    import pyarrow as pa
+
+    buffer: List[pa.RecordBatch] = []
+    buffer_bytes = 0
+    for batch in dataset.to_batches(columns=columns):
+        if batch.num_rows == 0:
+            continue
+        buffer.append(batch)
+        buffer_bytes += batch.nbytes
+        if buffer_bytes < max_bytes:
+            continue
+        table = pa.Table.from_batches(buffer)
+        ids = table.column(id_col).to_pandas().to_numpy()
+        # the last serie can continue in the next batch
+        other_ids = np.flatnonzero(ids != ids[-1])
+        if other_ids.size == 0:
+            continue
+        split = other_ids[-1] + 1
+        yield table.slice(0, split)
+        buffer = table.slice(split).to_batches()
+        buffer_bytes = sum(b.nbytes for b in buffer)
+    if buffer:
+        yield pa.Table.from_batches(buffer)
+
+
+def evaluate_dataset(
+    path: Union[str, List[str]],
+    metrics: List[Callable],
+    models: Optional[List[str]] = None,
+    train_df: Optional[DFType] = None,
+    level: Optional[List[int]] = None,
+    id_col: str = "unique_id",
+    time_col: str = "ds",
+    target_col: str = "y",
+    cutoff_col: str = "cutoff",
+    agg_fn: Optional[str] = None,
+    weights: Optional[Union[str, DFType]] = None,
+    max_bytes: int = 256 * 2**20,
+    engine: str = "pandas",
+    output_path: Optional[str] = None,
+) -> Optional[DFType]:
+    """Evaluate the forecasts stored in a parquet dataset in chunks of bounded size.
+
+    The dataset is read in batches that are accumulated until they reach `max_bytes`,
+    then every complete serie in the buffer is evaluated and the last one is kept
+    for the next chunk, so the rows of each serie must be stored contiguously.
+
+    Args:
+        path (str or list of str): Parquet file(s) or directory with the forecasts.
+            Must have `id_col`, `time_col`, `target_col` and models' predictions.
+        metrics (list of callable): Functions with arguments `df`, `models`,
+            `id_col`, `target_col` and optionally `train_df`. Losses over all the
+            series at once, such as `wape`, aren't supported.
+        models (list of str, optional): Names of the models to evaluate. Only
+            these columns (and their intervals) are read. If `None` will use every
+            column in the dataset after removing id, time and target. Defaults to None.
+        train_df (pandas or polars DataFrame, optional): Training set. Used to
+            evaluate metrics such as `mase`. Defaults to None.
+        level (list of int, optional): Prediction interval levels. Used to compute
+            losses that rely on quantiles. Defaults to None.
+        id_col (str, optional): Column that identifies each serie.
+            Defaults to 'unique_id'.
+        time_col (str, optional): Column that identifies each timestep, its values
+            can be timestamps or integers. Defaults to 'ds'.
+        target_col (str, optional): Column that contains the target.
+            Defaults to 'y'.
+        cutoff_col (str, optional): Column that identifies the cutoff point for
+            each forecast cross-validation fold. Defaults to 'cutoff'.
+        agg_fn (str, optional): Statistic to compute on the scores by id to reduce
+            them to a single number. Can be 'mean', 'sum' or 'weighted_mean', which
+            are combined incrementally across chunks. Defaults to None.
+        weights (str, pandas or polars DataFrame, optional): Weights to use when
+            `agg_fn='weighted_mean'`. See `evaluate` for the details. Defaults to None.
+        max_bytes (int, optional): Size of the chunks of forecasts that are
+            evaluated at once. A chunk can be larger if a single serie exceeds it.
+            Defaults to 256MB.
+        engine (str, optional): Library used to evaluate each chunk, can be
+            'pandas' or 'polars'. Defaults to 'pandas'.
+        output_path (str, optional): Parquet file where the scores by id are written
+            as they're computed instead of being returned. Only used when `agg_fn`
+            is `None`. Defaults to None.
+
+    Returns:
+        pandas or polars DataFrame: Metrics with one row per (id, metric) combination
+            and one column per model, in the same order as `evaluate`, or one row
+            per metric if `agg_fn` is not `None`. `None` if `output_path` is set,
+            in which case the rows are written in the order of the chunks.
     """
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    if engine not in ("pandas", "polars"):
+        raise ValueError("`engine` must be either 'pandas' or 'polars'.")
+    if agg_fn is not None and agg_fn not in _DECOMPOSABLE_AGG_FNS:
+        raise ValueError(
+            f"`agg_fn` must be one of {_DECOMPOSABLE_AGG_FNS} when evaluating datasets."
+        )
     if weights is not None and agg_fn != "weighted_mean":
         raise ValueError("`weights` can only be used with `agg_fn='weighted_mean'`.")
     if agg_fn == "weighted_mean" and weights is None:
         raise ValueError("`agg_fn='weighted_mean'` requires setting `weights`.")
-    if not isinstance(df, (pd.DataFrame, pl_DataFrame)):
-        return _distributed_evaluate(
-            df=df,
-            metrics=metrics,
-            models=models,
-            train_df=train_df,
-            level=level,
-            weights=weights,
-            id_col=id_col,
-            time_col=time_col,
-            target_col=target_col,
-            cutoff_col=cutoff_col,
+    if output_path is not None and agg_fn is not None:
+        raise ValueError("`output_path` can only be used when `agg_fn` is None.")
+    frame_losses = [_function_name(m) for m in metrics if _is_frame_loss(m)]
+    if frame_losses:
+        raise ValueError(
+            f"The following metrics are computed over all the series at once and "
+            f"can't be evaluated by chunks: {frame_losses}. Please use `evaluate`."
+        )
+    if weights is not None and not isinstance(weights, str):
+        weights = nw.from_native(weights).to_pandas()
+    plan = EvaluationPlan(
+        metrics=metrics,
+        models=models,
+        level=level,
+        id_col=id_col,
+        time_col=time_col,
+        target_col=target_col,
+        cutoff_col=cutoff_col,
+    )
+    dataset = ds.dataset(path, format="parquet")
+    # indices stored by pandas aren't models
+    pandas_metadata = dataset.schema.pandas_metadata or {}
+    index_cols = [c for c in pandas_metadata.get("index_columns", []) if isinstance(c, str)]
+    columns = [c for c in dataset.schema.names if c not in index_cols]
+    if models is not None:
+        columns = [
+            c
+            for c in columns
+            if c in (id_col, time_col, target_col, cutoff_col)
+            or any(c == m or c.startswith(f"{m}-") for m in models)
+        ]
+
+    seen_ids: set = set()
+    results = []
+    model_cols: List[str] = []
+    writer = None
+    try:
+        for table in _id_aligned_tables(dataset, columns, id_col, max_bytes):
+            chunk = table.to_pandas() if engine == "pandas" else pl.from_arrow(table)
+            chunk_ids = _unique_ids(chunk, id_col)
+            if chunk_ids & seen_ids:
+                raise ValueError(
+                    "The rows of each serie must be stored contiguously in the dataset."
+                )
+            seen_ids |= chunk_ids
+            chunk_train_df = train_df
+            if train_df is not None:
+                chunk_train_df = (
+                    nw.from_native(train_df)
+                    .filter(nw.col(id_col).is_in(list(chunk_ids)))
+                    .to_native()
+                )
+            res = plan.run(df=chunk, train_df=chunk_train_df)
+            group_cols = _get_group_cols(res, id_col, cutoff_col)
+            model_cols = [
+                c for c in nw.from_native(res).columns if c not in (*group_cols, "metric")
+            ]
+            if agg_fn is not None:
+                res = _partial_aggregates(
+                    res=nw.from_native(res).to_pandas(),
+                    forecasts_df=nw.from_native(chunk).to_pandas(),
+                    model_cols=model_cols,
+                    weights=weights,
+                    id_col=id_col,
+                    target_col=target_col,
+                    cutoff_col=cutoff_col,
+                )
+            elif output_path is not None:
+                res_table = nw.from_native(res).to_arrow()
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, res_table.schema)
+                writer.write_table(res_table.cast(writer.schema))
+                continue
+            results.append(res)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if output_path is not None:
+        return None
+    if not results:
+        raise ValueError("The dataset doesn't contain any rows.")
+    if agg_fn is not None:
+        out = _combine_partial_aggregates(
+            pd.concat(results, ignore_index=True),
+            model_cols=model_cols,
             agg_fn=agg_fn,
+            cutoff_col=cutoff_col,
         )
-    if models is None:
-        model_cols = _get_model_cols(df.columns, id_col, time_col, target_col, cutoff_col)
-    else:
-        model_cols = models
-    forecasts_df = df
-
-    # interval cols
-    if level is not None:
-        expected_cols = {
-            f"{m}-{side}-{lvl}"
-            for m in model_cols
-            for side in ("lo", "hi")
-            for lvl in level
-        }
-        missing = expected_cols - set(df.columns)
-        if missing:
-            raise ValueError(
-                f"The following columns are required for level={level} "
-                f"and are missing: {missing}"
-            )
+        if agg_fn == "weighted_mean":
+            # same order as evaluate
+            keys = [c for c in (cutoff_col, "metric") if c in out.columns]
+            out = out.sort_values(keys, ignore_index=True)
+        return out if engine == "pandas" else pl.from_pandas(out)
+    if engine == "pandas":
+        out = pd.concat(results, ignore_index=True)
     else:
-        requires_level = [
-            m
-            for m in metrics
-            if get_origin(inspect.signature(m).parameters["models"].annotation) is dict
-        ]
-        if requires_level:
-            raise ValueError(
-                f"The following metrics require setting `level`: {requires_level}"
+        out = pl.concat(results, how="diagonal")
+    # same order as evaluate: by metric and then by (cutoff and) id
+    nw_out = nw.from_native(out)
+    metric_names = pd.unique(nw_out["metric"].to_numpy())
+    out = (
+        nw_out.with_columns(
+            nw.col("metric")
+            .replace_strict(
+                {name: i for i, name in enumerate(metric_names)},
+                return_dtype=nw.Int64,
             )
+            .alias(_SHARD_COL)
+        )
+        .sort(_SHARD_COL, *_get_group_cols(out, id_col, cutoff_col))
+        .drop(_SHARD_COL)
+        .to_native()
+    )
+    return ufp.drop_index_if_pandas(out)
 
-    # y_train
-    metric_requires_y_train = {
-        _function_name(m): "train_df" in inspect.signature(m).parameters
-        for m in metrics
-    }
-    y_train_metrics = [
-        m for m, requires_yt in metric_requires_y_train.items() if requires_yt
-    ]
-    if y_train_metrics:
-        if train_df is None:
-            raise ValueError(
-                f"The following metrics require y_train: {y_train_metrics}. "
-                "Please provide `train_df`."
-            )
-        train_df = ufp.sort(train_df, by=[id_col, time_col])
-        missing_series = set(df[id_col].unique()) - set(train_df[id_col].unique())
-        if missing_series:
-            raise ValueError(
-                f"The following series are missing from the train_df: {reprlib.repr(missing_series)}"
-            )
 
-    results_per_metric = []
-    for metric in metrics:
-        metric_name = _function_name(metric)
-        kwargs = dict(df=df, models=model_cols, id_col=id_col, target_col=target_col)
-        if metric_requires_y_train[metric_name]:
-            kwargs["train_df"] = train_df
-            kwargs["cutoff_col"] = cutoff_col
-            kwargs["time_col"] = time_col
-        metric_params = inspect.signature(metric).parameters
-        if "baseline" in metric_params:
-            metric_name = f"{metric_name}_{metric_params['baseline'].default}"
-        if "q" in metric_params or metric_params["models"].annotation is Dict[str, str]:
-            assert level is not None  # we've already made sure of this above
-            for lvl in level:
-                quantiles = _quantiles_from_levels([lvl])
-                for q, side in zip(quantiles, ["lo", "hi"]):
-                    kwargs["models"] = {
-                        model: f"{model}-{side}-{lvl}" for model in model_cols
-                    }
-                    if "q" in metric_params:
-                        # this is for calibration, since it uses the predictions for q
-                        # but doesn't use it
-                        kwargs["q"] = q
-                    result = metric(**kwargs)
-                    result = ufp.assign_columns(result, "metric", f"{metric_name}_q{q}")
-                    results_per_metric.append(result)
-        elif "quantiles" in metric_params:
-            assert level is not None  # we've already made sure of this above
-            quantiles = _quantiles_from_levels(level)
-            kwargs["quantiles"] = quantiles
-            kwargs["models"] = {
-                model: _models_from_levels(model, level) for model in model_cols
-            }
-            result = metric(**kwargs)
-            result = ufp.assign_columns(result, "metric", metric_name)
-            results_per_metric.append(result)
-        elif "level" in metric_params:
-            assert level is not None  # we've already made sure of this above
-            for lvl in level:
-                kwargs["level"] = lvl
-                result = metric(**kwargs)
-                result = ufp.assign_columns(
-                    result, "metric", f"{metric_name}_level{lvl}"
-                )
-                results_per_metric.append(result)
-        else:
-            result = metric(**kwargs)
-            result = ufp.assign_columns(result, "metric", metric_name)
-            results_per_metric.append(result)
-    if isinstance(df, pd.DataFrame):
-        df = pd.concat(results_per_metric).reset_index(drop=True)
-    else:
-        df = pl.concat(results_per_metric, how="diagonal")
+def _bootstrap_scores(
+    df: DFType,
+    n_resamples: int,
+    method: str,
+    seed: int,
+    id_col: str,
+    cutoff_col: str,
+) -> Tuple[nw.DataFrame, List[str], np.ndarray, np.ndarray]:
+    """Scores by serie and the weights of the series in every resample.
+
+    Returns the keys, the models, the scores with shape (ids, groups, models),
+    which are NaN where missing, and the weights with shape (resamples, ids)."""
+    if method not in ("multinomial", "poisson"):
+        raise ValueError("`method` must be either 'multinomial' or 'poisson'.")
+    if n_resamples < 1:
+        raise ValueError("`n_resamples` must be a positive integer.")
+    nw_df = nw.from_native(df)
+    # the scores by horizon of `evaluate` have a "horizon" key
+    group_cols = [c for c in (cutoff_col, "horizon", "metric") if c in nw_df.columns]
+    models = [c for c in nw_df.columns if c not in (id_col, *group_cols)]
+    keys = nw_df.select(*group_cols).unique(maintain_order=True)
+    groups = (
+        nw_df.select(*group_cols)
+        .with_row_index(_ROW_COL)
+        .join(keys.with_row_index(_PARTITION_COL), on=group_cols, how="left")
+        .sort(_ROW_COL)[_PARTITION_COL]
+        .to_numpy()
+    )
+    ids, uniques = pd.factorize(nw_df[id_col].to_numpy())
+    n_ids, n_groups = len(uniques), keys.shape[0]
+    scores = np.full((n_ids, n_groups, len(models)), np.nan)
+    scores[ids, groups] = nw_df.select(nw.col(*models).cast(nw.Float64)).to_numpy()
 
-    if cutoff_col in df.columns:
-        id_cols = [id_col, cutoff_col, "metric"]
+    rng = np.random.default_rng(seed)
+    if method == "multinomial":
+        weights = rng.multinomial(n_ids, np.full(n_ids, 1 / n_ids), size=n_resamples)
     else:
-        id_cols = [id_col, "metric"]
+        weights = rng.poisson(1.0, size=(n_resamples, n_ids))
+    return keys, models, scores, weights.astype(np.float64)
 
-    model_cols = [c for c in df.columns if c not in id_cols]
-    df = df[id_cols + model_cols]
-    if agg_fn is not None:
-        if agg_fn == "weighted_mean":
-            assert weights is not None
-            df = _weighted_mean_agg(
-                df=df,
-                forecasts_df=forecasts_df,
-                weights=weights,
-                id_col=id_col,
-                target_col=target_col,
-                cutoff_col=cutoff_col,
-                model_cols=model_cols,
-            )
-        else:
-            group_cols = id_cols[1:]  # exclude id_col
-            df = ufp.group_by_agg(
-                df,
-                by=group_cols,
-                aggs={m: agg_fn for m in model_cols},
-                maintain_order=True,
+
+def _bootstrap_means(
+    scores: np.ndarray,
+    weights: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Means of the scores over the series for the sample and every resample.
+
+    The missing scores don't count, so the means with shape scores.shape[1:] and
+    (resamples, *scores.shape[1:]) are NaN where no serie has a score."""
+    shape = scores.shape[1:]
+    # (ids, groups * models) matrix of scores
+    scores = scores.reshape(scores.shape[0], -1)
+    valid = ~np.isnan(scores)
+    scores = np.where(valid, scores, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = scores.sum(axis=0) / valid.sum(axis=0)
+        resampled = (weights @ scores) / (weights @ valid)
+    return means.reshape(shape), resampled.reshape(-1, *shape)
+
+
+def _bootstrap_output(
+    keys: nw.DataFrame,
+    columns: Dict[str, np.ndarray],
+) -> DFType:
+    backend = nw.get_native_namespace(keys)
+    out = ufp.drop_index_if_pandas(keys.to_native())
+    return (
+        nw.from_native(out)
+        .with_columns(
+            *[
+                nw.new_series(name, values, nw.Float64, backend=backend)
+                for name, values in columns.items()
+            ]
+        )
+        .to_native()
+    )
+
+
+def bootstrap_ci(
+    df: DFType,
+    level: Optional[List[int]] = None,
+    n_resamples: int = 1_000,
+    method: str = "multinomial",
+    seed: int = 0,
+    id_col: str = "unique_id",
+    cutoff_col: str = "cutoff",
+) -> DFType:
+    """Bootstrap confidence intervals of the mean of the scores by metric.
+
+    The series are resampled with replacement and every resample is computed as
+    a weighted mean of the scores by serie, so all of them take a single matrix
+    multiplication over the scores computed by `evaluate`.
+
+    Args:
+        df (pandas or polars DataFrame): Scores by serie, i.e. the output of
+            `evaluate` with `agg_fn=None`.
+        level (list of int, optional): Confidence levels of the intervals.
+            Defaults to [95].
+        n_resamples (int, optional): Number of bootstrap resamples. Defaults to 1000.
+        method (str, optional): Weights of the series in each resample. 'multinomial'
+            draws as many series as there are, 'poisson' draws independent
+            Poisson(1) weights. Defaults to 'multinomial'.
+        seed (int, optional): Seed for the resamples. Defaults to 0.
+        id_col (str, optional): Column that identifies each serie.
+            Defaults to 'unique_id'.
+        cutoff_col (str, optional): Column that identifies the cutoff point for
+            each forecast cross-validation fold. Defaults to 'cutoff'.
+
+    Returns:
+        pandas or polars DataFrame: One row per metric (and cutoff or horizon)
+            with the mean of each model and its bounds in `{model}-lo-{level}`
+            and `{model}-hi-{level}`.
+    """
+    if level is None:
+        level = [95]
+    keys, models, scores, weights = _bootstrap_scores(
+        df=df,
+        n_resamples=n_resamples,
+        method=method,
+        seed=seed,
+        id_col=id_col,
+        cutoff_col=cutoff_col,
+    )
+    means, resampled = _bootstrap_means(scores, weights)
+    columns = {}
+    for j, model in enumerate(models):
+        columns[model] = means[:, j]
+        for lv in level:
+            alpha = (100 - lv) / 2
+            columns[f"{model}-lo-{lv}"] = np.nanpercentile(resampled[:, :, j], alpha, axis=0)
+            columns[f"{model}-hi-{lv}"] = np.nanpercentile(
+                resampled[:, :, j], 100 - alpha, axis=0
             )
-    return df
+    return _bootstrap_output(keys, columns)
+
+
+def paired_bootstrap_test(
+    df: DFType,
+    baseline: str,
+    level: Optional[List[int]] = None,
+    n_resamples: int = 1_000,
+    method: str = "multinomial",
+    seed: int = 0,
+    id_col: str = "unique_id",
+    cutoff_col: str = "cutoff",
+) -> DFType:
+    """Paired bootstrap test of the difference in the mean score of each model and a baseline.
+
+    The differences are computed by serie, only over the series scored by both
+    models, and averaged on the same resamples of the series, which are drawn as
+    in `bootstrap_ci`. Resamples that don't contain any of those series are left
+    out of the intervals and the p-value.
+
+    Args:
+        df (pandas or polars DataFrame): Scores by serie, i.e. the output of
+            `evaluate` with `agg_fn=None`.
+        baseline (str): Model to compare the rest against.
+        level (list of int, optional): Confidence levels of the intervals of the
+            differences. Defaults to [95].
+        n_resamples (int, optional): Number of bootstrap resamples. Defaults to 1000.
+        method (str, optional): Weights of the series in each resample, either
+            'multinomial' or 'poisson'. Defaults to 'multinomial'.
+        seed (int, optional): Seed for the resamples. Defaults to 0.
+        id_col (str, optional): Column that identifies each serie.
+            Defaults to 'unique_id'.
+        cutoff_col (str, optional): Column that identifies the cutoff point for
+            each forecast cross-validation fold. Defaults to 'cutoff'.
+
+    Returns:
+        pandas or polars DataFrame: One row per metric (and cutoff or horizon)
+            with the difference of each model's mean and the baseline's, its
+            bounds in `{model}-lo-{level}` and `{model}-hi-{level}` and the
+            two-sided p-value of the difference being zero in `{model}-p_value`.
+    """
+    if level is None:
+        level = [95]
+    keys, models, scores, weights = _bootstrap_scores(
+        df=df,
+        n_resamples=n_resamples,
+        method=method,
+        seed=seed,
+        id_col=id_col,
+        cutoff_col=cutoff_col,
+    )
+    if baseline not in models:
+        raise ValueError(f"The baseline {baseline} is not one of the models: {models}.")
+    base_idx = models.index(baseline)
+    others = [j for j in range(len(models)) if j != base_idx]
+    # differences by serie, which are NaN unless both models have a score
+    means, resampled = _bootstrap_means(
+        scores[:, :, others] - scores[:, :, [base_idx]], weights
+    )
+    # resamples without any serie scored by both models don't count
+    n_draws = (~np.isnan(resampled)).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tails = np.minimum(
+            (resampled <= 0).sum(axis=0) / n_draws,
+            (resampled >= 0).sum(axis=0) / n_draws,
+        )
+    columns = {}
+    for k, j in enumerate(others):
+        model = models[j]
+        diffs = resampled[:, :, k]
+        columns[model] = means[:, k]
+        for lv in level:
+            alpha = (100 - lv) / 2
+            columns[f"{model}-lo-{lv}"] = np.nanpercentile(diffs, alpha, axis=0)
+            columns[f"{model}-hi-{lv}"] = np.nanpercentile(diffs, 100 - alpha, axis=0)
+        columns[f"{model}-p_value"] = np.minimum(2 * tails[:, k], 1.0)
+    return _bootstrap_output(keys, columns)
@@ -3,18 +3,85 @@
 __all__ = ['fourier', 'trend', 'time_features', 'future_exog_to_historic', 'pipeline']
 
 
-from functools import partial
-from typing import Callable, List, Optional, Tuple, Union
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
 import utilsforecast.processing as ufp
 
-from .compat import DataFrame, DFType, pl, pl_DataFrame, pl_Expr
-from .validation import validate_format, validate_freq
-
-_Features = Tuple[List[str], np.ndarray, np.ndarray]
+from .compat import DataFrame, DFType, pl, pl_DataFrame, pl_Expr, pl_Series
+from .preprocessing import id_time_grid
+from .validation import _is_dt_dtype, _is_int_dtype, validate_format, validate_freq
+
+_Features = Tuple[List[str], np.ndarray]
+
+
+class _FeatureContext:
+    """Series layout of a frame: sizes, sort order, last times and future grid.
+
+    `pipeline` builds one for the `fourier`, `trend` and `time_features` partials
+    it gets. Each call to `fourier` or `trend` builds its own, and the rest of the
+    features don't use it."""
+
+    def __init__(
+        self,
+        df: DataFrame,
+        freq: Union[str, int],
+        h: int,
+        id_col: str,
+        time_col: str,
+    ):
+        # validations
+        if not isinstance(h, int) or h < 0:
+            raise ValueError("`h` must be a non-negative integer")
+        validate_format(df, id_col, time_col, None)
+        validate_freq(df[time_col], freq)
+        self.freq = freq
+        self.h = h
+        self.id_col = id_col
+        self.time_col = time_col
+
+        # decompose series
+        id_counts = ufp.counts_by_id(df, id_col)
+        self.uids = id_counts[id_col]
+        self.sizes = id_counts["counts"].to_numpy()
+        self.sort_idxs = ufp.maybe_compute_sort_indices(df, id_col, time_col)
+        times = df[time_col]
+        self.restore_idxs: Optional[np.ndarray] = None
+        if self.sort_idxs is not None:
+            self.restore_idxs = np.empty_like(self.sort_idxs)
+            self.restore_idxs[self.sort_idxs] = np.arange(self.sort_idxs.size)
+            times = ufp.take_rows(times, self.sort_idxs)
+        self.last_times = ufp.take_rows(times, self.sizes.cumsum() - 1)
+        self._future_df: Optional[DataFrame] = None
+
+    @property
+    def n_samples(self) -> int:
+        """Number of rows of the feature tables: longest serie plus horizon."""
+        return int(self.sizes.max()) + self.h
+
+    @property
+    def future_df(self) -> DataFrame:
+        """Ids and times of the forecast horizon, built on first access."""
+        if self._future_df is None:
+            self._future_df = ufp.make_future_dataframe(
+                uids=self.uids,
+                last_times=self.last_times,
+                freq=self.freq,
+                h=self.h,
+                id_col=self.id_col,
+                time_col=self.time_col,
+            )
+        return self._future_df
+
+    def slice_features(self, feats: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Align a feature table with the rows of the frame and the horizon."""
+        vals, future_vals = _assign_slices(sizes=self.sizes, feats=feats, h=self.h)
+        if self.restore_idxs is not None:
+            vals = vals[self.restore_idxs]
+        return vals, future_vals
 
 
 def _add_features(
@@ -23,47 +90,16 @@ def _add_features(
     h: int,
     id_col: str,
     time_col: str,
-    f: Callable[[np.ndarray, int], _Features],
+    f: Callable[[int], _Features],
 ) -> Tuple[DFType, DFType]:
-    # validations
-    if not isinstance(h, int) or h < 0:
-        raise ValueError("`h` must be a non-negative integer")
-    validate_format(df, id_col, time_col, None)
-    validate_freq(df[time_col], freq)
-
-    # decompose series
-    id_counts = ufp.counts_by_id(df, id_col)
-    uids = id_counts[id_col]
-    sizes = id_counts["counts"].to_numpy()
-
-    # compute values
-    cols, vals, future_vals = f(sizes=sizes, h=h)  # type: ignore
-
-    # assign back to df
-    sort_idxs = ufp.maybe_compute_sort_indices(df, id_col, time_col)
-    times = df[time_col]
-    if sort_idxs is not None:
-        restore_idxs = np.empty_like(sort_idxs)
-        restore_idxs[sort_idxs] = np.arange(sort_idxs.size)
-        vals = vals[restore_idxs]
-        times = ufp.take_rows(times, sort_idxs)
-    last_times = ufp.take_rows(times, sizes.cumsum() - 1)
+    ctx = _FeatureContext(df, freq=freq, h=h, id_col=id_col, time_col=time_col)
+    cols, feats = f(n_samples=ctx.n_samples)  # type: ignore
+    vals, future_vals = ctx.slice_features(feats)
     df = ufp.copy_if_pandas(df, deep=False)
     transformed = ufp.assign_columns(df, cols, vals)
-
     if h == 0:
         return transformed, type(df)({})
-
-    # future vals
-    future_df = ufp.make_future_dataframe(
-        uids=uids,
-        last_times=last_times,
-        freq=freq,
-        h=h,
-        id_col=id_col,
-        time_col=time_col,
-    )
-    future_df = ufp.assign_columns(future_df, cols, future_vals)
+    future_df = ufp.assign_columns(ctx.future_df, cols, future_vals)
     return transformed, future_df
 
 
@@ -72,39 +108,32 @@ def _assign_slices(
     feats: np.ndarray,
     h: int,
 ) -> Tuple[np.ndarray, np.ndarray]:
-    max_samples, n_feats = feats.shape
-    vals = np.empty((sizes.sum(), n_feats), dtype=np.float32)
-    future_vals = np.empty((h * sizes.size, n_feats))
-    start = 0
-    for i, size in enumerate(sizes):
-        vals[start : start + size, :] = feats[max_samples - size - h : max_samples - h]
-        future_vals[i * h : (i + 1) * h] = feats[max_samples - h :]
-        start += size
+    max_samples = feats.shape[0]
+    # every serie takes the `size` rows that end right before the horizon
+    sizes = sizes.astype(np.int64, copy=False)
+    ends = sizes.cumsum()
+    first_rows = np.repeat(max_samples - h - sizes - (ends - sizes), sizes)
+    rows = first_rows + np.arange(ends[-1] if sizes.size else 0)
+    feats = feats.astype(np.float32, copy=False)
+    vals = feats[rows]
+    future_vals = np.tile(feats[max_samples - h :], (sizes.size, 1))
     return vals, future_vals
 
 
-def _fourier(
-    sizes: np.ndarray,
-    h: int,
-    season_length: int,
-    k: int,
-) -> _Features:
+def _fourier(n_samples: int, season_length: int, k: int) -> _Features:
     # taken from: https://github.com/tblume1992/TSUtilities/blob/main/TSUtilities/TSFeatures/fourier_seasonality.py
     x = 2 * np.pi * np.arange(1, k + 1) / season_length
     x = x.astype(np.float32)
-    t = np.arange(1, sizes.max() + 1 + h, dtype=np.float32)
+    t = np.arange(1, n_samples + 1, dtype=np.float32)
     x = x * t[:, None]
     terms = np.hstack([np.sin(x), np.cos(x)])
     cols = [f"{op}{i+1}_{season_length}" for op in ("sin", "cos") for i in range(k)]
-    vals, future_vals = _assign_slices(sizes=sizes, feats=terms, h=h)
-    return cols, vals, future_vals
+    return cols, terms
 
 
-def _trend(sizes: np.ndarray, h: int) -> _Features:
-    t = np.arange(1, sizes.max() + 1 + h, dtype=np.float32).reshape(-1, 1)
-    cols = ["trend"]
-    vals, future_vals = _assign_slices(sizes=sizes, feats=t, h=h)
-    return cols, vals, future_vals
+def _trend(n_samples: int) -> _Features:
+    t = np.arange(1, n_samples + 1, dtype=np.float32).reshape(-1, 1)
+    return ["trend"], t
 
 
 def fourier(
@@ -208,21 +237,154 @@ def _compute_time_feature(
     return feat_name, feat_vals
 
 
+def _time_keys(times: Union[pd.Index, pd.Series]) -> np.ndarray:
+    """Sortable integers of pandas times (UTC nanoseconds for datetimes)."""
+    if _is_dt_dtype(times):
+        return times.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    return times.to_numpy()
+
+
+def _calendar_positions(
+    calendar: np.ndarray, keys: np.ndarray
+) -> Optional[np.ndarray]:
+    """Row of the sorted `calendar` of every key, None if a key isn't in it."""
+    steps = np.diff(calendar)
+    if steps.size and (steps == steps[0]).all():
+        # regular calendar: integer offset from its start
+        pos, rem = np.divmod(keys - calendar[0], steps[0])
+        found = not rem.any() and pos.min() >= 0 and pos.max() < calendar.size
+    else:
+        pos = np.searchsorted(calendar, keys)
+        pos[pos == calendar.size] = 0
+        found = np.array_equal(calendar[pos], keys)
+    return pos if found else None
+
+
+# the calendar tables are only built when they're small or not much larger than
+# the number of distinct times, since they hold every timestamp of the span
+_CALENDAR_MIN_SIZE = 100_000
+_CALENDAR_MAX_RATIO = 4
+
+
+def _calendar_size(start: Any, end: Any, freq: Any, is_pandas: bool) -> float:
+    """Approximate number of timestamps of `freq` between `start` and `end`."""
+    if isinstance(freq, int):
+        return (end - start) // freq + 1
+    # average step over a few periods, calendar frequencies have varying lengths
+    n_steps = 10
+    if is_pandas:
+        probe = start + n_steps * pd.tseries.frequencies.to_offset(freq)
+    else:
+        probe = pl_Series([start])
+        for _ in range(n_steps):
+            probe = probe.dt.offset_by(freq)
+        probe = probe.item()
+    return (end - start) / ((probe - start) / n_steps) + 1
+
+
+@lru_cache(maxsize=8)
+def _calendar_table(
+    start: Any,
+    end: Any,
+    dtype: Any,
+    freq: Any,
+    features: Tuple[Union[str, Callable], ...],
+    time_col: str,
+    is_pandas: bool,
+) -> DataFrame:
+    """Time features of every timestamp between `start` and `end`."""
+    id_col = f"_{time_col}"
+    if is_pandas:
+        seed: DataFrame = pd.DataFrame(
+            {id_col: [0], time_col: pd.Series([start], dtype=dtype)}
+        )
+    else:
+        seed = pl_DataFrame({id_col: [0], time_col: pl_Series([start], dtype=dtype)})
+    grid = id_time_grid(
+        seed, freq=freq, start=start, end=end, id_col=id_col, time_col=time_col
+    )
+    return _add_time_features(
+        df=grid[[time_col]], features=list(features), time_col=time_col
+    )
+
+
+def _maybe_calendar_table(
+    times: List[Union[pd.Series, pl_Series]],
+    freq: Union[str, int, pd.offsets.BaseOffset],
+    features: List[Union[str, Callable]],
+    time_col: str,
+) -> Optional[DataFrame]:
+    """Cached calendar table spanning all `times`, if `freq` can generate it."""
+    is_pandas = isinstance(times[0], pd.Series)
+    if _is_dt_dtype(times[0]):
+        usable = not isinstance(freq, int) and (is_pandas or isinstance(freq, str))
+    else:
+        usable = _is_int_dtype(times[0]) and isinstance(freq, int)
+    if not usable or not len(times[0]):
+        return None
+    if is_pandas:
+        if _is_dt_dtype(times[0]) and times[0].dt.tz is not None:
+            # the pandas grid is built in utc, which has other calendar features
+            return None
+        # reduce the integer keys, which is faster than the datetime reductions
+        keys = [_time_keys(t) for t in times]
+        start = min(k.min() for k in keys)
+        end = max(k.max() for k in keys)
+        if _is_dt_dtype(times[0]):
+            if start == np.iinfo(np.int64).min:
+                # null times can't be looked up
+                return None
+            start, end = pd.Timestamp(start), pd.Timestamp(end)
+    else:
+        start = min(t.min() for t in times)
+        end = max(t.max() for t in times)
+        if start is None:
+            return None
+    size = _calendar_size(start, end, freq, is_pandas)
+    if size > _CALENDAR_MIN_SIZE:
+        if is_pandas:
+            n_unique = pd.unique(np.concatenate(keys)).size
+        else:
+            n_unique = pl.concat(times).n_unique()
+        if size > _CALENDAR_MAX_RATIO * n_unique:
+            return None
+    return _calendar_table(
+        start=start,
+        end=end,
+        dtype=times[0].dtype,
+        freq=freq,
+        features=tuple(features),
+        time_col=time_col,
+        is_pandas=is_pandas,
+    )
+
+
 def _add_time_features(
     df: DFType,
     features: List[Union[str, Callable]],
     time_col: str = "ds",
+    table: Optional[DataFrame] = None,
 ) -> DFType:
     df = ufp.copy_if_pandas(df, deep=False)
-    unique_times = df[time_col].unique()
     if isinstance(df, pd.DataFrame):
-        times = pd.Index(unique_times)
-        time2pos = {time: i for i, time in enumerate(times)}
-        restore_idxs = df[time_col].map(time2pos).to_numpy()
+        keys = _time_keys(df[time_col])
+        if table is not None:
+            pos = _calendar_positions(_time_keys(table[time_col]), keys)
+            if pos is not None:
+                for name in table.columns.drop(time_col):
+                    df[name] = table[name].to_numpy()[pos]
+                return df
+        times = pd.Index(df[time_col].unique())
+        times_keys = _time_keys(times)
+        order = times_keys.argsort()
+        times = times[order]
+        restore_idxs = np.searchsorted(times_keys[order], keys)
         for feature in features:
             name, vals = _compute_time_feature(times, feature)
             df[name] = vals[restore_idxs]
     elif isinstance(df, pl_DataFrame):
+        if table is not None and df[time_col].is_in(table[time_col]).all():
+            return df.join(table, on=time_col, how="left")
         exprs = []
         for feature in features:
             name, vals = _compute_time_feature(pl.col(time_col), feature)
@@ -231,7 +393,7 @@ def _add_time_features(
             else:
                 assert isinstance(vals, pl_Expr)
                 exprs.append(vals.alias(name))
-        feats = unique_times.to_frame().with_columns(*exprs)
+        feats = df[time_col].unique().to_frame().with_columns(*exprs)
         df = df.join(feats, on=time_col, how="left")
     return df
 
@@ -264,8 +426,9 @@ def time_features(
             containing the original DataFrame with the computed features and
             DataFrame with future values.
     """
-    transformed = _add_time_features(df=df, features=features, time_col=time_col)
     if h == 0:
+        table = _maybe_calendar_table([df[time_col]], freq, features, time_col)
+        transformed = _add_time_features(df, features, time_col, table)
         return transformed, type(df)({})
     times_by_id = ufp.group_by_agg(df, id_col, {time_col: "max"}, maintain_order=True)
     times_by_id = ufp.sort(times_by_id, id_col)
@@ -277,7 +440,11 @@ def time_features(
         id_col=id_col,
         time_col=time_col,
     )
-    future = _add_time_features(df=future, features=features, time_col=time_col)
+    table = _maybe_calendar_table(
+        [df[time_col], future[time_col]], freq, features, time_col
+    )
+    transformed = _add_time_features(df, features, time_col, table)
+    future = _add_time_features(future, features, time_col, table)
     return transformed, future
 
 
@@ -332,6 +499,40 @@ def future_exog_to_historic(
     return df, future
 
 
+_TABLE_FEATURES: Dict[Tuple[Callable, FrozenSet[str]], Callable[..., _Features]] = {
+    (fourier, frozenset(["season_length", "k"])): _fourier,
+    (trend, frozenset()): _trend,
+}
+
+
+def _unwrap_feature(f: Callable) -> Tuple[Callable, Dict[str, Any]]:
+    """Split a feature into its function and the keyword arguments fixed on it."""
+    if isinstance(f, partial) and not f.args:
+        return f.func, f.keywords
+    return f, {}
+
+
+def _append_features(df: DFType, feats: Dict[str, Any]) -> DFType:
+    """Add all feature columns to `df` at once, replacing existing ones."""
+    replaced = [c for c in feats if c in df.columns]
+    if isinstance(df, pd.DataFrame):
+        values = {
+            name: v.array if isinstance(v, pd.Series) else v
+            for name, v in feats.items()
+        }
+        out = pd.concat(
+            [df.drop(columns=replaced), pd.DataFrame(values, index=df.index)], axis=1
+        )
+    else:
+        out = df.drop(replaced).hstack(
+            [
+                pl.Series(name, v) if isinstance(v, np.ndarray) else v.alias(name)
+                for name, v in feats.items()
+            ]
+        )
+    return out
+
+
 def pipeline(
     df: DFType,
     features: List[Callable],
@@ -342,6 +543,12 @@ def pipeline(
 ) -> Tuple[DFType, DFType]:
     """Compute several features for training and forecasting
 
+    The partials of `fourier`, `trend` and `time_features` share the series
+    layout and the future dataframe, which are computed once, and the terms of
+    `fourier` and `trend` are aligned with the rows in a single block. Any other
+    feature is called with `df` and computes its own. All the feature columns are
+    then added to the dataframes in a single concatenation.
+
     Args:
         df (pandas or polars DataFrame): Dataframe with ids, times and values
             for the exogenous regressors.
@@ -360,17 +567,55 @@ def pipeline(
             containing the original DataFrame with the computed features and
             DataFrame with future values.
     """
-    transformed: Optional[DataFrame] = None
-    future: Optional[DataFrame] = None
+    ctx = _FeatureContext(df, freq=freq, h=h, id_col=id_col, time_col=time_col)
+    # fourier and trend terms are sliced together into a single block
+    tables: List[np.ndarray] = []
+    table_cols: List[str] = []
+    feat_cols: List[str] = []
+    hist_feats: Dict[str, Any] = {}
+    future_feats: Dict[str, Any] = {}
     for f in features:
-        f_transformed, f_future = f(
-            df=df, freq=freq, h=h, id_col=id_col, time_col=time_col
-        )
-        if transformed is None:
-            transformed = f_transformed
-            future = f_future
+        func, kwargs = _unwrap_feature(f)
+        table_f = _TABLE_FEATURES.get((func, frozenset(kwargs)))
+        if table_f is not None:
+            cols, feats = table_f(n_samples=ctx.n_samples, **kwargs)
+            tables.append(feats)
+            table_cols.extend(cols)
+        elif func is time_features and set(kwargs) == {"features"}:
+            times = [df[time_col]]
+            if h > 0:
+                times.append(ctx.future_df[time_col])
+            table = _maybe_calendar_table(times, freq, kwargs["features"], time_col)
+            f_transformed = _add_time_features(
+                df[[time_col]], kwargs["features"], time_col, table
+            )
+            cols = [c for c in f_transformed.columns if c != time_col]
+            hist_feats.update({c: f_transformed[c] for c in cols})
+            if h > 0:
+                f_future = _add_time_features(
+                    ctx.future_df[[time_col]], kwargs["features"], time_col, table
+                )
+                future_feats.update({c: f_future[c] for c in cols})
         else:
-            feat_cols = [c for c in f_future.columns if c not in (id_col, time_col)]
-            transformed = ufp.horizontal_concat([transformed, f_transformed[feat_cols]])
-            future = ufp.horizontal_concat([future, f_future[feat_cols]])
+            f_transformed, f_future = f(
+                df=df, freq=freq, h=h, id_col=id_col, time_col=time_col
+            )
+            cols = [
+                c
+                for c in f_transformed.columns
+                if c not in (id_col, time_col)
+                and (c not in df.columns or c in f_future.columns)
+            ]
+            hist_feats.update({c: f_transformed[c] for c in cols})
+            if h > 0:
+                future_feats.update({c: f_future[c] for c in cols})
+        feat_cols.extend(c for c in cols if c not in feat_cols)
+    if tables:
+        vals, future_vals = ctx.slice_features(np.hstack(tables))
+        hist_feats.update({c: vals[:, i] for i, c in enumerate(table_cols)})
+        future_feats.update({c: future_vals[:, i] for i, c in enumerate(table_cols)})
+    transformed = _append_features(df, {c: hist_feats[c] for c in feat_cols})
+    if h == 0:
+        return transformed, type(df)({})
+    future = _append_features(ctx.future_df, {c: future_feats[c] for c in feat_cols})
     return transformed, future
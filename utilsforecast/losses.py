@@ -27,18 +27,27 @@ __all__ = [
     "linex"
 ]
 
-from typing import Callable, Dict, List, Union
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 import narwhals.stable.v2 as nw
 import numpy as np
 from narwhals.stable.v2.typing import IntoDataFrameT
 
 
+# step of the forecast, added by `evaluate(..., by_horizon=True)`
+_HORIZON_COL = "__utilsforecast_horizon"
+# prefix of the validation flags kept by the losses of lazy frames
+_FLAG_PREFIX = "__utilsforecast_flag: "
+
+
 def _get_group_cols(df: IntoDataFrameT, id_col: str, cutoff_col: str) -> list[str]:
-    if cutoff_col in df.columns:
+    columns = nw.from_native(df).columns
+    if cutoff_col in columns:
         group_cols = [cutoff_col, id_col]
     else:
         group_cols = [id_col]
+    if _HORIZON_COL in columns:
+        group_cols.append(_HORIZON_COL)
     return group_cols
 
 def _base_docstring(*args, **kwargs) -> Callable:
@@ -83,6 +92,107 @@ def _nw_agg_expr(
     )
 
 
+def _nw_agg_expr_with_flags(
+    df: IntoDataFrameT,
+    models: List[str],
+    id_col: str,
+    cutoff_col: str,
+    gen_expr: Callable[[str], nw.Expr],
+    flags: Dict[str, nw.Expr],
+) -> Tuple[IntoDataFrameT, List[str]]:
+    """Aggregates the expressions and the boolean `flags` in a single pass.
+
+    `flags` maps the error to raise to the expression that detects it. The errors
+    of eager frames are raised here, lazy frames keep one column per flag (named
+    after its error) to be checked with `_check_flags` once they're collected,
+    which avoids running the query twice. Returns the aggregates and the names of
+    the flag columns they keep."""
+    group_cols = _get_group_cols(df=df, id_col=id_col, cutoff_col=cutoff_col)
+    flag_cols = {msg: f"{_FLAG_PREFIX}{msg}" for msg in flags}
+    res = (
+        nw.from_native(df)
+        .select(
+            *group_cols,
+            *[gen_expr(model) for model in models],
+            *[
+                expr.cast(nw.Float64).alias(flag_cols[msg])
+                for msg, expr in flags.items()
+            ],
+        )
+        .group_by(*group_cols)
+        .agg(nw.all().mean())
+        .sort(*group_cols)
+    )
+    if isinstance(res, nw.LazyFrame):
+        return res.to_native(), list(flag_cols.values())
+    return _check_flags(res.to_native()), []
+
+
+def _check_flags(df: IntoDataFrameT) -> IntoDataFrameT:
+    """Raises the error of the first flag column that is set and drops them."""
+    nw_df = nw.from_native(df)
+    flag_cols = [c for c in nw_df.columns if c.startswith(_FLAG_PREFIX)]
+    if not flag_cols:
+        return df
+    checks = nw_df.select(*[(nw.col(c) > 0).any() for c in flag_cols])
+    for c in flag_cols:
+        if checks[c].item():
+            raise ValueError(c[len(_FLAG_PREFIX) :])
+    return nw_df.drop(*flag_cols).to_native()
+
+
+def _nw_batched_agg_expr(
+    df: IntoDataFrameT,
+    models: List[str],
+    keys: Sequence[Any],
+    key_col: str,
+    id_col: str,
+    cutoff_col: str,
+    gen_expr: Callable[[str, int], nw.Expr],
+) -> IntoDataFrameT:
+    """Aggregates the expressions for all the keys in a single pass and
+    returns them stacked, with one block of rows per key."""
+    group_cols = _get_group_cols(df=df, id_col=id_col, cutoff_col=cutoff_col)
+    tmp_cols = {
+        (model, i): f"__utilsforecast_{j}_{i}"
+        for j, model in enumerate(models)
+        for i in range(len(keys))
+    }
+    wide = nw.from_native(
+        _nw_agg_expr(
+            df=df,
+            models=list(tmp_cols.items()),
+            id_col=id_col,
+            cutoff_col=cutoff_col,
+            gen_expr=lambda item: gen_expr(*item[0]).alias(item[1]),
+        )
+    )
+    return nw.concat(
+        [
+            wide.select(
+                *group_cols,
+                nw.lit(key).alias(key_col),
+                *[nw.col(tmp_cols[(model, i)]).alias(model) for model in models],
+            )
+            for i, key in enumerate(keys)
+        ]
+    ).to_native()
+
+
+def _batched_pred_cols(
+    models: Dict[str, Union[str, List[str]]], n_keys: int
+) -> Dict[str, List[str]]:
+    if not all(
+        isinstance(preds, (list, tuple)) and len(preds) == n_keys
+        for preds in models.values()
+    ):
+        raise ValueError(
+            f"When evaluating {n_keys} quantiles at once, `models` must map each "
+            f"model to a list of {n_keys} prediction columns."
+        )
+    return {model: list(preds) for model, preds in models.items()}
+
+
 def _create_train_with_cutoffs(
     train_df: IntoDataFrameT,
     df: IntoDataFrameT,
@@ -94,16 +204,15 @@ def _create_train_with_cutoffs(
     train_df = nw.from_native(train_df)
     
     if cutoff_col in group_cols:
-        cutoffs_df = (
-            nw.from_native(df)
-            .select(*group_cols)
-            .unique()
-        )
-        train_df = (
-            train_df
-            .join(cutoffs_df, on="unique_id", how="inner")
-            .filter(nw.col(time_col) <= nw.col(cutoff_col))
-        )
+        if cutoff_col not in train_df.columns:
+            # same training set for every cutoff
+            cutoffs_df = (
+                nw.from_native(df)
+                .select(cutoff_col, id_col)
+                .unique()
+            )
+            train_df = train_df.join(cutoffs_df, on=id_col, how="inner")
+        train_df = train_df.filter(nw.col(time_col) <= nw.col(cutoff_col))
 
     return train_df
 
@@ -115,11 +224,19 @@ def _scale_loss(
     cutoff_col: str,
 ) -> IntoDataFrameT:
     exprs = [(nw.col(m) / nw.col("scale")).alias(m) for m in models]
-    group_cols = _get_group_cols(df=df, id_col=id_col, cutoff_col=cutoff_col)
+    scales = nw.from_native(scales)
+    # the scales don't depend on the horizon
+    group_cols = [
+        c
+        for c in _get_group_cols(df=df, id_col=id_col, cutoff_col=cutoff_col)
+        if c in scales.columns
+    ]
+    df = nw.from_native(df)
+    # keeps the keys of batched metrics, e.g. the quantile
+    key_cols = [c for c in df.columns if c not in models]
     return (
-        nw.from_native(df)
-        .join(nw.from_native(scales), on=group_cols)
-        .select([*group_cols, *exprs])
+        df.join(scales, on=group_cols)
+        .select([*key_cols, *exprs])
         .to_native()
     )
 
@@ -305,7 +422,16 @@ def spis(
 
 
 def _zero_to_nan(series):
-    return nw.when(series == 0).then(float("nan")).otherwise(series)
+    # multiplying keeps the dtype of the series, a nan literal would be float64
+    return nw.when(series == 0).then(series * float("nan")).otherwise(series)
+
+
+def _float_dtype(df: IntoDataFrameT, cols: List[str]) -> nw.dtypes.DType:
+    """Float32 if all `cols` are float32, so that their scores aren't promoted."""
+    schema = nw.from_native(df).collect_schema()
+    if all(schema[c] == nw.Float32 for c in cols):
+        return nw.Float32
+    return nw.Float64
 
 @_base_docstring
 def mape(
@@ -435,14 +561,14 @@ def mase(
     References:
         [1] https://robjhyndman.com/papers/mase.pdf
     """
-    group_cols = _get_group_cols(df=df, id_col=id_col, cutoff_col=cutoff_col)
+    mae_df = mae(df=df, models=models, id_col=id_col, target_col=target_col, cutoff_col=cutoff_col)
+    train_df = _create_train_with_cutoffs(train_df=train_df, df=df, id_col=id_col, time_col=time_col, cutoff_col=cutoff_col)
+    train_group_cols = _get_group_cols(df=train_df, id_col=id_col, cutoff_col=cutoff_col)
 
     def scale_expr(_m):
-        lagged = nw.col(target_col).shift(seasonality).over(group_cols)
+        lagged = nw.col(target_col).shift(seasonality).over(*train_group_cols, order_by=time_col)
         return (nw.col(target_col) - lagged).abs().alias("scale")
 
-    mae_df = mae(df=df, models=models, id_col=id_col, target_col=target_col, cutoff_col=cutoff_col)
-    train_df = _create_train_with_cutoffs(train_df=train_df, df=df, id_col=id_col, time_col=time_col, cutoff_col=cutoff_col)
 
     scales = _nw_agg_expr(
         df=train_df,
@@ -485,21 +611,32 @@ def rmae(
     Returns:
         pandas or polars DataFrame: dataframe with one row per id and one column per model.
     """
-    df = nw.from_native(df)
-    if df[baseline].is_null().any():
-        raise ValueError(f"baseline model ({baseline}) contains NaNs.")
-    mae_df = mae(df, models, id_col, target_col, cutoff_col)
-    scales = (
-        nw.from_native(mae(df, [baseline], id_col, target_col, cutoff_col))
-        .rename({baseline: "scale"})
-        .with_columns(scale=_zero_to_nan(nw.col("scale")))
-    )
-    return _scale_loss(
-        df=mae_df,
-        models=models,
-        scales=scales,
+    scale_col = "__utilsforecast_scale"
+
+    def gen_expr(model):
+        pred_col = baseline if model == scale_col else model
+        return (nw.col(target_col) - nw.col(pred_col)).abs().alias(model)
+
+    # the maes of the models and the baseline and the check of the baseline
+    res, flag_cols = _nw_agg_expr_with_flags(
+        df=df,
+        models=[*models, scale_col],
         id_col=id_col,
         cutoff_col=cutoff_col,
+        gen_expr=gen_expr,
+        flags={
+            f"baseline model ({baseline}) contains NaNs.": nw.col(baseline).is_null()
+        },
+    )
+    group_cols = _get_group_cols(df=df, id_col=id_col, cutoff_col=cutoff_col)
+    return (
+        nw.from_native(res)
+        .select(
+            *group_cols,
+            *[(nw.col(m) / _zero_to_nan(nw.col(scale_col))).alias(m) for m in models],
+            *flag_cols,
+        )
+        .to_native()
     )
 
 @_base_docstring
@@ -575,7 +712,7 @@ def msse(
     train_df = _create_train_with_cutoffs(train_df=train_df, df=df, id_col=id_col, time_col=time_col,cutoff_col=cutoff_col)
     train_group_cols = _get_group_cols(df=train_df, id_col=id_col, cutoff_col=cutoff_col)
     baseline = train_df.with_columns(
-        scale=nw.col(target_col).shift(seasonality).over(*train_group_cols)
+        scale=nw.col(target_col).shift(seasonality).over(*train_group_cols, order_by=time_col)
     )
     scales = mse(df=baseline, models=["scale"], id_col=id_col, target_col=target_col, cutoff_col=cutoff_col)
     return _scale_loss(
@@ -619,10 +756,15 @@ rmsse.__doc__ = msse.__doc__.replace(  # type: ignore[union-attr]
 )
 
 
+def _quantile_loss_expr(target_col: str, pred_col: str, q: float) -> nw.Expr:
+    delta_y = nw.col(target_col) - nw.col(pred_col)
+    return nw.max_horizontal((q * delta_y).alias("a"), ((q - 1) * delta_y).alias("b"))
+
+
 def quantile_loss(
     df: IntoDataFrameT,
-    models: Dict[str, str],
-    q: float = 0.5,
+    models: Dict[str, Union[str, List[str]]],
+    q: Union[float, List[float]] = 0.5,
     id_col: str = "unique_id",
     target_col: str = "y",
     cutoff_col: str = "cutoff",
@@ -636,22 +778,36 @@ def quantile_loss(
 
     Args:
         df (pandas or polars DataFrame): Input dataframe with id, times, actuals and predictions.
-        models (dict from str to str): Mapping from model name to the model predictions for the specified quantile.
-        q (float, optional): Quantile for the predictions' comparison. Defaults to 0.5.
+        models (dict from str to str or list of str): Mapping from model name to the model predictions for the specified quantile.
+            If `q` is a list, mapping from model name to the predictions for each quantile.
+        q (float or list of float, optional): Quantile for the predictions' comparison.
+            If a list, the losses for all the quantiles are computed in a single aggregation. Defaults to 0.5.
         id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
         target_col (str, optional): Column that contains the target. Defaults to 'y'.
         cutoff_col (str, optional): Column that identifies the cutoff point for each forecast cross-validation fold. Defaults to 'cutoff'.
 
     Returns:
         pandas or polars DataFrame: dataframe with one row per id and one column per model.
+            If `q` is a list, there is one row per (q, id) combination and a 'q' column.
     """
+    if np.ndim(q) > 0:
+        qs = [float(x) for x in q]
+        pred_cols = _batched_pred_cols(models, len(qs))
+        return _nw_batched_agg_expr(
+            df=df,
+            models=list(pred_cols.keys()),
+            keys=qs,
+            key_col="q",
+            id_col=id_col,
+            cutoff_col=cutoff_col,
+            gen_expr=lambda model, i: _quantile_loss_expr(
+                target_col, pred_cols[model][i], qs[i]
+            ),
+        )
 
     def gen_expr(model):
         model_name, pred_col = model
-        delta_y = nw.col(target_col) - nw.col(pred_col)
-        return nw.max_horizontal(
-            (q * delta_y).alias("a"), ((q - 1) * delta_y).alias("b")
-        ).alias(model_name)
+        return _quantile_loss_expr(target_col, pred_col, q).alias(model_name)
 
     return _nw_agg_expr(
         df=df,
@@ -663,10 +819,10 @@ def quantile_loss(
 
 def scaled_quantile_loss(
     df: IntoDataFrameT,
-    models: Dict[str, str],
+    models: Dict[str, Union[str, List[str]]],
     seasonality: int,
     train_df: IntoDataFrameT,
-    q: float = 0.5,
+    q: Union[float, List[float]] = 0.5,
     id_col: str = "unique_id",
     target_col: str = "y",
     cutoff_col: str = "cutoff",
@@ -684,17 +840,20 @@ def scaled_quantile_loss(
 
     Args:
         df (pandas or polars DataFrame): Input dataframe with id, times, actuals and predictions.
-        models (dict from str to str): Mapping from model name to the model predictions for the specified quantile.
+        models (dict from str to str or list of str): Mapping from model name to the model predictions for the specified quantile.
+            If `q` is a list, mapping from model name to the predictions for each quantile.
         seasonality (int): Main frequency of the time series;
             Hourly 24, Daily 7, Weekly 52, Monthly 12, Quarterly 4, Yearly 1.
         train_df (pandas or polars DataFrame): Training dataframe with id and actual values. Must be sorted by time.
-        q (float, optional): Quantile for the predictions' comparison. Defaults to 0.5.
+        q (float or list of float, optional): Quantile for the predictions' comparison.
+            If a list, the losses for all the quantiles are computed in a single aggregation. Defaults to 0.5.
         id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
         target_col (str, optional): Column that contains the target. Defaults to 'y'.
         cutoff_col (str, optional): Column that identifies the cutoff point for each forecast cross-validation fold. Defaults to 'cutoff'.
 
     Returns:
         pandas or polars DataFrame: dataframe with one row per id and one column per model.
+            If `q` is a list, there is one row per (q, id) combination and a 'q' column.
 
     References:
         [1] https://www.sciencedirect.com/science/article/pii/S0169207021001722
@@ -705,7 +864,7 @@ def scaled_quantile_loss(
     train_df = _create_train_with_cutoffs(train_df=train_df, df=df, id_col=id_col, time_col=time_col, cutoff_col=cutoff_col)
     train_group_cols = _get_group_cols(df=train_df, id_col=id_col, cutoff_col=cutoff_col)
     baseline = train_df.with_columns(
-        scale=nw.col(target_col).shift(seasonality).over(*train_group_cols)
+        scale=nw.col(target_col).shift(seasonality).over(*train_group_cols, order_by=time_col)
     )
     scales = mae(df=baseline, models=["scale"], id_col=id_col, target_col=target_col, cutoff_col=cutoff_col)
     return _scale_loss(
@@ -754,39 +913,22 @@ def mqloss(
     """
 
     group_cols = _get_group_cols(df=df, id_col=id_col, cutoff_col=cutoff_col)
-
-    # Not the most efficient implementation
-    # Sort quantiles and reorder forecasts to match
-    # This ensures correct pairing regardless of input order
-    sorted_indices = np.argsort(quantiles)
-    sorted_quantiles = quantiles[sorted_indices]
-
-    # Reorder forecast columns according to sorted quantile indices
-    sorted_models = {
-        model: [forecasts[i] for i in sorted_indices]
-        for model, forecasts in models.items()
-    }
-
-    # Map each sorted quantile to its corresponding forecast column
-    quantile_preds = {}
-    for q, idx in zip(sorted_quantiles, range(len(sorted_quantiles))):
-        quantile_preds[q] = {
-            model: forecasts[idx]
-            for model, forecasts in sorted_models.items()
-        }
-
-    res = (
-        nw.concat(
-            [
-                nw.from_native(quantile_loss(df, models=quantile_preds[q], q=q, id_col=id_col, target_col=target_col, cutoff_col=cutoff_col))
-                for q in sorted_quantiles
-            ]
+    res = nw.from_native(
+        quantile_loss(
+            df,
+            models={model: list(preds) for model, preds in models.items()},
+            q=list(quantiles),
+            id_col=id_col,
+            target_col=target_col,
+            cutoff_col=cutoff_col,
         )
     )
-    res = res.group_by(group_cols).agg([nw.col(col).mean().alias(col) for col in res.columns if col not in group_cols])
-    res = res.to_native()
-
-    return res
+    return (
+        res.group_by(*group_cols)
+        .agg([nw.col(model).mean() for model in models])
+        .sort(*group_cols)
+        .to_native()
+    )
 
 
 def scaled_mqloss(
@@ -838,7 +980,7 @@ def scaled_mqloss(
     train_df = _create_train_with_cutoffs(train_df=train_df, df=df, id_col=id_col, time_col=time_col,cutoff_col=cutoff_col)
     train_group_cols = _get_group_cols(df=train_df, id_col=id_col, cutoff_col=cutoff_col)
     baseline = train_df.with_columns(
-        scale=nw.col(target_col).shift(seasonality).over(*train_group_cols)
+        scale=nw.col(target_col).shift(seasonality).over(*train_group_cols, order_by=time_col)
     )
     scales = mae(df=baseline, models=["scale"], id_col=id_col, target_col=target_col, cutoff_col=cutoff_col)
     return _scale_loss(
@@ -853,7 +995,7 @@ def scaled_mqloss(
 def coverage(
     df: IntoDataFrameT,
     models: List[str],
-    level: int,
+    level: Union[int, List[int]],
     id_col: str = "unique_id",
     target_col: str = "y",
     cutoff_col: str = "cutoff"
@@ -863,25 +1005,50 @@ def coverage(
     Args:
         df (pandas or polars DataFrame): Input dataframe with id, times, actuals and predictions.
         models (list of str): Columns that identify the models predictions.
-        level (int): Confidence level used for intervals.
+        level (int or list of int): Confidence level used for intervals.
+            If a list, the coverage of all the levels is computed in a single aggregation.
         id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
         target_col (str, optional): Column that contains the target. Defaults to 'y'.
         cutoff_col (str, optional): Column that identifies the cutoff point for each forecast cross-validation fold. Defaults to 'cutoff'.
 
     Returns:
         pandas or polars DataFrame: dataframe with one row per id and one column per model.
+            If `level` is a list, there is one row per (level, id) combination and a 'level' column.
 
     References:
         [1] https://www.jstor.org/stable/2629907
     """
 
-    def gen_expr(model):
+    levels = level if isinstance(level, (list, tuple)) else [level]
+    dtype = _float_dtype(
+        df,
+        [
+            target_col,
+            *[f"{m}-{side}-{lvl}" for m in models for side in ("lo", "hi") for lvl in levels],
+        ],
+    )
+
+    def coverage_expr(model, lvl):
         return (
             nw.col(target_col)
-            .is_between(nw.col(f"{model}-lo-{level}"), nw.col(f"{model}-hi-{level}"))
-            .alias(model)
+            .is_between(nw.col(f"{model}-lo-{lvl}"), nw.col(f"{model}-hi-{lvl}"))
+            .cast(dtype)
+        )
+
+    if isinstance(level, (list, tuple)):
+        return _nw_batched_agg_expr(
+            df=df,
+            models=models,
+            keys=list(level),
+            key_col="level",
+            id_col=id_col,
+            cutoff_col=cutoff_col,
+            gen_expr=lambda model, i: coverage_expr(model, level[i]),
         )
 
+    def gen_expr(model):
+        return coverage_expr(model, level).alias(model)
+
     return _nw_agg_expr(
         df=df,
         models=models,
@@ -893,31 +1060,56 @@ def coverage(
 
 def calibration(
     df: IntoDataFrameT,
-    models: Dict[str, str],
+    models: Dict[str, Union[str, List[str]]],
     id_col: str = "unique_id",
     target_col: str = "y",
-    cutoff_col: str = "cutoff"
+    cutoff_col: str = "cutoff",
+    q: Optional[Union[float, List[float]]] = None,
 ) -> IntoDataFrameT:
     """
     Fraction of y that is lower than the model's predictions.
 
     Args:
         df (pandas or polars DataFrame): Input dataframe with id, times, actuals and predictions.
-        models (dict from str to str): Mapping from model name to the model predictions.
+        models (dict from str to str or list of str): Mapping from model name to the model predictions.
+            If `q` is a list, mapping from model name to the predictions for each quantile.
         id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
         target_col (str, optional): Column that contains the target. Defaults to 'y'.
         cutoff_col (str, optional): Column that identifies the cutoff point for each forecast cross-validation fold. Defaults to 'cutoff'.
+        q (float or list of float, optional): Quantiles of the predictions. Isn't used in the computation,
+            but if a list, the calibration of all the quantiles is computed in a single aggregation
+            and `q` identifies the rows of each one. Defaults to None.
 
     Returns:
         pandas or polars DataFrame: dataframe with one row per id and one column per model.
+            If `q` is a list, there is one row per (q, id) combination and a 'q' column.
 
     References:
         [1] https://www.jstor.org/stable/2629907
     """
+    if q is not None and np.ndim(q) > 0:
+        qs = [float(x) for x in q]
+        pred_cols = _batched_pred_cols(models, len(qs))
+        dtype = _float_dtype(
+            df, [target_col, *[c for preds in pred_cols.values() for c in preds]]
+        )
+        return _nw_batched_agg_expr(
+            df=df,
+            models=list(pred_cols.keys()),
+            keys=qs,
+            key_col="q",
+            id_col=id_col,
+            cutoff_col=cutoff_col,
+            gen_expr=lambda model, i: (
+                nw.col(target_col) <= nw.col(pred_cols[model][i])
+            ).cast(dtype),
+        )
+
+    dtype = _float_dtype(df, [target_col, *models.values()])
 
     def gen_expr(model):
         model_name, q_preds = model
-        return (nw.col(target_col) <= nw.col(q_preds)).alias(model_name)
+        return (nw.col(target_col) <= nw.col(q_preds)).cast(dtype).alias(model_name)
 
     return _nw_agg_expr(
         df=df,
@@ -958,7 +1150,11 @@ def scaled_crps(
         [1] https://proceedings.mlr.press/v139/rangapuram21a.html
     """
     df = nw.from_native(df)
-    eps = np.finfo(np.float64).eps
+    # python scalars don't promote float32 columns
+    eps = float(np.finfo(np.float64).eps)
+    dtype = _float_dtype(
+        df, [target_col, *[c for preds in models.values() for c in preds]]
+    )
     quantiles = np.asarray(quantiles)
     loss = mqloss(
         df=df, models=models, quantiles=quantiles, id_col=id_col, target_col=target_col, cutoff_col=cutoff_col
@@ -976,6 +1172,7 @@ def scaled_crps(
             counts=nw.col(id_col).len(),
             norm=nw.col(target_col).sum(),
         )
+        .with_columns(nw.col("counts").cast(dtype))
     )
     return _nw_agg_expr(
         df=nw.from_native(loss).join(stats, on=group_cols),
@@ -1023,15 +1220,6 @@ def tweedie_deviance(
     """
     if power < 0:
         raise ValueError("Power must be non-negative.")
-    df = nw.from_native(df)
-    if power >= 2 and (df[target_col] <= 0).any():
-        raise ValueError(
-            f"Power {power} requires all target values to be strictly positive."
-        )
-    if any((df[m] <= 0).any() for m in models):
-        raise ValueError(
-            "All predictions must be strictly positive for Tweedie deviance."
-        )
 
     if power == 0:
 
@@ -1077,13 +1265,26 @@ def tweedie_deviance(
                 + (nw.col(model) ** (2 - power) / (2 - power))
             ).alias(model)
 
-    return _nw_agg_expr(
-        df=df,
-        models=models,
-        id_col=id_col,
-        gen_expr=gen_expr,
-        cutoff_col=cutoff_col,
+    # the inputs are validated in the same pass as the deviances are computed,
+    # so the logs and powers of invalid values are discarded
+    flags = {}
+    if power >= 2:
+        flags[
+            f"Power {power} requires all target values to be strictly positive."
+        ] = (nw.col(target_col) <= 0)
+    flags["All predictions must be strictly positive for Tweedie deviance."] = (
+        nw.any_horizontal(*[nw.col(m) <= 0 for m in models], ignore_nulls=True)
     )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        res, _ = _nw_agg_expr_with_flags(
+            df=df,
+            models=models,
+            id_col=id_col,
+            cutoff_col=cutoff_col,
+            gen_expr=gen_expr,
+            flags=flags,
+        )
+    return res
 
 
 @_base_docstring
@@ -1,20 +1,25 @@
 """Utilities for processing data before training/analysis"""
 
-__all__ = ['id_time_grid', 'fill_gaps']
+__all__ = ['id_time_grid', 'fill_gaps', 'gap_report', 'fill_gaps_chunked', 'infer_freq',
+           'temporal_aggregate']
 
 
+import re
 import warnings
 from datetime import date, datetime
 from functools import partial
-from typing import Union
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
 from .compat import DFType, pl, pl_DataFrame, pl_Series
-from .processing import group_by, repeat
+from .processing import _is_sorted, group_by, repeat
 from .validation import _is_int_dtype, validate_format, validate_freq
 
+if TYPE_CHECKING:
+    import pyarrow as pa
+
 
 def _determine_bound(bound, freq, times_by_id, agg) -> np.ndarray:
     if bound == "per_serie":
@@ -57,7 +62,7 @@ def _determine_bound_pl(
 
 def id_time_grid(
     df: DFType,
-    freq: Union[str, int],
+    freq: Union[str, int, pd.offsets.BaseOffset],
     start: Union[str, int, date, datetime] = "per_serie",
     end: Union[str, int, date, datetime] = "global",
     id_col: str = "unique_id",
@@ -67,7 +72,7 @@ def id_time_grid(
 
     Args:
         df (pandas or polars DataFrame): Input data
-        freq (str or int): Series' frequency
+        freq (str, int or pandas offset): Series' frequency
         start (str, int, date or datetime, optional): Initial timestamp for the series.
             * 'per_serie' uses each serie's first timestamp
             * 'global' uses the first timestamp seen in the data
@@ -119,90 +124,247 @@ def id_time_grid(
                 ).alias(time_col)
             )
         return grid.explode(time_col)
-    if isinstance(freq, str):
-        offset = pd.tseries.frequencies.to_offset(freq)
-        n = offset.n
-        if isinstance(offset.base, pd.offsets.Minute):
-            # minutes are represented as 'm' in numpy
-            freq = "m"
-        elif isinstance(offset.base, pd.offsets.BusinessDay):
-            if n != 1:
-                raise NotImplementedError("Multiple of a business day")
-            freq = "D"
-        elif isinstance(offset.base, pd.offsets.Hour):
-            # hours are represented as 'h' in numpy
-            freq = "h"
-        elif isinstance(offset.base, (pd.offsets.QuarterBegin, pd.offsets.QuarterEnd)):
-            n = 3
-            freq = "M"
-        elif isinstance(offset.base, (pd.offsets.YearBegin, pd.offsets.YearEnd)):
-            freq = "Y"
-        elif isinstance(offset.base, pd.offsets.Second):
-            freq = "s"
-        elif isinstance(offset.base, pd.offsets.Milli):
-            freq = "ms"
-        elif isinstance(offset.base, pd.offsets.Micro):
-            freq = "us"
-        elif isinstance(offset.base, pd.offsets.Nano):
-            freq = "ns"
-        elif isinstance(offset.base, (pd.offsets.MonthBegin, pd.offsets.MonthEnd)):
-            freq = "M"
-        elif isinstance(offset.base, pd.offsets.Week):
-            freq = "W"
-        if n > 1:
-            freq = freq.replace(str(n), "")
-        try:
-            pd.Timedelta(offset)
-        except ValueError:
-            # irregular freq, try using first letter of abbreviation
-            # such as MS = 'Month Start' -> 'M', YS = 'Year Start' -> 'Y'
-            freq = freq[0]
-        delta: Union[np.timedelta64, int] = np.timedelta64(n, freq)
+    return _id_time_grid_pd(
+        df=df, freq=freq, start=start, end=end, id_col=id_col, time_col=time_col
+    )[0]
+
+
+def _np_freq(
+    freq: Union[str, pd.offsets.BaseOffset],
+) -> Tuple[str, int, pd.offsets.BaseOffset]:
+    """Numpy unit, number of units and offset of a pandas frequency."""
+    offset = pd.tseries.frequencies.to_offset(freq)
+    # canonical alias, e.g. '1d' and pd.offsets.Day() become 'D'
+    freq = offset.freqstr
+    n = offset.n
+    if isinstance(offset.base, pd.offsets.Minute):
+        # minutes are represented as 'm' in numpy
+        freq = "m"
+    elif isinstance(offset.base, pd.offsets.BusinessDay):
+        freq = "D"
+    elif isinstance(offset.base, pd.offsets.Hour):
+        # hours are represented as 'h' in numpy
+        freq = "h"
+    elif isinstance(offset.base, (pd.offsets.QuarterBegin, pd.offsets.QuarterEnd)):
+        n = 3
+        freq = "M"
+    elif isinstance(offset.base, (pd.offsets.YearBegin, pd.offsets.YearEnd)):
+        freq = "Y"
+    elif isinstance(offset.base, pd.offsets.Second):
+        freq = "s"
+    elif isinstance(offset.base, pd.offsets.Milli):
+        freq = "ms"
+    elif isinstance(offset.base, pd.offsets.Micro):
+        freq = "us"
+    elif isinstance(offset.base, pd.offsets.Nano):
+        freq = "ns"
+    elif isinstance(offset.base, (pd.offsets.MonthBegin, pd.offsets.MonthEnd)):
+        freq = "M"
+    elif isinstance(offset.base, pd.offsets.Week):
+        freq = "W"
+    if n > 1:
+        freq = freq.replace(str(n), "")
+    try:
+        pd.Timedelta(offset)
+    except ValueError:
+        # irregular freq, try using first letter of abbreviation
+        # such as MS = 'Month Start' -> 'M', YS = 'Year Start' -> 'Y'
+        freq = freq[0]
+    return freq, n, offset
+
+
+def _busday_calendar(offset: pd.offsets.BaseOffset) -> Optional[np.busdaycalendar]:
+    """Numpy calendar of a business day offset, None for any other offset."""
+    if isinstance(offset, pd.offsets.CustomBusinessDay):
+        return offset.calendar
+    if isinstance(offset, pd.offsets.BusinessDay):
+        return np.busdaycalendar()
+    return None
+
+
+def _id_time_grid_pd(
+    df: pd.DataFrame,
+    freq: Union[str, int, pd.offsets.BaseOffset],
+    start: Union[str, int, date, datetime],
+    end: Union[str, int, date, datetime],
+    id_col: str,
+    time_col: str,
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Grid of ids and times sorted by id and time and its number of rows per id."""
+    calendar = None
+    if isinstance(freq, int):
+        unit: Union[str, int] = freq
+        delta: Union[np.timedelta64, int] = freq
+    else:
+        unit, n, offset = _np_freq(freq)
+        delta = np.timedelta64(n, unit)
+        calendar = _busday_calendar(offset.base)
         if df[time_col].dt.tz is not None:
             df = df.copy(deep=False)
             df[time_col] = df[time_col].dt.tz_convert("UTC").dt.tz_localize(None)
-    else:
-        delta = freq
     times_by_id = df.groupby(id_col, observed=True)[time_col].agg(["min", "max"])
-    starts = _determine_bound(start, freq, times_by_id, "min")
-    ends = _determine_bound(end, freq, times_by_id, "max") + delta
-    sizes = ((ends - starts) / delta).astype(np.int64)
-    times = np.hstack(
-        [np.arange(start, end, delta) for start, end in zip(starts, ends)]
-    )
+    starts = _determine_bound(start, unit, times_by_id, "min")
+    ends = _determine_bound(end, unit, times_by_id, "max")
+    if calendar is None:
+        sizes = ((ends + delta - starts) / delta).astype(np.int64)
+    else:
+        # every n-th business day starting from the first one
+        starts = np.busday_offset(starts, 0, roll="forward", busdaycal=calendar)
+        n_bdays = np.busday_count(starts, ends + np.timedelta64(1, "D"), busdaycal=calendar)
+        sizes = -(-n_bdays // n)
+    sizes = np.maximum(sizes, 0)
+    # position of each time in its serie
+    steps = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    if calendar is None:
+        times = np.repeat(starts, sizes) + steps * delta
+    else:
+        times = np.busday_offset(np.repeat(starts, sizes), steps * n, busdaycal=calendar)
     uids = np.repeat(times_by_id.index, sizes)
-    if isinstance(freq, str):
-        if isinstance(offset.base, pd.offsets.BusinessDay):
-            # data was generated daily, we need to keep only business days
-            bdays = np.is_busday(times)
-            uids = uids[bdays]
-            times = times[bdays]
+    if not isinstance(freq, int):
         times = pd.Index(times.astype("datetime64[ns]", copy=False))
         first_time = np.datetime64(df.iloc[0][time_col])
-        was_truncated = first_time != first_time.astype(f"datetime64[{freq}]")
+        was_truncated = first_time != first_time.astype(f"datetime64[{unit}]")
         if was_truncated:
             times += offset.base
-    return pd.DataFrame(
+    grid = pd.DataFrame(
         {
             id_col: uids,
             time_col: times,
         }
     )
+    return grid, sizes
+
+
+def _sorted_grid_indexer(
+    df: pd.DataFrame,
+    grid: pd.DataFrame,
+    sizes: np.ndarray,
+    freq: Union[str, int, pd.offsets.BaseOffset],
+    id_col: str,
+    time_col: str,
+) -> Optional[np.ndarray]:
+    """Position of each row of the grid in `df` (sorted by id and time), -1 if missing.
+
+    The position of each row of `df` in its serie's grid is computed from its
+    offset to the first time of the grid, which avoids hashing the keys. Returns
+    None if more than one row lands on the same position of the grid."""
+    ids = df[id_col]
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        ids = ids.cat.codes
+    ids = ids.to_numpy()
+    times = df[time_col].to_numpy()
+    grid_times = grid[time_col].to_numpy()
+    is_first = np.empty(ids.size, dtype=bool)
+    is_first[:1] = True
+    is_first[1:] = ids[1:] != ids[:-1]
+    # the series are in the same order in df and the grid
+    serie_idxs = np.cumsum(is_first) - 1
+    grid_starts = np.cumsum(sizes) - sizes
+    first_times = grid_times[np.minimum(grid_starts, max(grid_times.size - 1, 0))]
+    if isinstance(freq, int):
+        positions = (times - first_times[serie_idxs]) // freq
+    else:
+        unit, n, offset = _np_freq(freq)
+        calendar = _busday_calendar(offset.base)
+        if calendar is not None:
+            n_bdays = np.busday_count(
+                first_times.astype("datetime64[D]")[serie_idxs],
+                times.astype("datetime64[D]"),
+                busdaycal=calendar,
+            )
+            positions = n_bdays // n
+        else:
+            units = times.astype(f"datetime64[{unit}]").view(np.int64)
+            first_units = first_times.astype(f"datetime64[{unit}]").view(np.int64)
+            positions = (units - first_units[serie_idxs]) // n
+    serie_sizes = sizes[serie_idxs]
+    in_grid = (positions >= 0) & (positions < serie_sizes)
+    grid_idxs = grid_starts[serie_idxs] + np.where(in_grid, positions, 0)
+    # times that don't meet the frequency are dropped
+    in_grid &= grid_times[np.minimum(grid_idxs, max(grid_times.size - 1, 0))] == times
+    grid_idxs = grid_idxs[in_grid]
+    if (grid_idxs[1:] <= grid_idxs[:-1]).any():
+        # duplicated (id, time) pairs
+        return None
+    indexer = np.full(grid_times.size, -1, dtype=np.int64)
+    indexer[grid_idxs] = np.flatnonzero(in_grid)
+    return indexer
+
+
+_FILL_STRATEGIES = ("ffill", "zero", "interpolate")
+_EXISTING_COL = "__utilsforecast_existing"
+
+
+def _validate_fill_strategy(
+    fill_strategy: Dict[str, Any], columns: list, id_col: str, time_col: str
+) -> None:
+    for col, strategy in fill_strategy.items():
+        if col in (id_col, time_col) or col not in columns:
+            raise ValueError(
+                f"Can't fill '{col}', it must be one of the value columns of `df`."
+            )
+        if isinstance(strategy, str) and strategy not in _FILL_STRATEGIES:
+            raise ValueError(
+                f"Unknown fill strategy '{strategy}' for '{col}'. "
+                f"Use one of {list(_FILL_STRATEGIES)} or a constant value."
+            )
+
+
+def _fill_new_rows_pd(
+    res: pd.DataFrame,
+    dtypes: pd.Series,
+    is_new: np.ndarray,
+    sizes: np.ndarray,
+    fill_strategy: Dict[str, Any],
+) -> pd.DataFrame:
+    """Fills the rows added to each serie, which are contiguous blocks of `sizes` rows."""
+    n_rows = res.shape[0]
+    positions = np.arange(n_rows)
+    serie_starts = np.repeat(np.cumsum(sizes) - sizes, sizes)
+    serie_ends = serie_starts + np.repeat(sizes, sizes)
+    for col, strategy in fill_strategy.items():
+        values = res[col]
+        if strategy in ("ffill", "interpolate"):
+            valid = values.notna().to_numpy()
+            # last and next valid positions within the serie
+            prev = np.maximum.accumulate(np.where(valid, positions, -1))
+            prev = np.where(prev >= serie_starts, prev, -1)
+        if strategy == "ffill":
+            src = np.where(is_new & (prev >= 0), prev, positions)
+            values = values.take(src).set_axis(res.index)
+        elif strategy == "interpolate":
+            nxt = np.minimum.accumulate(np.where(valid, positions, n_rows)[::-1])[::-1]
+            nxt = np.where(nxt < serie_ends, nxt, -1)
+            mask = is_new & (prev >= 0) & (nxt >= 0)
+            arr = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            prev, nxt = prev[mask], nxt[mask]
+            weights = (positions[mask] - prev) / (nxt - prev)
+            arr[mask] = arr[prev] + (arr[nxt] - arr[prev]) * weights
+            values = pd.Series(arr, index=res.index, name=col)
+        else:
+            values = values.mask(is_new, 0 if strategy == "zero" else strategy)
+        # reindexing upcasts integers and booleans to hold the missing values
+        dtype = dtypes[col]
+        if values.dtype != dtype and dtype.kind in "iub" and not values.hasnans:
+            values = values.astype(dtype)
+        res[col] = values
+    return res
 
 
 def fill_gaps(
     df: DFType,
-    freq: Union[str, int],
+    freq: Union[str, int, pd.offsets.BaseOffset],
     start: Union[str, int, date, datetime] = "per_serie",
     end: Union[str, int, date, datetime] = "global",
     id_col: str = "unique_id",
     time_col: str = "ds",
+    fill_strategy: Optional[Dict[str, Any]] = None,
 ) -> DFType:
     """Enforce start and end datetimes for dataframe.
 
     Args:
         df (pandas or polars DataFrame): Input data
-        freq (str or int): Series' frequency
+        freq (str, int or pandas offset): Series' frequency
         start (str, int, date or datetime, optional): Initial timestamp for the series.
             * 'per_serie' uses each serie's first timestamp
             * 'global' uses the first timestamp seen in the data
@@ -215,14 +377,57 @@ def fill_gaps(
             Defaults to "global".
         id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
         time_col (str, optional): Column that identifies each timestamp. Defaults to 'ds'.
+        fill_strategy (dict, optional): Mapping from column to the way of filling
+            the rows added to each serie, the existing rows are left as is.
+            * 'ffill' uses the last valid value of the serie
+            * 'zero' uses 0
+            * 'interpolate' interpolates linearly between the previous and next
+              valid values of the serie, rows before the first or after the
+              last valid value are left missing
+            * Any other (non-string) value is used as a constant
+            If None, the added rows have missing values. Defaults to None.
 
     Returns:
         pandas or polars DataFrame: Dataframe with gaps filled.
     """
     validate_format(df, id_col=id_col, time_col=time_col, target_col=None)
     validate_freq(df[time_col], freq=freq)
+    if fill_strategy is not None:
+        _validate_fill_strategy(fill_strategy, list(df.columns), id_col, time_col)
 
-    grid = id_time_grid(
+    if isinstance(df, pl_DataFrame):
+        grid = id_time_grid(
+            df=df,
+            freq=freq,
+            start=start,
+            end=end,
+            id_col=id_col,
+            time_col=time_col,
+        )
+        if not fill_strategy:
+            return grid.join(df, on=[id_col, time_col], how="left")
+        res = grid.join(
+            df.with_columns(pl.lit(True).alias(_EXISTING_COL)),
+            on=[id_col, time_col],
+            how="left",
+        )
+        is_new = pl.col(_EXISTING_COL).is_null()
+        exprs = []
+        for col, strategy in fill_strategy.items():
+            if strategy == "ffill":
+                filled = pl.col(col).forward_fill().over(id_col)
+            elif strategy == "interpolate":
+                filled = pl.col(col).interpolate().over(id_col)
+            else:
+                filled = pl.lit(0 if strategy == "zero" else strategy)
+            exprs.append(pl.when(is_new).then(filled).otherwise(pl.col(col)).alias(col))
+        return res.with_columns(exprs).drop(_EXISTING_COL)
+    if not isinstance(freq, int):
+        tz = df[time_col].dt.tz
+        if tz is not None:
+            df = df.copy(deep=False)
+            df[time_col] = df[time_col].dt.tz_convert("UTC").dt.tz_localize(None)
+    grid, sizes = _id_time_grid_pd(
         df=df,
         freq=freq,
         start=start,
@@ -230,16 +435,27 @@ def fill_gaps(
         id_col=id_col,
         time_col=time_col,
     )
-    if isinstance(df, pl_DataFrame):
-        return grid.join(df, on=[id_col, time_col], how="left")
-    idx = pd.MultiIndex.from_frame(grid)
-    if isinstance(freq, str):
-        tz = df[time_col].dt.tz
-        if tz is not None:
-            df = df.copy(deep=False)
-            df[time_col] = df[time_col].dt.tz_convert("UTC").dt.tz_localize(None)
-    res = df.set_index([id_col, time_col]).reindex(idx).reset_index()
-    if isinstance(freq, str):
+    indexer = None
+    if _is_sorted(df, id_col, time_col):
+        indexer = _sorted_grid_indexer(
+            df=df, grid=grid, sizes=sizes, freq=freq, id_col=id_col, time_col=time_col
+        )
+    if indexer is not None:
+        # reindexing a range index doesn't need to hash the keys
+        res = (
+            df.drop(columns=[id_col, time_col])
+            .reset_index(drop=True)
+            .reindex(indexer)
+            .reset_index(drop=True)
+        )
+        res.insert(0, time_col, grid[time_col])
+        res.insert(0, id_col, grid[id_col])
+    else:
+        idx = pd.MultiIndex.from_frame(grid)
+        res = df.set_index([id_col, time_col]).reindex(idx).reset_index()
+        if fill_strategy:
+            indexer = pd.MultiIndex.from_frame(df[[id_col, time_col]]).get_indexer(idx)
+    if not isinstance(freq, int):
         if tz is not None:
             res[time_col] = res[time_col].dt.tz_localize("UTC").dt.tz_convert(tz)
     extra_cols = df.columns.drop([id_col, time_col]).tolist()
@@ -252,4 +468,849 @@ def fill_gaps(
                 "For example if you have 'W-TUE' as your frequency, "
                 "make sure that all your times are actually Tuesdays."
             )
+    if fill_strategy:
+        res = _fill_new_rows_pd(
+            res=res,
+            dtypes=df.dtypes,
+            is_new=indexer < 0,
+            sizes=sizes,
+            fill_strategy=fill_strategy,
+        )
+    return res
+
+
+def _grid_positions_pd(
+    df: pd.DataFrame,
+    freq: Union[str, int, pd.offsets.BaseOffset],
+    start: Union[str, int, date, datetime],
+    end: Union[str, int, date, datetime],
+    id_col: str,
+    time_col: str,
+) -> Tuple[pd.Index, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Ids, grid sizes and serie, grid position and alignment of every row.
+
+    The grid of each serie is `start + k * freq`, so the position of a time is
+    computed from its offset to the start and the time is aligned if it's the
+    grid time at that position."""
+    times_by_id = df.groupby(id_col, observed=True)[time_col].agg(["min", "max"])
+    serie_idxs = times_by_id.index.get_indexer(df[id_col])
+    times = df[time_col].to_numpy()
+    if isinstance(freq, int):
+        starts = _determine_bound(start, freq, times_by_id, "min")
+        ends = _determine_bound(end, freq, times_by_id, "max") + freq
+        sizes = (ends - starts) // freq
+        offsets = times - starts[serie_idxs]
+        return times_by_id.index, sizes, serie_idxs, offsets // freq, offsets % freq == 0
+    if times_by_id.shape[0] and df[time_col].dt.tz is not None:
+        times = df[time_col].dt.tz_convert("UTC").dt.tz_localize(None).to_numpy()
+    unit, n, offset = _np_freq(freq)
+    calendar = _busday_calendar(offset.base)
+    starts = _determine_bound(start, unit, times_by_id, "min")
+    ends = _determine_bound(end, unit, times_by_id, "max")
+    if calendar is not None:
+        first_bdays = np.busday_offset(starts, 0, roll="forward", busdaycal=calendar)
+        n_bdays = np.busday_count(
+            first_bdays, ends + np.timedelta64(1, "D"), busdaycal=calendar
+        )
+        sizes = np.maximum(-(-n_bdays // n), 0)
+        n_bdays = np.busday_count(
+            first_bdays[serie_idxs], times.astype("datetime64[D]"), busdaycal=calendar
+        )
+        positions = n_bdays // n
+        grid_times = np.busday_offset(
+            first_bdays[serie_idxs], positions * n, busdaycal=calendar
+        )
+    else:
+        ends = ends + np.timedelta64(n, unit)
+        sizes = ((ends - starts) / np.timedelta64(n, unit)).astype(np.int64)
+        units = times.astype(f"datetime64[{unit}]").view(np.int64)
+        positions = (units - starts.view(np.int64)[serie_idxs]) // n
+        grid_times = starts[serie_idxs] + positions * np.timedelta64(n, unit)
+    grid_times = grid_times.astype("datetime64[ns]")
+    if times.size:
+        # same adjustment as in id_time_grid
+        first_time = times[0]
+        if first_time != first_time.astype(f"datetime64[{unit}]"):
+            grid_times = (pd.DatetimeIndex(grid_times) + offset.base).to_numpy()
+    return times_by_id.index, sizes, serie_idxs, positions, grid_times == times
+
+
+def _calendar_months(freq: str) -> Optional[int]:
+    """Number of months of a polars calendar interval, e.g. '3mo', or None if fixed."""
+    match = re.fullmatch(r"(\d+)(mo|q|y)", freq)
+    if match is None:
+        if re.search(r"\d+(mo|q|y)", freq):
+            raise NotImplementedError(
+                f"Compound intervals with months, quarters or years ('{freq}')."
+            )
+        return None
+    return int(match.group(1)) * {"mo": 1, "q": 3, "y": 12}[match.group(2)]
+
+
+def _gap_report_pl(
+    df: pl_DataFrame,
+    freq: Union[str, int],
+    start: Union[str, int, date, datetime],
+    end: Union[str, int, date, datetime],
+    id_col: str,
+    time_col: str,
+) -> pl_DataFrame:
+    times_by_id = (
+        group_by(df, id_col)
+        .agg(
+            pl.col(time_col).min().alias("min"),
+            pl.col(time_col).max().alias("max"),
+            pl.len().alias("actual"),
+        )
+        .sort(id_col)
+    )
+    bounds = times_by_id.select(
+        id_col,
+        "actual",
+        _determine_bound_pl(start, times_by_id, "min").alias("_start"),
+        _determine_bound_pl(end, times_by_id, "max").alias("_end"),
+    )
+    t, start_expr, end_expr = pl.col(time_col), pl.col("_start"), pl.col("_end")
+    months = _calendar_months(freq) if isinstance(freq, str) else None
+    if isinstance(freq, int):
+        diff = t - start_expr
+        sizes = (end_expr - start_expr) // freq + 1
+        positions, aligned = diff // freq, diff % freq == 0
+    elif months is None:
+        epoch = pl_Series([datetime(2000, 1, 1)])
+        step = (epoch.dt.offset_by(freq) - epoch).dt.total_microseconds().item()
+        diff = (t - start_expr).dt.total_microseconds()
+        sizes = (end_expr - start_expr).dt.total_microseconds() // step + 1
+        positions, aligned = diff // step, diff % step == 0
+    else:
+
+        def months_between(a, b):
+            return (b.dt.year() - a.dt.year()) * 12 + b.dt.month() - a.dt.month()
+
+        def add_months(k):
+            return start_expr.dt.offset_by(pl.format("{}mo", k * months))
+
+        last = months_between(start_expr, end_expr) // months
+        sizes = pl.when(add_months(last) > end_expr).then(last).otherwise(last + 1)
+        positions = months_between(start_expr, t) // months
+        aligned = add_months(positions) == t
+    bounds = bounds.with_columns(sizes.alias("expected"))
+    in_grid = (
+        df.select(id_col, time_col)
+        .join(bounds, on=id_col)
+        .select(id_col, "expected", positions.alias("_pos"), aligned.alias("_aligned"))
+        .filter(
+            pl.col("_aligned")
+            & (pl.col("_pos") >= 0)
+            & (pl.col("_pos") < pl.col("expected"))
+        )
+        .sort(id_col, "_pos")
+    )
+    gaps = in_grid.group_by(id_col).agg(
+        pl.len().alias("_present"),
+        # the first gap is the position of the first row
+        (pl.col("_pos").diff().fill_null(pl.col("_pos").first() + 1) - 1)
+        .max()
+        .alias("_inner_gap"),
+        (pl.col("expected").first() - 1 - pl.col("_pos").max()).alias("_last_gap"),
+    )
+    return (
+        bounds.join(gaps, on=id_col, how="left")
+        .with_columns(pl.col("_present").fill_null(0))
+        .select(
+            id_col,
+            "expected",
+            "actual",
+            (pl.col("expected") - pl.col("_present")).alias("missing"),
+            pl.max_horizontal("_inner_gap", "_last_gap")
+            .fill_null(pl.col("expected"))
+            .alias("largest_gap"),
+            (pl.col("actual") - pl.col("_present")).alias("off_freq"),
+        )
+        .sort(id_col)
+    )
+
+
+def gap_report(
+    df: DFType,
+    freq: Union[str, int, pd.offsets.BaseOffset],
+    start: Union[str, int, date, datetime] = "per_serie",
+    end: Union[str, int, date, datetime] = "global",
+    id_col: str = "unique_id",
+    time_col: str = "ds",
+) -> DFType:
+    """Summary of the gaps of each serie, computed without generating the grid.
+
+    Args:
+        df (pandas or polars DataFrame): Input data
+        freq (str, int or pandas offset): Series' frequency
+        start (str, int, date or datetime, optional): Initial timestamp for the series.
+            See `fill_gaps` for the details. Defaults to "per_serie".
+        end (str, int, date or datetime, optional): Final timestamp for the series.
+            See `fill_gaps` for the details. Defaults to "global".
+        id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
+        time_col (str, optional): Column that identifies each timestamp. Defaults to 'ds'.
+
+    Returns:
+        pandas or polars DataFrame: Dataframe with one row per serie and the columns
+            * 'expected': number of timestamps that `fill_gaps` would produce
+            * 'actual': number of rows of the serie
+            * 'missing': number of expected timestamps without a row
+            * 'largest_gap': longest run of consecutive missing timestamps
+            * 'off_freq': number of rows that don't meet the frequency or fall outside
+              of `start` and `end`, which `fill_gaps` would drop
+    """
+    validate_format(df, id_col=id_col, time_col=time_col, target_col=None)
+    validate_freq(df[time_col], freq=freq)
+    if isinstance(df, pl_DataFrame):
+        return _gap_report_pl(
+            df=df, freq=freq, start=start, end=end, id_col=id_col, time_col=time_col
+        )
+    ids, sizes, serie_idxs, positions, aligned = _grid_positions_pd(
+        df=df, freq=freq, start=start, end=end, id_col=id_col, time_col=time_col
+    )
+    n_series = ids.size
+    actual = np.bincount(serie_idxs, minlength=n_series)
+    in_grid = aligned & (positions >= 0) & (positions < sizes[serie_idxs])
+    serie_idxs = serie_idxs[in_grid]
+    positions = positions[in_grid]
+    is_sorted = (serie_idxs[1:] > serie_idxs[:-1]) | (
+        (serie_idxs[1:] == serie_idxs[:-1]) & (positions[1:] > positions[:-1])
+    )
+    if not is_sorted.all():
+        order = np.lexsort((positions, serie_idxs))
+        serie_idxs = serie_idxs[order]
+        positions = positions[order]
+    present = np.bincount(serie_idxs, minlength=n_series)
+    # series without rows in the grid are a single gap
+    largest_gap = sizes.copy()
+    if serie_idxs.size:
+        is_first = np.empty(serie_idxs.size, dtype=bool)
+        is_first[0] = True
+        is_first[1:] = serie_idxs[1:] != serie_idxs[:-1]
+        gaps = np.empty_like(positions)
+        gaps[0] = positions[0]
+        gaps[1:] = positions[1:] - positions[:-1] - 1
+        gaps[is_first] = positions[is_first]
+        firsts = np.flatnonzero(is_first)
+        with_rows = serie_idxs[firsts]
+        lasts = np.append(firsts[1:], serie_idxs.size) - 1
+        largest_gap[with_rows] = np.maximum(
+            np.maximum.reduceat(gaps, firsts),
+            sizes[with_rows] - 1 - positions[lasts],
+        )
+    return pd.DataFrame(
+        {
+            id_col: ids,
+            "expected": sizes,
+            "actual": actual,
+            "missing": sizes - present,
+            "largest_gap": largest_gap,
+            "off_freq": actual - present,
+        }
+    )
+
+
+def _serie_chunks(sizes: np.ndarray, max_rows: int) -> np.ndarray:
+    """Chunk of each serie, grouping consecutive series up to `max_rows` rows."""
+    ends = np.cumsum(sizes)
+    chunks = np.empty(sizes.size, dtype=np.int64)
+    start = chunk = 0
+    while start < sizes.size:
+        offset = ends[start] - sizes[start]
+        stop = max(np.searchsorted(ends, offset + max_rows, side="right"), start + 1)
+        chunks[start:stop] = chunk
+        start = stop
+        chunk += 1
+    return chunks
+
+
+def _fill_gaps_chunks(
+    df: DFType,
+    freq: Union[str, int, pd.offsets.BaseOffset],
+    start: Union[str, int, date, datetime],
+    end: Union[str, int, date, datetime],
+    id_col: str,
+    time_col: str,
+    fill_strategy: Optional[Dict[str, Any]],
+    max_rows: int,
+) -> Iterator[DFType]:
+    # the global bounds are the same for every chunk
+    if start == "global":
+        start = df[time_col].min()
+    if end == "global":
+        end = df[time_col].max()
+    report = gap_report(
+        df, freq=freq, start=start, end=end, id_col=id_col, time_col=time_col
+    )
+    serie_chunks = _serie_chunks(report["expected"].to_numpy(), max_rows)
+    # the report is sorted by id, so are the codes
+    if isinstance(df, pl_DataFrame):
+        codes = df.select(pl.col(id_col).rank("dense") - 1).to_series().to_numpy()
+    else:
+        codes = df.groupby(id_col, observed=True).ngroup().to_numpy()
+    row_chunks = serie_chunks[codes]
+    order = np.argsort(row_chunks, kind="stable")
+    bounds = np.searchsorted(
+        row_chunks[order], np.arange(serie_chunks[-1] + 2 if codes.size else 1)
+    )
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        idxs = order[lo:hi]
+        chunk = df[idxs] if isinstance(df, pl_DataFrame) else df.take(idxs)
+        yield fill_gaps(
+            chunk,
+            freq=freq,
+            start=start,
+            end=end,
+            id_col=id_col,
+            time_col=time_col,
+            fill_strategy=fill_strategy,
+        )
+
+
+def _to_arrow(df: DFType) -> "pa.Table":
+    import pyarrow as pa
+
+    if isinstance(df, pl_DataFrame):
+        return df.to_arrow()
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _chunks_schema(
+    first: "pa.Table", df: DFType, fill_strategy: Optional[Dict[str, Any]]
+) -> "pa.Schema":
+    """Schema of the first chunk with the columns that pandas upcasts restored.
+
+    Chunks without missing rows keep the integer and boolean columns, so all
+    of them are written with the input types (nulls are supported by parquet)."""
+    import pyarrow as pa
+
+    schema = first.schema.remove_metadata()
+    if isinstance(df, pl_DataFrame):
+        return schema
+    fill_strategy = fill_strategy or {}
+    for col, dtype in df.dtypes.items():
+        if not isinstance(dtype, np.dtype) or dtype.kind not in "iub":
+            continue
+        if fill_strategy.get(col) == "interpolate":
+            dtype = np.dtype(np.float64)
+        i = schema.get_field_index(col)
+        schema = schema.set(i, schema.field(i).with_type(pa.from_numpy_dtype(dtype)))
+    return schema
+
+
+def fill_gaps_chunked(
+    df: DFType,
+    freq: Union[str, int, pd.offsets.BaseOffset],
+    start: Union[str, int, date, datetime] = "per_serie",
+    end: Union[str, int, date, datetime] = "global",
+    id_col: str = "unique_id",
+    time_col: str = "ds",
+    fill_strategy: Optional[Dict[str, Any]] = None,
+    max_rows: int = 10_000_000,
+    output_path: Optional[str] = None,
+) -> Optional[Iterator[DFType]]:
+    """Fill the gaps of batches of series, bounding the size of the filled data.
+
+    A first pass computes the number of rows that each serie will have after being
+    filled (see `gap_report`) as well as the global bounds, then consecutive series
+    are grouped into chunks of at most `max_rows` rows that are filled one at a time.
+    Concatenating the chunks gives the same result as `fill_gaps`.
+
+    Args:
+        df (pandas or polars DataFrame): Input data
+        freq (str, int or pandas offset): Series' frequency
+        start (str, int, date or datetime, optional): Initial timestamp for the series.
+            See `fill_gaps` for the details. Defaults to "per_serie".
+        end (str, int, date or datetime, optional): Final timestamp for the series.
+            See `fill_gaps` for the details. Defaults to "global".
+        id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
+        time_col (str, optional): Column that identifies each timestamp. Defaults to 'ds'.
+        fill_strategy (dict, optional): Mapping from column to the way of filling
+            the rows added to each serie. See `fill_gaps` for the details.
+            Defaults to None.
+        max_rows (int, optional): Number of rows of each filled chunk. A chunk can be
+            larger if a single serie exceeds it. Defaults to 10,000,000.
+        output_path (str, optional): Parquet file where the chunks are written as
+            they're filled instead of being returned. Requires pyarrow.
+            Defaults to None.
+
+    Returns:
+        iterator of pandas or polars DataFrame: Filled chunks, sorted by id and time.
+            `None` if `output_path` is set.
+    """
+    if max_rows < 1:
+        raise ValueError("`max_rows` must be a positive integer.")
+    validate_format(df, id_col=id_col, time_col=time_col, target_col=None)
+    validate_freq(df[time_col], freq=freq)
+    if fill_strategy is not None:
+        _validate_fill_strategy(fill_strategy, list(df.columns), id_col, time_col)
+    chunks = _fill_gaps_chunks(
+        df=df,
+        freq=freq,
+        start=start,
+        end=end,
+        id_col=id_col,
+        time_col=time_col,
+        fill_strategy=fill_strategy,
+        max_rows=max_rows,
+    )
+    if output_path is None:
+        return chunks
+
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = _to_arrow(chunk)
+            if writer is None:
+                schema = _chunks_schema(table, df, fill_strategy)
+                writer = pq.ParquetWriter(output_path, schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    return None
+
+
+_MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+_WEEKDAYS = ["MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"]
+_DAY_NS = 86_400 * 10**9
+
+
+def _modes_by_group(
+    groups: np.ndarray, values: np.ndarray, n_groups: int
+) -> np.ndarray:
+    """Most common value of each group (the smallest one in ties), 0 if it's empty."""
+    value_codes, uniques = pd.factorize(values)
+    # hashing the (group, value) pairs is faster than sorting them
+    pair_counts = pd.Series(groups * uniques.size + value_codes).value_counts(sort=False)
+    pairs = pair_counts.index.to_numpy()
+    pair_groups = pairs // max(uniques.size, 1)
+    pair_values = uniques[pairs % max(uniques.size, 1)]
+    # the first pair of each group has the largest count and the smallest value
+    best = np.lexsort((pair_values, -pair_counts.to_numpy(), pair_groups))
+    pair_groups = pair_groups[best]
+    is_first = np.empty(pair_groups.size, dtype=bool)
+    is_first[:1] = True
+    is_first[1:] = pair_groups[1:] != pair_groups[:-1]
+    out = np.zeros(n_groups, dtype=values.dtype)
+    out[pair_groups[is_first]] = pair_values[best][is_first]
+    return out
+
+
+def _id_time_order(codes: np.ndarray, times: np.ndarray) -> Optional[np.ndarray]:
+    """Indices that sort the rows by id and time, None if they're already sorted."""
+    code_diffs = np.diff(codes)
+    is_sorted = (code_diffs > 0) | ((code_diffs == 0) & (np.diff(times) >= 0))
+    if is_sorted.all():
+        return None
+    # a single key is faster to sort than the (id, time) pairs
+    time_ranks, unique_times = pd.factorize(times, sort=True)
+    return np.argsort(codes * unique_times.size + time_ranks)
+
+
+def _fixed_alias(delta: int, polars: bool) -> str:
+    """Alias of a frequency of `delta` nanoseconds."""
+    if not polars:
+        return pd.tseries.frequencies.to_offset(pd.Timedelta(delta)).freqstr
+    units = [("d", _DAY_NS), ("h", 3600 * 10**9), ("m", 60 * 10**9), ("s", 10**9)]
+    for unit, size in units + [("ms", 10**6), ("us", 10**3)]:
+        if delta % size == 0:
+            return f"{delta // size}{unit}"
+    return f"{delta}ns"
+
+
+def _calendar_alias(
+    months: int, is_start: bool, is_end: bool, first_month: int, polars: bool
+) -> Optional[str]:
+    """Alias of a frequency of `months` months, None if pandas can't represent it."""
+    if polars:
+        if months % 12 == 0:
+            return f"{months // 12}y"
+        if months % 3 == 0:
+            return f"{months // 3}q"
+        return f"{months}mo"
+    if not (is_start or is_end):
+        return None
+    suffix = "S" if is_start else "E"
+    if months % 12 == 0:
+        n, name = months // 12, f"Y{suffix}-{_MONTHS[first_month - 1]}"
+    elif months % 3 == 0:
+        # anchor on the first month (starts) or the last month (ends) of the year
+        anchor = (first_month - 1) % 3 + (0 if is_start else 9)
+        n, name = months // 3, f"Q{suffix}-{_MONTHS[anchor]}"
+    else:
+        n, name = months, f"M{suffix}"
+    return name if n == 1 else f"{n}{name}"
+
+
+
+def _all_by_serie(flags: np.ndarray, serie_starts: np.ndarray) -> np.ndarray:
+    return np.logical_and.reduceat(flags, serie_starts)
+
+
+def infer_freq(
+    df: DFType,
+    id_col: str = "unique_id",
+    time_col: str = "ds",
+) -> DFType:
+    """Infer the frequency of each serie from its most common time difference.
+
+    The differences between consecutive timestamps of all series are computed at
+    once and the most common one of each serie is mapped to a pandas or polars
+    alias. Differences of whole months are detected from the calendar, so monthly,
+    quarterly and yearly series are identified despite their varying lengths, as
+    are business days (daily series without weekends).
+
+    Args:
+        df (pandas or polars DataFrame): Input data
+        id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
+        time_col (str, optional): Column that identifies each timestamp. Defaults to 'ds'.
+
+    Returns:
+        pandas or polars DataFrame: Dataframe with one row per serie and a 'freq'
+            column with the alias of its frequency (a pandas alias for pandas
+            dataframes and a polars one for polars dataframes), or its step if the
+            timestamps are integers. For timestamps, a 'seconds' column has the
+            most common difference of each serie in seconds, e.g. 86400 for daily
+            series and between 28 and 31 days for monthly ones. Both are missing
+            for series with less than two distinct timestamps. The alias is also
+            missing for pandas monthly series that aren't at the start or end of
+            the month and for polars series of business days, which raise a
+            warning.
+    """
+    validate_format(df, id_col=id_col, time_col=time_col, target_col=None)
+    is_polars = isinstance(df, pl_DataFrame)
+    times = df[time_col]
+    if is_polars:
+        uids = df[id_col].unique().sort()
+        codes = df.select(pl.col(id_col).rank("dense") - 1).to_series().to_numpy()
+        wall_times = times
+        if times.dtype == pl.Datetime and times.dtype.time_zone is not None:
+            wall_times = times.dt.replace_time_zone(None)
+    else:
+        codes, uids = pd.factorize(df[id_col], sort=True)
+        wall_times = times
+        if not _is_int_dtype(times) and times.dt.tz is not None:
+            # differences in utc and calendar in local time
+            wall_times = times.dt.tz_localize(None)
+            times = times.dt.tz_convert("UTC").dt.tz_localize(None)
+    times = times.to_numpy()
+    is_int = np.issubdtype(times.dtype, np.integer)
+    if is_int:
+        values = times.astype(np.int64, copy=False)
+    else:
+        values = times.astype("datetime64[ns]").view(np.int64)
+        wall_times = wall_times.to_numpy().astype("datetime64[ns]")
+    order = _id_time_order(codes, values)
+    if order is not None:
+        codes = codes[order]
+        values = values[order]
+        if not is_int:
+            wall_times = wall_times[order]
+    n_series = len(uids)
+    deltas = np.diff(values)
+    valid = (codes[1:] == codes[:-1]) & (deltas > 0)
+    groups = codes[1:][valid]
+    deltas = deltas[valid]
+    has_freq = np.bincount(groups, minlength=n_series) > 0
+    modes = _modes_by_group(groups, deltas, n_series)
+    if is_int:
+        if is_polars:
+            freqs = pl_Series("freq", modes).set(pl_Series(~has_freq), None)
+        else:
+            freqs = pd.array(modes, dtype="Int64")
+            freqs[~has_freq] = pd.NA
+        return type(df)({id_col: uids, "freq": freqs})
+
+    is_first = np.empty(codes.size, dtype=bool)
+    is_first[:1] = True
+    is_first[1:] = codes[1:] != codes[:-1]
+    serie_starts = np.flatnonzero(is_first)
+    days = wall_times.astype("datetime64[D]")
+    months = wall_times.astype("datetime64[M]")
+    is_start = _all_by_serie(days == months, serie_starts)
+    is_end = _all_by_serie((days + 1).astype("datetime64[M]") != months, serie_starts)
+    day_of_month = (days - months).view(np.int64)
+    same_day = np.minimum.reduceat(day_of_month, serie_starts) == np.maximum.reduceat(
+        day_of_month, serie_starts
+    )
+    month_diffs = np.diff(months.view(np.int64))[valid]
+    month_modes = _modes_by_group(groups, month_diffs, n_series)
+    first_months = months[serie_starts].view(np.int64) % 12 + 1
+    weekdays = (days[serie_starts].view(np.int64) + 3) % 7
+    no_weekends = _all_by_serie(np.is_busday(days), serie_starts)
+    has_weekends = np.bincount(groups[deltas == 3 * _DAY_NS], minlength=n_series) > 0
+
+    # 0: missing, 1: months, 2: business days, 3: weeks, 4: fixed
+    is_calendar = (
+        (modes >= 28 * _DAY_NS) & (month_modes > 0) & (is_start | is_end | same_day)
+    )
+    is_bday = (modes == _DAY_NS) & no_weekends & has_weekends
+    is_week = modes % (7 * _DAY_NS) == 0
+    kinds = np.select([~has_freq, is_calendar, is_bday, is_week], [0, 1, 2, 3], 4)
+    value_codes, values = pd.factorize(np.where(kinds == 1, month_modes, modes))
+    # the other fields take 12 bits
+    keys = (
+        value_codes << 12
+        | kinds
+        | np.where(kinds == 1, is_start, False) << 3
+        | np.where(kinds == 1, is_end, False) << 4
+        | np.where(kinds == 1, first_months, 0) << 5
+        | np.where(kinds == 3, weekdays, 0) << 9
+    )
+    # the aliases are built once per distinct frequency
+    inverse, keys = pd.factorize(keys)
+    aliases = []
+    for key in keys.tolist():
+        kind, value = key & 7, int(values[key >> 12])
+        start, end = bool(key >> 3 & 1), bool(key >> 4 & 1)
+        first_month, weekday = key >> 5 & 15, key >> 9 & 7
+        if kind == 0:
+            alias = None
+        elif kind == 1:
+            alias = _calendar_alias(value, start, end, first_month, is_polars)
+        elif kind == 2:
+            # polars doesn't have an alias for business days
+            alias = None if is_polars else "B"
+        elif kind == 3:
+            n_weeks = value // (7 * _DAY_NS)
+            if is_polars:
+                alias = f"{n_weeks}w"
+            else:
+                alias = f"W-{_WEEKDAYS[weekday]}"
+                if n_weeks > 1:
+                    alias = f"{n_weeks}{alias}"
+        else:
+            alias = _fixed_alias(value, is_polars)
+        aliases.append(alias)
+    freqs = np.array(aliases, dtype=object)[inverse]
+    if is_polars and (kinds == 2).any():
+        warnings.warn(
+            f"{(kinds == 2).sum()} series have business days, which can't be "
+            "represented as a polars frequency, so their frequency is set as missing."
+        )
+    seconds = np.where(has_freq, modes / 10**9, np.nan)
+    if is_polars:
+        return pl_DataFrame(
+            {
+                id_col: uids,
+                "freq": pl_Series(freqs, dtype=pl.Utf8),
+                "seconds": pl_Series(seconds).fill_nan(None),
+            }
+        )
+    return pd.DataFrame({id_col: uids, "freq": freqs, "seconds": seconds})
+
+
+_TEMPORAL_AGGS = ("sum", "mean", "last", "min", "max")
+
+
+def _validate_aggs(
+    aggs: Dict[str, Union[str, List[str]]], columns: list, id_col: str, time_col: str
+) -> List[Tuple[str, str, str]]:
+    """Column, aggregation and output name of each aggregation."""
+    out = []
+    for col, col_aggs in aggs.items():
+        if col in (id_col, time_col) or col not in columns:
+            raise ValueError(
+                f"Can't aggregate '{col}', it must be one of the value columns of `df`."
+            )
+        names = [col_aggs] if isinstance(col_aggs, str) else col_aggs
+        for agg in names:
+            if agg not in _TEMPORAL_AGGS:
+                raise ValueError(
+                    f"Unknown aggregation '{agg}' for '{col}'. "
+                    f"Use one of {list(_TEMPORAL_AGGS)}."
+                )
+            out.append((col, agg, col if isinstance(col_aggs, str) else f"{col}_{agg}"))
+    return out
+
+
+def _calendar_period(offset: pd.offsets.BaseOffset) -> Optional[Tuple[int, int, bool]]:
+    """Months in each period, first month of the periods (0-based, modulo the
+    number of months) and whether the periods are labeled by their last day."""
+    base, n = offset.base, offset.n
+    if isinstance(base, (pd.offsets.MonthBegin, pd.offsets.MonthEnd)):
+        return n, 0, isinstance(base, pd.offsets.MonthEnd)
+    if isinstance(base, pd.offsets.QuarterBegin):
+        return 3 * n, (base.startingMonth - 1) % 3, False
+    if isinstance(base, pd.offsets.QuarterEnd):
+        return 3 * n, base.startingMonth % 3, True
+    if isinstance(base, pd.offsets.YearBegin):
+        return 12 * n, base.month - 1, False
+    if isinstance(base, pd.offsets.YearEnd):
+        return 12 * n, base.month % 12, True
+    return None
+
+
+def _period_labels_pd(
+    times: pd.Series, freq: Union[str, int, pd.offsets.BaseOffset]
+) -> pd.Series:
+    """Label of the period of `freq` that contains each time."""
+    if isinstance(freq, int):
+        return times - times % freq
+    offset = pd.tseries.frequencies.to_offset(freq)
+    tz = times.dt.tz
+    period = _calendar_period(offset)
+    is_week = isinstance(offset.base, pd.offsets.Week) and offset.weekday is not None
+    try:
+        step = pd.Timedelta(offset).value
+    except ValueError:
+        step = None
+    # the periods follow the wall time of the time zone
+    values = times.dt.tz_localize(None) if tz is not None else times
+    values = values.to_numpy().astype("datetime64[ns]", copy=False)
+    if step is not None and not is_week:
+        wall = values.view(np.int64)
+        # subtracting from the absolute times keeps the labels unambiguous
+        utc = times.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        labels = pd.Series((utc - wall % step).view("datetime64[ns]"))
+        if tz is not None:
+            labels = labels.dt.tz_localize("UTC").dt.tz_convert(tz)
+        return labels
+    if period is not None:
+        n_months, first_month, is_end = period
+        months = values.astype("datetime64[M]").view(np.int64)
+        months -= (months - first_month) % n_months
+        if is_end:
+            months += n_months
+        labels = months.view("datetime64[M]").astype("datetime64[D]")
+        if is_end:
+            labels -= np.timedelta64(1, "D")
+    elif is_week:
+        if offset.n != 1:
+            raise NotImplementedError("Multiple of an anchored week")
+        days = values.astype("datetime64[D]")
+        # the weeks are labeled by their anchor day
+        weekdays = (days.view(np.int64) + 3) % 7
+        labels = days + (offset.weekday - weekdays) % 7
+    else:
+        raise ValueError(f"Can't aggregate to the '{freq}' frequency.")
+    labels = pd.Series(labels.astype("datetime64[ns]"))
+    if tz is not None:
+        labels = labels.dt.tz_localize(tz, nonexistent="shift_forward")
+    return labels
+
+
+def _segment_agg(values: np.ndarray, agg: str, starts: np.ndarray) -> np.ndarray:
+    """Reduce each segment of `values` that begins at `starts`, ignoring NaNs."""
+    if values.dtype.kind == "f":
+        valid = ~np.isnan(values)
+        n_valid = np.add.reduceat(valid, starts)
+    else:
+        valid = None
+        n_valid = np.diff(np.append(starts, values.size))
+    if agg == "sum" or agg == "mean":
+        sums = np.add.reduceat(values if valid is None else np.where(valid, values, 0), starts)
+        if agg == "sum":
+            return sums
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(n_valid > 0, sums / np.maximum(n_valid, 1), np.nan)
+    if agg == "last":
+        positions = np.arange(values.size)
+        if valid is not None:
+            positions = np.where(valid, positions, -1)
+        last = np.maximum.reduceat(positions, starts)
+        if valid is None:
+            return values[last]
+        return np.where(last >= starts, values[last], np.nan)
+    reduce = np.fmin if agg == "min" else np.fmax
+    return reduce.reduceat(values, starts)
+
+
+def temporal_aggregate(
+    df: DFType,
+    freq: Union[str, int, pd.offsets.BaseOffset],
+    aggs: Dict[str, Union[str, List[str]]],
+    id_col: str = "unique_id",
+    time_col: str = "ds",
+) -> DFType:
+    """Aggregate each serie to a coarser frequency.
+
+    Every timestamp is assigned to the period of `freq` that contains it and the
+    values of each (serie, period) are reduced with the requested aggregations,
+    ignoring missing values. Periods without rows aren't included.
+
+    For pandas dataframes the periods are labeled like in `DataFrame.resample`: by
+    their first timestamp, or by their last day for frequencies anchored at the end,
+    e.g. 'W-SUN', 'ME', 'QE' or 'YE'. Multiples of a frequency, e.g. '2MS', start at
+    the unix epoch. For polars dataframes `freq` must be a polars alias, as in the
+    other functions, and the periods are the ones of `Expr.dt.truncate`, which are
+    always labeled by their first timestamp. Thus, the weeks of polars' '1w' group
+    the same rows as the pandas 'W-SUN' ones but are labeled by their Monday instead
+    of their Sunday, and the months of '1mo' are labeled like 'MS' and not like 'ME'.
+
+    Args:
+        df (pandas or polars DataFrame): Input data
+        freq (str, int or pandas offset): Frequency to aggregate to.
+        aggs (dict): Mapping from column to an aggregation or a list of them. Can be
+            'sum', 'mean', 'last', 'min' or 'max'. The output columns are named as the
+            input ones when a single aggregation is given and as `{column}_{aggregation}`
+            for lists.
+        id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
+        time_col (str, optional): Column that identifies each timestamp. Defaults to 'ds'.
+
+    Returns:
+        pandas or polars DataFrame: Aggregated values sorted by id and time.
+    """
+    validate_format(df, id_col=id_col, time_col=time_col, target_col=None)
+    validate_freq(df[time_col], freq=freq)
+    specs = _validate_aggs(aggs, list(df.columns), id_col, time_col)
+    if isinstance(df, pl_DataFrame):
+        if isinstance(freq, int):
+            period = pl.col(time_col) - pl.col(time_col) % freq
+        else:
+            period = pl.col(time_col).dt.truncate(freq)
+        exprs = []
+        for col, agg, name in specs:
+            expr = pl.col(col)
+            if df.schema[col].is_float():
+                # NaNs are missing values, as in pandas
+                expr = expr.fill_nan(None)
+            if agg == "last":
+                expr = expr.drop_nulls().last()
+            else:
+                expr = getattr(expr, agg)()
+            exprs.append(expr.alias(name))
+        return (
+            df.sort(id_col, time_col)
+            .group_by(id_col, period.alias(time_col), maintain_order=True)
+            .agg(exprs)
+        )
+    codes, uids = pd.factorize(df[id_col], sort=True)
+    labels = _period_labels_pd(df[time_col], freq)
+    if isinstance(freq, int):
+        times = df[time_col].to_numpy()
+        label_values = labels.to_numpy()
+    else:
+        # utc nanoseconds
+        times = df[time_col].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        label_values = labels.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    order = _id_time_order(codes, times)
+    if order is not None:
+        codes = codes[order]
+        label_values = label_values[order]
+        labels = labels.take(order)
+    # the rows of each (serie, period) are contiguous
+    is_new = np.empty(codes.size, dtype=bool)
+    is_new[:1] = True
+    is_new[1:] = (codes[1:] != codes[:-1]) | (label_values[1:] != label_values[:-1])
+    starts = np.flatnonzero(is_new)
+    res = pd.DataFrame(
+        {
+            id_col: uids.take(codes[starts]),
+            time_col: labels.iloc[starts].reset_index(drop=True),
+        }
+    )
+    for col, agg, name in specs:
+        values = df[col].to_numpy()
+        if values.dtype.kind not in "iufb":
+            values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        if order is not None:
+            values = values[order]
+        if values.dtype.kind == "b" and agg in ("sum", "mean"):
+            values = values.astype(np.int64)
+        res[name] = _segment_agg(values, agg, starts)
     return res
@@ -22,7 +22,7 @@ from utilsforecast.validation import (
     validate_format,
 )
 
-from .compat import DataFrame, Series, pl, pl_DataFrame, pl_Series
+from .compat import DataFrame, Series, pl, pl_DataFrame, pl_LazyFrame, pl_Series
 
 
 def _polars_categorical_to_numerical(serie: pl_Series) -> pl_Series:
@@ -360,7 +360,7 @@ def sort(df: DataFrame, by: Optional[Union[str, List[str]]] = None) -> DataFrame
         out = df.sort_values()
         if isinstance(out, pd.Series):
             out = out.reset_index(drop=True)
-    elif isinstance(df, pl_DataFrame):
+    elif isinstance(df, (pl_DataFrame, pl_LazyFrame)):
         out = df.sort(by)
     else:
         out = df.sort()
@@ -0,0 +1,353 @@
+"""Mergeable accumulators to compute losses incrementally"""
+
+__all__ = [
+    "MAEAccumulator",
+    "RMSEAccumulator",
+    "WAPEAccumulator",
+    "NDAccumulator",
+    "QuantileLossAccumulator",
+    "CoverageAccumulator",
+]
+
+
+from typing import Dict, List, Optional, Tuple
+
+import narwhals.stable.v2 as nw
+from narwhals.stable.v2.typing import IntoDataFrameT
+
+from .losses import _get_group_cols, _zero_to_nan
+
+
+class _LossAccumulator:
+    """Keeps per serie sufficient statistics that can be updated and merged.
+
+    Every statistic is a sum, so the state of two accumulators can be combined by
+    adding them up by id (and cutoff), which makes the cost of an update
+    proportional to the size of the new batch."""
+
+    def __init__(
+        self,
+        id_col: str = "unique_id",
+        target_col: str = "y",
+        cutoff_col: str = "cutoff",
+    ):
+        self.id_col = id_col
+        self.target_col = target_col
+        self.cutoff_col = cutoff_col
+        self._group_cols: Optional[List[str]] = None
+        self._state: Optional[nw.DataFrame] = None
+
+    def _params(self) -> Tuple:
+        return (self.id_col, self.target_col, self.cutoff_col)
+
+    def _stat_exprs(self) -> List[nw.Expr]:
+        """Row-wise expressions whose aggregates make up the state."""
+        raise NotImplementedError
+
+    def _stat_aggs(self) -> List[nw.Expr]:
+        """Aggregations of the row-wise expressions by id (and cutoff)."""
+        raise NotImplementedError
+
+    def _result_exprs(self) -> List[nw.Expr]:
+        """Expressions that compute the final metric from the state."""
+        raise NotImplementedError
+
+    def _combine(self, group_cols: List[str], stats: nw.DataFrame) -> None:
+        if self._group_cols is None:
+            self._group_cols = group_cols
+        elif self._group_cols != group_cols:
+            raise ValueError(
+                f"Expected data grouped by {self._group_cols}, got {group_cols}."
+            )
+        if self._state is None:
+            self._state = stats
+        else:
+            self._state = (
+                nw.concat([self._state, stats])
+                .group_by(*group_cols)
+                .agg(nw.all().sum())
+            )
+
+    def update(self, batch: IntoDataFrameT) -> "_LossAccumulator":
+        """Add the statistics of a new batch of actuals and predictions.
+
+        Args:
+            batch (pandas or polars DataFrame): Input dataframe with id, actual values
+                and predictions. A serie can be split across several batches.
+
+        Returns:
+            self: The updated accumulator.
+        """
+        group_cols = _get_group_cols(
+            df=batch, id_col=self.id_col, cutoff_col=self.cutoff_col
+        )
+        stats = (
+            nw.from_native(batch)
+            .select(*group_cols, *self._stat_exprs())
+            .group_by(*group_cols)
+            .agg(*self._stat_aggs())
+        )
+        self._combine(group_cols, stats)
+        return self
+
+    def merge(self, other: "_LossAccumulator") -> "_LossAccumulator":
+        """Add the statistics of another accumulator of the same type.
+
+        Args:
+            other (accumulator): Accumulator built with the same arguments.
+
+        Returns:
+            self: The updated accumulator.
+        """
+        if type(other) is not type(self) or other._params() != self._params():
+            raise ValueError(
+                "Can only merge accumulators of the same type and with the same arguments."
+            )
+        if other._state is not None:
+            assert other._group_cols is not None
+            self._combine(other._group_cols, other._state)
+        return self
+
+    def result(self) -> IntoDataFrameT:
+        """Compute the metric from the accumulated statistics.
+
+        Returns:
+            pandas or polars DataFrame: dataframe with one row per id and one column per model.
+        """
+        if self._state is None:
+            raise ValueError("The accumulator hasn't received any data yet.")
+        assert self._group_cols is not None
+        return (
+            self._state.select(*self._group_cols, *self._result_exprs())
+            .sort(*self._group_cols)
+            .to_native()
+        )
+
+
+class _MeanAccumulator(_LossAccumulator):
+    def __init__(
+        self,
+        models: List[str],
+        id_col: str = "unique_id",
+        target_col: str = "y",
+        cutoff_col: str = "cutoff",
+    ):
+        super().__init__(id_col=id_col, target_col=target_col, cutoff_col=cutoff_col)
+        self.models = list(models)
+
+    def _params(self) -> Tuple:
+        return (*super()._params(), tuple(self.models))
+
+    def _loss_expr(self, model: str) -> nw.Expr:
+        raise NotImplementedError
+
+    def _stat_exprs(self) -> List[nw.Expr]:
+        return [self._loss_expr(m).alias(f"loss_{i}") for i, m in enumerate(self.models)]
+
+    def _stat_aggs(self) -> List[nw.Expr]:
+        return [
+            agg
+            for i in range(len(self.models))
+            for agg in (
+                nw.col(f"loss_{i}").sum().alias(f"sum_{i}"),
+                nw.col(f"loss_{i}").count().alias(f"count_{i}"),
+            )
+        ]
+
+    def _result_exprs(self) -> List[nw.Expr]:
+        return [
+            (nw.col(f"sum_{i}") / nw.col(f"count_{i}")).alias(m)
+            for i, m in enumerate(self.models)
+        ]
+
+
+class MAEAccumulator(_MeanAccumulator):
+    """Accumulates the sum of absolute errors and the number of errors by serie.
+
+    `result` produces the same values as `utilsforecast.losses.mae`.
+
+    Args:
+        models (list of str): Columns that identify the models predictions.
+        id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
+        target_col (str, optional): Column that contains the target. Defaults to 'y'.
+        cutoff_col (str, optional): Column that identifies the cutoff point for each forecast cross-validation fold. Defaults to 'cutoff'.
+    """
+
+    def _loss_expr(self, model: str) -> nw.Expr:
+        return (nw.col(self.target_col) - nw.col(model)).abs()
+
+
+class RMSEAccumulator(_MeanAccumulator):
+    """Accumulates the sum of squared errors and the number of errors by serie.
+
+    `result` produces the same values as `utilsforecast.losses.rmse`.
+
+    Args:
+        models (list of str): Columns that identify the models predictions.
+        id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
+        target_col (str, optional): Column that contains the target. Defaults to 'y'.
+        cutoff_col (str, optional): Column that identifies the cutoff point for each forecast cross-validation fold. Defaults to 'cutoff'.
+    """
+
+    def _loss_expr(self, model: str) -> nw.Expr:
+        return (nw.col(self.target_col) - nw.col(model)) ** 2
+
+    def _result_exprs(self) -> List[nw.Expr]:
+        return [expr.sqrt() for expr in super()._result_exprs()]
+
+
+class QuantileLossAccumulator(_MeanAccumulator):
+    """Accumulates the sum of pinball losses and the number of losses by serie.
+
+    `result` produces the same values as `utilsforecast.losses.quantile_loss`.
+
+    Args:
+        models (dict from str to str): Mapping from model name to the model predictions for the specified quantile.
+        q (float, optional): Quantile for the predictions' comparison. Defaults to 0.5.
+        id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
+        target_col (str, optional): Column that contains the target. Defaults to 'y'.
+        cutoff_col (str, optional): Column that identifies the cutoff point for each forecast cross-validation fold. Defaults to 'cutoff'.
+    """
+
+    def __init__(
+        self,
+        models: Dict[str, str],
+        q: float = 0.5,
+        id_col: str = "unique_id",
+        target_col: str = "y",
+        cutoff_col: str = "cutoff",
+    ):
+        super().__init__(
+            models=list(models.keys()),
+            id_col=id_col,
+            target_col=target_col,
+            cutoff_col=cutoff_col,
+        )
+        self.pred_cols = dict(models)
+        self.q = q
+
+    def _params(self) -> Tuple:
+        return (*super()._params(), tuple(self.pred_cols.items()), self.q)
+
+    def _loss_expr(self, model: str) -> nw.Expr:
+        delta_y = nw.col(self.target_col) - nw.col(self.pred_cols[model])
+        return nw.max_horizontal(
+            (self.q * delta_y).alias("a"), ((self.q - 1) * delta_y).alias("b")
+        )
+
+
+class NDAccumulator(_LossAccumulator):
+    """Accumulates the sum of absolute errors and the sum of absolute actuals by serie.
+
+    `result` produces the same values as `utilsforecast.losses.nd`.
+
+    Args:
+        models (list of str): Columns that identify the models predictions.
+        id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
+        target_col (str, optional): Column that contains the target. Defaults to 'y'.
+        cutoff_col (str, optional): Column that identifies the cutoff point for each forecast cross-validation fold. Defaults to 'cutoff'.
+    """
+
+    def __init__(
+        self,
+        models: List[str],
+        id_col: str = "unique_id",
+        target_col: str = "y",
+        cutoff_col: str = "cutoff",
+    ):
+        super().__init__(id_col=id_col, target_col=target_col, cutoff_col=cutoff_col)
+        self.models = list(models)
+
+    def _params(self) -> Tuple:
+        return (*super()._params(), tuple(self.models))
+
+    def _stat_exprs(self) -> List[nw.Expr]:
+        return [
+            nw.col(self.target_col).abs().alias("abs_target"),
+            *[
+                (nw.col(self.target_col) - nw.col(m)).abs().alias(f"sum_{i}")
+                for i, m in enumerate(self.models)
+            ],
+        ]
+
+    def _stat_aggs(self) -> List[nw.Expr]:
+        return [nw.all().sum()]
+
+    def _result_exprs(self) -> List[nw.Expr]:
+        return [
+            (nw.col(f"sum_{i}") / _zero_to_nan(nw.col("abs_target"))).alias(m)
+            for i, m in enumerate(self.models)
+        ]
+
+
+class WAPEAccumulator(NDAccumulator):
+    """Accumulates the sum of absolute errors and the sum of absolute actuals by serie.
+
+    `result` produces the same values as `utilsforecast.losses.wape`, which divides
+    the totals over all series, so every serie gets the same value.
+
+    Args:
+        models (list of str): Columns that identify the models predictions.
+        id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
+        target_col (str, optional): Column that contains the target. Defaults to 'y'.
+        cutoff_col (str, optional): Column that identifies the cutoff point for each forecast cross-validation fold. Defaults to 'cutoff'.
+    """
+
+    def _result_exprs(self) -> List[nw.Expr]:
+        return [
+            (
+                nw.col(f"sum_{i}").sum() / _zero_to_nan(nw.col("abs_target").sum())
+            ).alias(m)
+            for i, m in enumerate(self.models)
+        ]
+
+
+class CoverageAccumulator(_LossAccumulator):
+    """Accumulates the number of actuals inside the intervals and the number of rows by serie.
+
+    `result` produces the same values as `utilsforecast.losses.coverage`.
+
+    Args:
+        models (list of str): Columns that identify the models predictions.
+        level (int): Confidence level used for intervals.
+        id_col (str, optional): Column that identifies each serie. Defaults to 'unique_id'.
+        target_col (str, optional): Column that contains the target. Defaults to 'y'.
+        cutoff_col (str, optional): Column that identifies the cutoff point for each forecast cross-validation fold. Defaults to 'cutoff'.
+    """
+
+    def __init__(
+        self,
+        models: List[str],
+        level: int,
+        id_col: str = "unique_id",
+        target_col: str = "y",
+        cutoff_col: str = "cutoff",
+    ):
+        super().__init__(id_col=id_col, target_col=target_col, cutoff_col=cutoff_col)
+        self.models = list(models)
+        self.level = level
+
+    def _params(self) -> Tuple:
+        return (*super()._params(), tuple(self.models), self.level)
+
+    def _stat_exprs(self) -> List[nw.Expr]:
+        return [
+            nw.col(self.target_col)
+            .is_between(
+                nw.col(f"{m}-lo-{self.level}"), nw.col(f"{m}-hi-{self.level}")
+            )
+            .alias(f"hits_{i}")
+            for i, m in enumerate(self.models)
+        ]
+
+    def _stat_aggs(self) -> List[nw.Expr]:
+        return [
+            *[nw.col(f"hits_{i}").sum() for i in range(len(self.models))],
+            nw.len().alias("count"),
+        ]
+
+    def _result_exprs(self) -> List[nw.Expr]:
+        return [
+            (nw.col(f"hits_{i}") / nw.col("count")).alias(m)
+            for i, m in enumerate(self.models)
+        ]
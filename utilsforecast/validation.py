@@ -127,7 +127,7 @@ def validate_format(
 
 def validate_freq(
     times: Series,
-    freq: Union[str, int],
+    freq: Union[str, int, pd.offsets.BaseOffset],
 ) -> None:
     if _is_int_dtype(times) and not isinstance(freq, int):
         raise ValueError(
@@ -140,10 +140,13 @@ def validate_freq(
             "Please provide a valid pandas or polars offset, e.g. `freq='D'` or `freq='1d'`."
         )
     # try to catch pandas frequency in polars dataframe
-    if isinstance(times, pl_Series) and isinstance(freq, str):
-        missing_n = re.search(r"\d+", freq) is None
-        uppercase = re.sub(r"\d+", "", freq).isupper()
-        if missing_n or uppercase:
+    if isinstance(times, pl_Series) and not isinstance(freq, int):
+        is_pandas_freq = (
+            isinstance(freq, pd.offsets.BaseOffset)
+            or re.search(r"\d+", freq) is None
+            or re.sub(r"\d+", "", freq).isupper()
+        )
+        if is_pandas_freq:
             raise ValueError(
                 "You must specify a valid polars offset when using polars dataframes. "
                 "You can find the available offsets in "